@@ -0,0 +1 @@
+from shared.config import *  # noqa: F401,F403
@@ -0,0 +1,2 @@
+from shared.hashing import password_hasher
+from shared.tokens import create_access_token, decode_access_token, issue_user_token
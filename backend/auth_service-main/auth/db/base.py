@@ -0,0 +1 @@
+from shared.db import Base
@@ -0,0 +1 @@
+from shared.db import SessionLocal, get_db, get_engine
@@ -1,6 +1,4 @@
-from fastapi import FastAPI
-from auth.routes import router as auth_router
-
-app = FastAPI(title="Auth Microservice")
-
-app.include_router(auth_router)
+from shared.app import create_app
+
+# Mismo núcleo que la API principal (backend/shared): engine, hashing y tokens
+app = create_app(title="Auth Microservice")
@@ -0,0 +1 @@
+from shared.models import User
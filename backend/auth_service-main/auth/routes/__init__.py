@@ -0,0 +1 @@
+from auth.routes.auth import router
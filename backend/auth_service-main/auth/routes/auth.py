@@ -0,0 +1 @@
+from shared.auth import router
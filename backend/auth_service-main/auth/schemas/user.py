@@ -0,0 +1 @@
+from shared.schemas import UserBase, UserCreate, UserLogin, UserResponse
@@ -1,26 +1,4 @@
-from database import fake_users_db
-from passlib.context import CryptContext
-from jose import jwt
-from datetime import datetime, timedelta
-from typing import Optional
-
-# Clave secreta para JWT (usa una más segura en producción)
-SECRET_KEY = "supersecreto"
-ALGORITHM = "HS256"
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def authenticate_user(email: str, password: str):
-    user = fake_users_db.get(email)
-    if not user or not verify_password(password, user["hashed_password"]):
-        return None
-    return user
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+# La lógica de autenticación vive en shared: misma clave, hashing y códec de
+# tokens que la API principal y el microservicio de auth
+from shared.auth import authenticate_user, get_password_hash, get_user, verify_password
+from shared.tokens import create_access_token, decode_access_token, issue_user_token
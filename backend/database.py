@@ -1,12 +1,2 @@
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Simulación de usuarios
-fake_users_db = {
-    "usuario@correo.com": {
-        "email": "usuario@correo.com",
-        "hashed_password": pwd_context.hash("contraseña123"),
-        "nombre": "Usuario de Prueba"
-    }
-}
+# Un único engine y sesión para todo el backend, definidos en shared.db
+from shared.db import Base, SessionLocal, get_db, get_engine
@@ -1,224 +1,32 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from sqlalchemy import create_engine, Column, Integer, String, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from passlib.context import CryptContext
-import os
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-load_dotenv()
-
-# Configuración de la app
-app = FastAPI(title="ProFlow API")
-
-# Configuración CORS para permitir peticiones desde el frontend
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # En producción, limitar a dominios específicos
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Configuración de seguridad
-SECRET_KEY = os.getenv("SECRET_KEY", "secretkeyforproflowapp")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Configuración de la base de datos
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./proflow.db")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Password context para hash
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
-
-# Modelos SQLAlchemy
-class User(Base):
-    __tablename__ = "users"
-
-    id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True)
-    username = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-    role = Column(String, default="student")
-    is_active = Column(Boolean, default=True)
-
-# Crear tablas
-Base.metadata.create_all(bind=engine)
-
-# Schemas Pydantic
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class TokenData(BaseModel):
-    email: Optional[str] = None
-    role: Optional[str] = None
-
-class UserBase(BaseModel):
-    email: EmailStr
-
-class UserCreate(UserBase):
-    password: str
-    role: str = "student"
-    username: Optional[str] = None
-
-class UserLogin(BaseModel):
-    email: str
-    password: str
-    role: str = "student"
-
-class UserResponse(UserBase):
-    id: int
-    username: str
-    role: str
-    is_active: bool
-
-    class Config:
-        orm_mode = True
-
-# Funciones de utilidad
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def get_user(db: Session, email: str):
-    return db.query(User).filter(User.email == email).first()
-
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user(db, email)
-    if not user:
-        return False
-    if not verify_password(password, user.hashed_password):
-        return False
-    return user
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    user = get_user(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    return user
-
-# Rutas de la API
-
-@app.post("/api/auth/login")
-async def login_for_access_token(form_data: UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.email, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    # Verificar que el rol coincida
-    if user.role != form_data.role:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"User is not a {form_data.role}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}, 
-        expires_delta=access_token_expires
-    )
-
-    # ✅ Aquí agregamos el usuario al response
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "username": user.username,
-            "role": user.role,
-            "is_active": user.is_active
-        }
-    }
-
-
-@app.post("/api/auth/register", response_model=UserResponse)
-def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user(db, email=user_data.email)
-    if db_user:
-        raise HTTPException(
-            status_code=400,
-            detail="Email already registered"
-        )
-    
-    # Si el username no se proporciona, usar la parte del email antes de @
-    username = user_data.username
-    if not username:
-        username = user_data.email.split('@')[0]
-    
-    # Crear nuevo usuario
-    hashed_password = get_password_hash(user_data.password)
-    db_user = User(
-        email=user_data.email,
-        username=username,
-        hashed_password=hashed_password,
-        role=user_data.role
-    )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
-
-@app.get("/api/auth/user", response_model=Dict[str, UserResponse])
-async def read_users_me(current_user: User = Depends(get_current_user)):
-    return {"user": current_user}
-
-@app.get("/", include_in_schema=False)
-async def root():
-    return {"message": "ProFlow API is running. Visit /docs for API documentation."}
-
-# Iniciar servidor
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+from services.assignments import router as assignments_router
+from services.attendance import router as attendance_router
+from services.certificates import router as certificates_router
+from services.courses import manage_router, router as courses_router
+from services.notifications import router as notifications_router
+from services.progress import router as progress_router
+from services.search import course_search, router as search_router
+from services.uploads import router as uploads_router
+from services.users import router as users_router
+from shared.app import create_app
+
+# Configuración de la app: autenticación, métricas y ciclo de vida vienen de shared
+app = create_app(title="ProFlow API", components={"course_search": course_search})
+app.include_router(uploads_router)
+app.include_router(courses_router)
+app.include_router(manage_router)
+app.include_router(attendance_router)
+app.include_router(notifications_router)
+app.include_router(certificates_router)
+app.include_router(assignments_router)
+app.include_router(progress_router)
+app.include_router(search_router)
+app.include_router(users_router)
+
+@app.get("/", include_in_schema=False)
+async def root():
+    return {"message": "ProFlow API is running. Visit /docs for API documentation."}
+
+# Iniciar servidor
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tareas de mantenimiento del backend que no deben ejecutarse al arrancar la API.
+
+    python manage.py create-schema
+    python manage.py purge-uploads
+    python manage.py rebuild-rollups [--course ID] [--batch-size N]
+    python manage.py purge-refresh-tokens
+    python manage.py copy-sqlite-replica [--every SECONDS]
+    python manage.py import-users FICHERO|- [--format csv|jsonl] [--role ROL] [--output RESULTADOS.jsonl]
+"""
+
+import argparse
+import asyncio
+import sys
+
+
+async def create_schema():
+    """Crea las tablas que falten (equivalente a AUTO_CREATE_SCHEMA, pero una sola vez)"""
+    from shared.db import create_all, dispose_engine
+
+    await create_all()
+    await dispose_engine()
+    print("Schema created")
+
+
+async def purge_uploads():
+    """Borra las subidas reanudables abandonadas y sus ficheros parciales"""
+    from datetime import datetime, timedelta
+
+    from sqlalchemy import delete, select
+
+    from services.uploads.storage import object_store
+    from shared import config
+    from shared.db import SessionLocal, dispose_engine, get_engine
+    from shared.models import UploadSession
+
+    get_engine()
+    cutoff = datetime.utcnow() - timedelta(seconds=config.UPLOAD_SESSION_TTL)
+    async with SessionLocal() as db:
+        result = await db.execute(select(UploadSession.id).where(UploadSession.updated_at < cutoff))
+        stale = result.scalars().all()
+        for upload_id in stale:
+            await object_store.remove(object_store.partial_path(upload_id))
+        await db.execute(delete(UploadSession).where(UploadSession.id.in_(stale)))
+        await db.commit()
+    await dispose_engine()
+    print(f"Purged {len(stale)} stale uploads")
+
+
+async def purge_refresh_tokens():
+    """Borra los refresh tokens caducados (rotados, revocados o no; ya no sirven para nada)"""
+    from datetime import datetime
+
+    from sqlalchemy import delete
+
+    from shared.db import SessionLocal, dispose_engine, get_engine
+    from shared.models import RefreshToken
+
+    get_engine()
+    async with SessionLocal() as db:
+        result = await db.execute(delete(RefreshToken).where(RefreshToken.expires_at < datetime.utcnow()))
+        await db.commit()
+    await dispose_engine()
+    print(f"Purged {result.rowcount} expired refresh tokens")
+
+
+async def rebuild_rollups(course_ids, batch_size):
+    """Recalcula student_progress, attendance_summaries y lesson_count por lotes de cursos"""
+    from sqlalchemy import select
+
+    from services.attendance.rollups import batches
+    from services.progress.rollups import rebuild_course_rollups
+    from shared.db import SessionLocal, dispose_engine, get_engine
+    from shared.models import Course
+
+    get_engine()
+    if not course_ids:
+        async with SessionLocal() as db:
+            course_ids = (await db.execute(select(Course.id).order_by(Course.id))).scalars().all()
+    progress_rows = attendance_rows = 0
+    for batch in batches(list(course_ids), batch_size):
+        # Una transacción por lote: las lecturas nunca ven un curso a medio recalcular
+        async with SessionLocal() as db:
+            progress, attendance = await rebuild_course_rollups(db, batch)
+            await db.commit()
+        progress_rows += progress
+        attendance_rows += attendance
+        print(f"Rebuilt courses {batch[0]}..{batch[-1]}")
+    await dispose_engine()
+    print(f"Rebuilt {len(course_ids)} courses: {progress_rows} progress rows, {attendance_rows} attendance summaries")
+
+
+def copy_sqlite_replica(every):
+    """Copia la BD SQLite primaria sobre las réplicas SQLite de DATABASE_REPLICA_URLS.
+
+    Sustituye a la replicación en local: con ``--every`` repite la copia, y el
+    intervalo simula el retraso de una réplica real.
+    """
+    import sqlite3
+    import time
+
+    from sqlalchemy.engine import make_url
+
+    from shared import config
+
+    def sqlite_path(url):
+        parsed = make_url(url)
+        if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+            return None
+        return parsed.database
+
+    primary = sqlite_path(config.DATABASE_URL)
+    replicas = [path for path in map(sqlite_path, config.DATABASE_REPLICA_URLS) if path]
+    if primary is None or not replicas:
+        print("copy-sqlite-replica needs a SQLite file in DATABASE_URL and in DATABASE_REPLICA_URLS")
+        return 1
+    while True:
+        # La API de backup copia una instantánea consistente aunque la API esté escribiendo
+        source = sqlite3.connect(primary)
+        try:
+            for path in replicas:
+                target = sqlite3.connect(path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        print(f"Copied {primary} to {', '.join(replicas)}")
+        if not every:
+            return 0
+        time.sleep(every)
+
+
+async def import_users(path, fmt, role, output):
+    """Alta masiva desde un CSV o JSONL (``-`` lee de stdin); escribe un resultado JSON por línea"""
+    import json
+
+    from services.users.provisioning import detect_format, import_users as run_import, parse_rows, summarize
+    from shared.db import SessionLocal, dispose_engine, get_engine
+
+    fmt = fmt or detect_format(path)
+    get_engine()
+    # utf-8-sig: los CSV exportados desde Excel empiezan con BOM
+    source = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+    try:
+        async with SessionLocal() as db:
+            results = await run_import(db, parse_rows(source, fmt), role)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    await dispose_engine()
+
+    # Los resultados llevan las contraseñas generadas: mejor a un fichero que a la terminal
+    target = sys.stdout if output in (None, "-") else open(output, "w", encoding="utf-8")
+    try:
+        for result in results:
+            target.write(json.dumps(result) + "\n")
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    summary = summarize(results)
+    print(f"Imported {summary['created']} of {summary['total']} users: {summary['by_status']}", file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 2
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description="ProFlow backend management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create-schema", help="Crear las tablas en DATABASE_URL")
+    commands.add_parser("purge-uploads", help="Borrar subidas incompletas más antiguas que UPLOAD_SESSION_TTL")
+    commands.add_parser("purge-refresh-tokens", help="Borrar los refresh tokens caducados")
+    rebuild = commands.add_parser("rebuild-rollups", help="Recalcular los agregados de progreso, notas y asistencia")
+    rebuild.add_argument("--course", type=int, action="append", dest="courses", help="Solo este curso (repetible)")
+    rebuild.add_argument("--batch-size", type=int, default=100, help="Cursos por transacción")
+    replica = commands.add_parser("copy-sqlite-replica", help="Copiar la BD SQLite primaria a las réplicas SQLite locales")
+    replica.add_argument("--every", type=float, default=0, help="Repetir la copia cada N segundos")
+    bulk = commands.add_parser("import-users", help="Alta masiva de usuarios desde un CSV o JSONL")
+    bulk.add_argument("path", help="Fichero a importar, o - para stdin")
+    bulk.add_argument("--format", choices=("csv", "jsonl"), help="Por defecto, según la extensión (csv si no se sabe)")
+    bulk.add_argument("--role", choices=("student", "teacher", "admin"), default="student",
+                      help="Rol de las filas sin columna role")
+    bulk.add_argument("--output", help="Fichero JSONL con un resultado por fila (por defecto, stdout)")
+    args = parser.parse_args()
+
+    if args.command == "create-schema":
+        asyncio.run(create_schema())
+    elif args.command == "purge-uploads":
+        asyncio.run(purge_uploads())
+    elif args.command == "purge-refresh-tokens":
+        asyncio.run(purge_refresh_tokens())
+    elif args.command == "rebuild-rollups":
+        asyncio.run(rebuild_rollups(args.courses, args.batch_size))
+    elif args.command == "copy-sqlite-replica":
+        return copy_sqlite_replica(args.every)
+    elif args.command == "import-users":
+        return asyncio.run(import_users(args.path, args.format, args.role, args.output))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from models import LoginInput
-from auth_utils import authenticate_user, create_access_token
-from datetime import timedelta
-
-router = APIRouter(prefix="/auth", tags=["auth"])
-
-@router.post("/token")
-def login(credentials: LoginInput):
-    user = authenticate_user(credentials.email, credentials.password)
-    if not user:
-        raise HTTPException(status_code=401, detail="Correo o contraseña incorrectos")
-    
-    access_token = create_access_token(
-        data={"sub": user["email"]},  # También puedes incluir "id" o "role"
-        expires_delta=timedelta(minutes=30)
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import LoginInput
+from auth_utils import authenticate_user, issue_user_token
+from database import get_db
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+@router.post("/token")
+async def login(credentials: LoginInput, db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, credentials.email, credentials.password)
+    if not user:
+        raise HTTPException(status_code=401, detail="Correo o contraseña incorrectos")
+    
+    access_token = issue_user_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
@@ -0,0 +1 @@
+from services.assignments.routes import router
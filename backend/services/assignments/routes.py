@@ -0,0 +1,303 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.courses.access import enrolled_student_ids, get_teacher_course
+from services.notifications.publisher import notify_course, notify_users
+from services.progress.rollups import apply_progress_deltas, forget_assignment, grade_delta
+from services.uploads.materials import store_upload_file
+from services.uploads.storage import UploadInterrupted, UploadTooLarge
+from shared import config
+from shared.auth import require_role
+from shared.db import get_db, get_read_db
+from shared.models import Assignment, Course, Enrollment, Submission, User
+from shared.pagination import jsonable
+from shared.token_cache import CachedUser
+
+router = APIRouter(tags=["assignments"])
+
+
+def material_path(material_id):
+    # El frontend la abre como `${BASE_URL}/${ruta}`
+    return f"api/materials/{material_id}" if material_id else None
+
+
+def serialize_assignment(assignment, course, submission_count=0, total_students=0):
+    return {
+        "_id": assignment.id,
+        "title": assignment.title,
+        "description": assignment.description,
+        "deadline": jsonable(assignment.deadline),
+        "maxScore": assignment.max_score,
+        "course": {"_id": course.id, "courseName": course.course_name, "courseCode": course.course_code},
+        "courseName": course.course_name,
+        "attachmentFile": material_path(assignment.attachment_id),
+        "submissionCount": submission_count,
+        "totalStudents": total_students,
+        "createdAt": jsonable(assignment.created_at),
+    }
+
+
+def submission_status(submission):
+    return "Graded" if submission.score is not None else "Submitted"
+
+
+def serialize_submission(submission, student_name=None):
+    return {
+        "_id": submission.id,
+        "student_id": submission.student_id,
+        "studentName": student_name,
+        "file": material_path(submission.material_id),
+        "submittedAt": jsonable(submission.submitted_at),
+        "score": submission.score,
+        "feedback": submission.feedback,
+        "status": submission_status(submission),
+        "gradedAt": jsonable(submission.graded_at),
+    }
+
+
+async def get_assignment_or_404(db: AsyncSession, assignment_id: int):
+    assignment = await db.get(Assignment, assignment_id)
+    if assignment is None:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    return assignment
+
+
+async def get_teacher_assignment(db: AsyncSession, assignment_id: int, user: CachedUser):
+    """(tarea, curso) si el usuario es el profesor del curso o un administrador"""
+    assignment = await get_assignment_or_404(db, assignment_id)
+    course = await get_teacher_course(db, assignment.course_id, user)
+    return assignment, course
+
+
+async def store_attachment(db: AsyncSession, upload: Optional[UploadFile], user: CachedUser, what):
+    if upload is None or not upload.filename:
+        return None
+    try:
+        material = await store_upload_file(db, upload, user.id, config.UPLOAD_MAX_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"{what} is too large")
+    except UploadInterrupted:
+        raise HTTPException(status_code=400, detail="Upload interrupted")
+    return material.id
+
+
+@router.post("/api/assignments/create")
+async def create_assignment(
+    title: str = Form(...),
+    course_id: int = Form(..., alias="courseId"),
+    deadline: datetime = Form(...),
+    description: str = Form(""),
+    max_score: float = Form(100, alias="maxScore", gt=0),
+    attachment: Optional[UploadFile] = File(None, alias="attachmentFile"),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    course = await get_teacher_course(db, course_id, current_user)
+    assignment = Assignment(
+        course_id=course.id,
+        title=title,
+        description=description,
+        deadline=deadline,
+        max_score=max_score,
+        attachment_id=await store_attachment(db, attachment, current_user, "Attachment"),
+        created_by=current_user.id,
+    )
+    db.add(assignment)
+    await db.commit()
+    await notify_course(db, course, "assignment", f"New assignment: {title}", f"Due {deadline.date().isoformat()}")
+    total = await db.scalar(select(func.count()).where(Enrollment.course_id == course.id))
+    return {"message": "Assignment created successfully", "assignment": serialize_assignment(assignment, course, 0, total)}
+
+
+@router.put("/api/assignments/{assignment_id}")
+async def update_assignment(
+    assignment_id: int,
+    title: Optional[str] = Form(None),
+    deadline: Optional[datetime] = Form(None),
+    description: Optional[str] = Form(None),
+    attachment: Optional[UploadFile] = File(None, alias="attachmentFile"),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    # max_score no se cambia aquí: alteraría las notas ya agregadas en student_progress
+    assignment, course = await get_teacher_assignment(db, assignment_id, current_user)
+    if title is not None:
+        assignment.title = title
+    if deadline is not None:
+        assignment.deadline = deadline
+    if description is not None:
+        assignment.description = description
+    attachment_id = await store_attachment(db, attachment, current_user, "Attachment")
+    if attachment_id is not None:
+        assignment.attachment_id = attachment_id
+    await db.commit()
+    submissions, total = (await db.execute(
+        select(
+            select(func.count()).where(Submission.assignment_id == assignment.id).scalar_subquery(),
+            select(func.count()).where(Enrollment.course_id == course.id).scalar_subquery(),
+        )
+    )).one()
+    return {
+        "message": "Assignment updated successfully",
+        "assignment": serialize_assignment(assignment, course, submissions, total),
+    }
+
+
+@router.delete("/api/assignments/{assignment_id}")
+async def delete_assignment(
+    assignment_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    assignment, _ = await get_teacher_assignment(db, assignment_id, current_user)
+    await forget_assignment(db, assignment)
+    await db.execute(delete(Submission).where(Submission.assignment_id == assignment.id))
+    await db.execute(delete(Assignment).where(Assignment.id == assignment.id))
+    await db.commit()
+    return {"message": "Assignment deleted successfully"}
+
+
+@router.get("/api/assignments/teacher")
+async def teacher_assignments(
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Recuentos como subconsultas correlacionadas (uq_submissions_assignment_student y
+    # uq_enrollments_course_student): una sola consulta para toda la lista
+    submissions = (
+        select(func.count()).where(Submission.assignment_id == Assignment.id).correlate(Assignment).scalar_subquery()
+    )
+    students = (
+        select(func.count()).where(Enrollment.course_id == Assignment.course_id).correlate(Assignment).scalar_subquery()
+    )
+    query = (
+        select(Assignment, Course, submissions, students)
+        .join(Course, Course.id == Assignment.course_id)
+        .order_by(Assignment.deadline, Assignment.id)
+    )
+    if current_user.role != "admin":
+        query = query.where(Course.teacher_id == current_user.id)
+    rows = (await db.execute(query)).all()
+    return {
+        "assignments": [
+            serialize_assignment(assignment, course, submission_count or 0, total or 0)
+            for assignment, course, submission_count, total in rows
+        ]
+    }
+
+
+@router.get("/api/assignments/student")
+async def student_assignments(
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows = (await db.execute(
+        select(Assignment, Course, Submission)
+        .join(Course, Course.id == Assignment.course_id)
+        .join(Enrollment, and_(Enrollment.course_id == Assignment.course_id, Enrollment.student_id == current_user.id))
+        .outerjoin(Submission, and_(
+            Submission.assignment_id == Assignment.id, Submission.student_id == current_user.id,
+        ))
+        .order_by(Assignment.deadline, Assignment.id)
+    )).all()
+    assignments = []
+    for assignment, course, submission in rows:
+        item = serialize_assignment(assignment, course)
+        del item["submissionCount"], item["totalStudents"]
+        item["submitted"] = submission is not None
+        item["submission"] = serialize_submission(submission) if submission is not None else None
+        assignments.append(item)
+    return {"assignments": assignments}
+
+
+@router.post("/api/assignments/{assignment_id}/submit")
+async def submit_assignment(
+    assignment_id: int,
+    submission_file: UploadFile = File(...),
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_db),
+):
+    assignment = await get_assignment_or_404(db, assignment_id)
+    if not await enrolled_student_ids(db, assignment.course_id, [current_user.id]):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+    submission = await db.scalar(
+        select(Submission).where(Submission.assignment_id == assignment.id, Submission.student_id == current_user.id)
+    )
+    if submission is not None and submission.score is not None:
+        raise HTTPException(status_code=400, detail="Assignment already graded")
+
+    material_id = await store_attachment(db, submission_file, current_user, "Submission")
+    if submission is not None:
+        # Reenvío antes de la corrección: sustituye el fichero, no cuenta como otra entrega
+        submission.material_id = material_id
+        submission.submitted_at = datetime.utcnow()
+        await db.commit()
+        return {"message": "Submission updated successfully", "submission": serialize_submission(submission)}
+
+    submission = Submission(assignment_id=assignment.id, student_id=current_user.id, material_id=material_id)
+    db.add(submission)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Submission already in progress")
+    await apply_progress_deltas(db, assignment.course_id, {current_user.id: {"submitted": 1}})
+    await db.commit()
+    return {"message": "Assignment submitted successfully", "submission": serialize_submission(submission)}
+
+
+@router.get("/api/assignments/submissions/{assignment_id}")
+async def assignment_submissions(
+    assignment_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    assignment, _ = await get_teacher_assignment(db, assignment_id, current_user)
+    rows = (await db.execute(
+        select(Submission, User.username)
+        .join(User, User.id == Submission.student_id)
+        .where(Submission.assignment_id == assignment.id)
+        .order_by(Submission.submitted_at, Submission.id)
+    )).all()
+    return {"submissions": [serialize_submission(submission, username) for submission, username in rows]}
+
+
+@router.post("/api/assignments/{assignment_id}/grade/{student_id}")
+async def grade_submission(
+    assignment_id: int,
+    student_id: int,
+    score: float = Form(..., ge=0),
+    feedback: str = Form(""),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    assignment, course = await get_teacher_assignment(db, assignment_id, current_user)
+    if score > assignment.max_score:
+        raise HTTPException(status_code=400, detail=f"Score cannot exceed {assignment.max_score:g}")
+
+    # Bloquea la entrega: el delta del agregado parte de la nota anterior real
+    # aunque dos profesores califiquen a la vez
+    submission = await db.scalar(
+        select(Submission)
+        .where(Submission.assignment_id == assignment.id, Submission.student_id == student_id)
+        .with_for_update()
+    )
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    delta = grade_delta(submission.score, score, assignment.max_score)
+    submission.score = score
+    submission.feedback = feedback
+    submission.graded_by = current_user.id
+    submission.graded_at = datetime.utcnow()
+    await apply_progress_deltas(db, assignment.course_id, {student_id: delta})
+    await db.commit()
+    await notify_users(
+        db, [student_id], "grade", f"Assignment graded: {assignment.title}",
+        f"Score: {score:g}/{assignment.max_score:g}", course=course,
+    )
+    return {"message": "Submission graded successfully", "score": score, "feedback": feedback}
@@ -0,0 +1 @@
+from services.attendance.routes import router
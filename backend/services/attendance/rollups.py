@@ -0,0 +1,120 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.db import upsert
+from shared.models import Attendance, AttendanceSummary, Course
+
+# Columna del resumen que cuenta cada estado
+STATUS_COLUMNS = {"Present": "present", "Absent": "absent", "Late": "late", "Excused": "excused"}
+COUNTER_COLUMNS = ("present", "absent", "late", "excused", "total")
+# Filas por sentencia INSERT; 500 alumnos caben en una sola
+UPSERT_BATCH_SIZE = 1000
+
+
+def batches(rows, size=UPSERT_BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def attendance_rate(present, late, total):
+    """Porcentaje de clases asistidas (los retrasos cuentan como asistencia)"""
+    return round((present + late) * 100 / total, 1) if total else 0.0
+
+
+def summary_deltas(previous, records, day):
+    """Cambios de los contadores por alumno al pasar de ``previous`` a ``records``.
+
+    ``previous`` es {student_id: estado anterior} de las filas ya existentes
+    para ese curso y fecha; solo los alumnos cuyo estado cambia generan delta.
+    """
+    deltas = {}
+    for student_id, record in records.items():
+        old_status = previous.get(student_id)
+        if old_status == record.status:
+            continue
+        delta = defaultdict(int)
+        delta[STATUS_COLUMNS[record.status]] += 1
+        if old_status is None:
+            delta["total"] += 1
+        else:
+            delta[STATUS_COLUMNS[old_status]] -= 1
+        deltas[student_id] = {
+            **{column: delta[column] for column in COUNTER_COLUMNS},
+            "last_date": day,
+        }
+    return deltas
+
+
+async def apply_summary_deltas(db: AsyncSession, course_id, deltas):
+    """Suma los deltas a los resúmenes con un único upsert multi-fila"""
+    rows = [{"student_id": student_id, "course_id": course_id, **delta} for student_id, delta in deltas.items()]
+    table = AttendanceSummary.__table__
+    for batch in batches(rows):
+        stmt = upsert(db, table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["student_id", "course_id"],
+            set_={
+                **{column: table.c[column] + stmt.excluded[column] for column in COUNTER_COLUMNS},
+                "last_date": case(
+                    (table.c.last_date.is_(None), stmt.excluded.last_date),
+                    (stmt.excluded.last_date > table.c.last_date, stmt.excluded.last_date),
+                    else_=table.c.last_date,
+                ),
+            },
+        )
+        await db.execute(stmt)
+
+
+async def record_attendance(db: AsyncSession, course_id, day, records, recorded_by):
+    """Registra la asistencia de un curso y fecha como operación de conjunto.
+
+    Una consulta lee los estados anteriores, un upsert multi-fila escribe todas
+    las asistencias (clave única curso+fecha+alumno) y otro actualiza los
+    resúmenes por alumno. Todo en la transacción de ``db``: quien llama hace
+    commit. Devuelve (creados, actualizados).
+
+    Los registros de un mismo curso se serializan bloqueando la fila del curso
+    antes de leer los estados anteriores: FOR UPDATE sobre las asistencias no
+    bloquea las que aún no existen, y dos primeros registros concurrentes de
+    la misma fecha contarían dos veces en los resúmenes.
+    """
+    records = {record.student_id: record for record in records}  # si se repite un alumno, gana el último
+    await db.execute(select(Course.id).where(Course.id == course_id).with_for_update())
+    result = await db.execute(
+        select(Attendance.student_id, Attendance.status)
+        .where(
+            Attendance.course_id == course_id,
+            Attendance.date == day,
+            Attendance.student_id.in_(list(records)),
+        )
+    )
+    previous = dict(result.all())
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "course_id": course_id,
+            "student_id": student_id,
+            "date": day,
+            "status": record.status,
+            "time": record.time,
+            "note": record.note,
+            "recorded_by": recorded_by,
+            "updated_at": now,
+        }
+        for student_id, record in records.items()
+    ]
+    table = Attendance.__table__
+    for batch in batches(rows):
+        stmt = upsert(db, table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["course_id", "date", "student_id"],
+            set_={column: stmt.excluded[column] for column in ("status", "time", "note", "recorded_by", "updated_at")},
+        )
+        await db.execute(stmt)
+
+    await apply_summary_deltas(db, course_id, summary_deltas(previous, records, day))
+    return len(records) - len(previous), len(previous)
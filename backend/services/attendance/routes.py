@@ -0,0 +1,189 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.courses.access import enrolled_student_ids, get_teacher_course
+from shared import config
+from shared.auth import get_current_user, require_role
+from shared.db import get_db, get_read_db
+from shared.models import Attendance, AttendanceSummary, Course, User
+from shared.schemas import BulkAttendance
+from shared.token_cache import CachedUser
+
+from .rollups import attendance_rate, record_attendance
+
+router = APIRouter(tags=["attendance"])
+
+
+def summary_stats(present, absent, late, excused, total):
+    return {
+        "present": present,
+        "absent": absent,
+        "late": late,
+        "excused": excused,
+        "total": total,
+        "attendance_rate": attendance_rate(present, late, total),
+    }
+
+
+@router.post("/api/attendance/bulk-record")
+async def bulk_record_attendance(
+    data: BulkAttendance,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    if not data.records:
+        raise HTTPException(status_code=400, detail="No attendance records provided")
+    if len(data.records) > config.ATTENDANCE_MAX_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many attendance records, the maximum is {config.ATTENDANCE_MAX_RECORDS}",
+        )
+    await get_teacher_course(db, data.course_id, current_user)
+
+    student_ids = {record.student_id for record in data.records}
+    missing = student_ids - await enrolled_student_ids(db, data.course_id, student_ids)
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Students not enrolled in this course: {sorted(missing)}",
+        )
+
+    created, updated = await record_attendance(
+        db, data.course_id, data.date, data.records, current_user.id,
+    )
+    await db.commit()
+    return {
+        "message": "Attendance recorded successfully",
+        "recorded": created + updated,
+        "created": created,
+        "updated": updated,
+    }
+
+
+@router.get("/api/attendance/course/{course_id}")
+async def course_attendance(
+    course_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+
+    # Usa el índice único (course_id, date, student_id)
+    query = (
+        select(
+            Attendance.id,
+            Attendance.student_id,
+            User.username,
+            Attendance.status,
+            Attendance.time,
+            Attendance.note,
+            Attendance.date,
+        )
+        .join(User, User.id == Attendance.student_id)
+        .where(Attendance.course_id == course_id)
+        .order_by(Attendance.date, Attendance.student_id)
+    )
+    if start_date is not None:
+        query = query.where(Attendance.date >= start_date)
+    if end_date is not None:
+        query = query.where(Attendance.date <= end_date)
+    records = (await db.execute(query)).all()
+
+    # Totales por alumno desde los resúmenes precalculados, sin recorrer el histórico
+    summaries = (await db.execute(
+        select(
+            AttendanceSummary.student_id,
+            User.username,
+            AttendanceSummary.present,
+            AttendanceSummary.absent,
+            AttendanceSummary.late,
+            AttendanceSummary.excused,
+            AttendanceSummary.total,
+            AttendanceSummary.last_date,
+        )
+        .join(User, User.id == AttendanceSummary.student_id)
+        .where(AttendanceSummary.course_id == course_id)
+        .order_by(AttendanceSummary.student_id)
+    )).all()
+
+    return {
+        "attendance_records": [
+            {
+                "_id": row.id,
+                "student_id": row.student_id,
+                "student_name": row.username,
+                "status": row.status,
+                "time": row.time,
+                "note": row.note,
+                "date": row.date.isoformat(),
+            }
+            for row in records
+        ],
+        "students": [
+            {
+                "student_id": row.student_id,
+                "student_name": row.username,
+                "last_date": row.last_date.isoformat() if row.last_date else None,
+                **summary_stats(row.present, row.absent, row.late, row.excused, row.total),
+            }
+            for row in summaries
+        ],
+    }
+
+
+@router.get("/api/attendance/student")
+async def student_attendance(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Registros recientes por el índice (student_id, date)
+    records = (await db.execute(
+        select(Attendance.date, Attendance.status, Attendance.course_id, Course.course_name)
+        .join(Course, Course.id == Attendance.course_id)
+        .where(Attendance.student_id == current_user.id)
+        .order_by(Attendance.date.desc())
+        .limit(limit)
+    )).all()
+
+    per_course = (await db.execute(
+        select(
+            AttendanceSummary.course_id,
+            Course.course_name,
+            AttendanceSummary.present,
+            AttendanceSummary.absent,
+            AttendanceSummary.late,
+            AttendanceSummary.excused,
+            AttendanceSummary.total,
+        )
+        .join(Course, Course.id == AttendanceSummary.course_id)
+        .where(AttendanceSummary.student_id == current_user.id)
+    )).all()
+    totals = [sum(row[i] for row in per_course) for i in range(2, 7)]
+
+    return {
+        "attendance_records": [
+            {
+                "date": row.date.isoformat(),
+                "status": row.status,
+                "course_id": row.course_id,
+                "course_name": row.course_name,
+            }
+            for row in records
+        ],
+        "statistics": summary_stats(*totals),
+        "courses": [
+            {
+                "course_id": row.course_id,
+                "course_name": row.course_name,
+                **summary_stats(row.present, row.absent, row.late, row.excused, row.total),
+            }
+            for row in per_course
+        ],
+    }
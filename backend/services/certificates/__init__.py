@@ -0,0 +1 @@
+from services.certificates.routes import router
@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from services.notifications.publisher import notify_users
+from services.uploads.materials import store_bytes
+from shared import config
+from shared.db import SessionLocal
+from shared.jobs import job_queue
+from shared.models import Certificate, CertificateTemplate, Course, User
+from shared.response_cache import response_cache
+
+from .render import content_hash, render_certificate_pdf
+
+RENDER_JOB = "certificate.render"
+
+
+def student_certificates_tag(student_id):
+    # Etiqueta de caché de /api/certificates/student de un alumno
+    return f"certificates:student:{student_id}"
+
+
+def credential_id(course_id, student_id):
+    """Identificador público del certificado: estable y no adivinable sin SECRET_KEY"""
+    digest = hmac.new(config.SECRET_KEY.encode(), f"{course_id}:{student_id}".encode(), hashlib.sha256)
+    code = digest.hexdigest()[:16].upper()
+    return f"PF-{code[:4]}-{code[4:8]}-{code[8:12]}-{code[12:]}"
+
+
+async def load_certificate_fields(db, certificate_id):
+    """(certificado, datos a imprimir) con una sola consulta"""
+    row = (await db.execute(
+        select(
+            Certificate,
+            User.username,
+            Course.course_name,
+            Course.instructor_name,
+            CertificateTemplate.title,
+            CertificateTemplate.description,
+        )
+        .join(User, User.id == Certificate.student_id)
+        .join(Course, Course.id == Certificate.course_id)
+        .join(CertificateTemplate, CertificateTemplate.course_id == Certificate.course_id)
+        .where(Certificate.id == certificate_id)
+    )).first()
+    if row is None:
+        raise LookupError(f"Certificate {certificate_id} or its template no longer exists")
+    certificate = row.Certificate
+    fields = {
+        "title": row.title,
+        "description": row.description or "",
+        "student_name": row.username,
+        "course_name": row.course_name,
+        "instructor": row.instructor_name or "",
+        "issue_date": certificate.issued_at.date().isoformat(),
+        "credential_id": certificate.credential_id,
+    }
+    return certificate, row.course_name, fields
+
+
+async def render_failed(payload, error):
+    """El render agotó sus intentos: el certificado deja de estar ``pending``"""
+    async with SessionLocal() as db:
+        student_id = (await db.execute(
+            update(Certificate)
+            .where(Certificate.id == payload["certificate_id"], Certificate.status != "ready")
+            .values(status="failed")
+            .returning(Certificate.student_id)
+        )).scalar()
+        await db.commit()
+    if student_id is not None:
+        await response_cache.invalidate(student_certificates_tag(student_id))
+
+
+@job_queue.handler(RENDER_JOB, on_failure=render_failed)
+async def render_certificate(payload):
+    async with SessionLocal() as db:
+        certificate, course_name, fields = await load_certificate_fields(db, payload["certificate_id"])
+        try:
+            return await render_loaded_certificate(db, certificate, course_name, fields)
+        except Exception:
+            # El alumno no debe seguir viendo en caché el estado previo al intento fallido
+            await response_cache.invalidate(student_certificates_tag(certificate.student_id))
+            raise
+
+
+async def render_loaded_certificate(db, certificate, course_name, fields):
+    digest = content_hash(fields)
+
+    # Caché por contenido: si ya se generó un PDF con estos mismos datos, se reutiliza
+    material_id = await db.scalar(
+        select(Certificate.material_id)
+        .where(Certificate.content_hash == digest, Certificate.material_id.isnot(None))
+        .limit(1)
+    )
+    cached = material_id is not None
+    if not cached:
+        pdf = await job_queue.run_cpu(render_certificate_pdf, fields)
+        material = await store_bytes(db, pdf, f"certificate-{certificate.credential_id}.pdf", "application/pdf")
+        material_id = material.id
+
+    await db.execute(
+        update(Certificate)
+        .where(Certificate.id == certificate.id)
+        .values(status="ready", content_hash=digest, material_id=material_id, rendered_at=datetime.utcnow())
+    )
+    await db.commit()
+    await response_cache.invalidate(student_certificates_tag(certificate.student_id))
+    await notify_users(
+        db, [certificate.student_id], "certificate", f"Your certificate for {course_name} is ready",
+        f"Credential ID: {certificate.credential_id}",
+    )
+    return {"certificate_id": certificate.id, "material_id": material_id, "cached": cached}
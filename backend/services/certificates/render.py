@@ -0,0 +1,133 @@
+"""Generación del PDF de un certificado, sin dependencias externas.
+
+Este módulo se ejecuta en el pool de procesos de la cola de trabajos: solo
+usa la biblioteca estándar y funciones de módulo (serializables con pickle).
+"""
+
+import hashlib
+import json
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 apaisado, en puntos
+MARGIN = 36
+
+# Anchos de carácter (milésimas de em) de las fuentes estándar del PDF para ASCII 32-126;
+# los demás caracteres Latin-1 usan DEFAULT_WIDTH
+_HELVETICA = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+_HELVETICA_BOLD = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+)
+FONTS = {"F1": ("Helvetica", _HELVETICA), "F2": ("Helvetica-Bold", _HELVETICA_BOLD)}
+DEFAULT_WIDTH = 556
+
+
+def content_hash(fields):
+    """SHA-256 de los datos que se imprimen: mismo hash, mismo PDF"""
+    canonical = json.dumps(fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def text_width(text, font, size):
+    widths = FONTS[font][1]
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code <= 126 else DEFAULT_WIDTH
+    return total * size / 1000
+
+
+def wrap(text, font, size, max_width):
+    """Parte ``text`` en líneas que caben en ``max_width`` puntos"""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(candidate, font, size) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _pdf_string(text):
+    # WinAnsiEncoding: cubre los acentos y la ñ; lo que no quepa se sustituye por "?"
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _centered(text, font, size, y):
+    x = (PAGE_WIDTH - text_width(text, font, size)) / 2
+    return b"BT /%s %d Tf %.2f %.2f Td %s Tj ET\n" % (font.encode(), size, x, y, _pdf_string(text))
+
+
+def _content_stream(fields):
+    ops = [
+        # Doble marco
+        b"0.10 0.64 0.86 RG 4 w %d %d %d %d re S\n" % (
+            MARGIN, MARGIN, PAGE_WIDTH - 2 * MARGIN, PAGE_HEIGHT - 2 * MARGIN),
+        b"1 w %d %d %d %d re S\n" % (
+            MARGIN + 10, MARGIN + 10, PAGE_WIDTH - 2 * MARGIN - 20, PAGE_HEIGHT - 2 * MARGIN - 20),
+        b"0.15 0.15 0.15 rg\n",
+        _centered(fields["title"], "F2", 34, 440),
+        _centered("This certifies that", "F1", 14, 395),
+        _centered(fields["student_name"], "F2", 28, 355),
+        _centered("has successfully completed the course", "F1", 14, 320),
+        _centered(fields["course_name"], "F2", 20, 290),
+    ]
+    y = 255
+    for line in wrap(fields.get("description", ""), "F1", 11, PAGE_WIDTH - 4 * MARGIN)[:5]:
+        ops.append(_centered(line, "F1", 11, y))
+        y -= 15
+    ops += [
+        b"BT /F1 11 Tf %d %d Td %s Tj ET\n" % (MARGIN + 40, MARGIN + 60, _pdf_string(f"Instructor: {fields['instructor']}")),
+        b"BT /F1 11 Tf %d %d Td %s Tj ET\n" % (MARGIN + 40, MARGIN + 42, _pdf_string(f"Issued: {fields['issue_date']}")),
+        b"BT /F1 9 Tf %d %d Td %s Tj ET\n" % (
+            PAGE_WIDTH - MARGIN - 260, MARGIN + 42, _pdf_string(f"Credential ID: {fields['credential_id']}")),
+    ]
+    return b"".join(ops)
+
+
+def render_certificate_pdf(fields):
+    """PDF de una página con los datos del certificado.
+
+    ``fields``: title, description, student_name, course_name, instructor,
+    issue_date y credential_id.
+    """
+    stream = _content_stream(fields)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT),
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream) + 1, stream),
+    ]
+    for name in ("F1", "F2"):
+        objects.append(
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % FONTS[name][0].encode()
+        )
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,275 @@
+import uuid
+
+from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.courses.access import enrolled_student_ids, get_teacher_course
+from services.uploads.delivery import material_response
+from shared import config
+from shared.auth import require_role
+from shared.db import get_db, get_read_db, upsert
+from shared.jobs import job_queue, serialize_job
+from shared.models import Certificate, CertificateTemplate, Course, Enrollment, Job, Material, StudentProgress, User
+from shared.pagination import jsonable
+from shared.response_cache import response_cache
+from shared.token_cache import CachedUser
+
+from .jobs import RENDER_JOB, credential_id, student_certificates_tag
+
+router = APIRouter(tags=["certificates"])
+
+
+def certificate_url(credential):
+    # Relativa a /uploads/, como la construye el frontend
+    return f"certificates/{credential}.pdf"
+
+
+def serialize_template(template):
+    return {
+        "_id": template.id,
+        "course_id": template.course_id,
+        "title": template.title,
+        "description": template.description,
+    }
+
+
+def serialize_issued(certificate, student_name):
+    return {
+        "_id": certificate.id,
+        "student_id": certificate.student_id,
+        "student_name": student_name,
+        "issue_date": jsonable(certificate.issued_at),
+        "credential_id": certificate.credential_id,
+        "certificate_url": certificate_url(certificate.credential_id),
+        "status": certificate.status,
+        "job_id": certificate.job_id,
+    }
+
+
+async def get_template(db: AsyncSession, course_id: int):
+    template = await db.scalar(select(CertificateTemplate).where(CertificateTemplate.course_id == course_id))
+    if template is None:
+        raise HTTPException(status_code=400, detail="Create a certificate template for this course first")
+    return template
+
+
+async def queue_certificates(db: AsyncSession, course_id: int, student_ids, user: CachedUser, batch_id=None):
+    """Crea (o reutiliza si quedaron sin generar) los certificados y encola un render por cada uno.
+
+    Hace commit, invalida la caché de certificados de esos alumnos y despierta
+    a los workers: la invalidación va tras el commit para que un relleno
+    concurrente no guarde el estado anterior.
+    """
+    existing = {
+        certificate.student_id: certificate
+        for certificate in (await db.execute(
+            select(Certificate).where(Certificate.course_id == course_id, Certificate.student_id.in_(student_ids))
+        )).scalars()
+    }
+    certificates = []
+    for student_id in student_ids:
+        certificate = existing.get(student_id)
+        if certificate is None:
+            certificate = Certificate(
+                course_id=course_id,
+                student_id=student_id,
+                credential_id=credential_id(course_id, student_id),
+                status="pending",
+            )
+            db.add(certificate)
+        else:
+            # Reintento de uno que falló o quedó sin generar
+            certificate.status = "pending"
+        certificates.append(certificate)
+    await db.flush()
+    for certificate in certificates:
+        job = await job_queue.enqueue(
+            db, RENDER_JOB, {"certificate_id": certificate.id}, created_by=user.id, batch_id=batch_id,
+        )
+        certificate.job_id = job.id
+    await db.commit()
+    await response_cache.invalidate(*(student_certificates_tag(student_id) for student_id in student_ids))
+    job_queue.wake()
+    return certificates
+
+
+@router.post("/api/certificates/create")
+async def create_certificate_template(
+    title: str = Form(...),
+    course_id: int = Form(...),
+    description: str = Form(""),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+    statement = upsert(db, CertificateTemplate.__table__).values(
+        course_id=course_id, title=title, description=description,
+    )
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=["course_id"],
+        set_={"title": statement.excluded.title, "description": statement.excluded.description},
+    ))
+    await db.commit()
+    template = await get_template(db, course_id)
+    return {"message": "Certificate template saved", "certificate": serialize_template(template)}
+
+
+@router.get("/api/certificates/course/{course_id}")
+async def course_certificates(
+    course_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+    template = await db.scalar(select(CertificateTemplate).where(CertificateTemplate.course_id == course_id))
+    rows = (await db.execute(
+        select(Certificate, User.username)
+        .join(User, User.id == Certificate.student_id)
+        .where(Certificate.course_id == course_id)
+        .order_by(Certificate.issued_at, Certificate.id)
+    )).all()
+    return {
+        "certificate_template": serialize_template(template) if template is not None else None,
+        "issued_certificates": [serialize_issued(row.Certificate, row.username) for row in rows],
+    }
+
+
+@router.post("/api/certificates/issue/{course_id}/{student_id}", status_code=status.HTTP_202_ACCEPTED)
+async def issue_certificate(
+    course_id: int,
+    student_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    # Solo se encola: el PDF lo genera un worker y el estado se consulta con job_id
+    await get_teacher_course(db, course_id, current_user)
+    await get_template(db, course_id)
+    if not await enrolled_student_ids(db, course_id, [student_id]):
+        raise HTTPException(status_code=400, detail="Student is not enrolled in this course")
+    ready = await db.scalar(
+        select(Certificate.id).where(
+            Certificate.course_id == course_id, Certificate.student_id == student_id, Certificate.status == "ready",
+        )
+    )
+    if ready:
+        raise HTTPException(status_code=400, detail="Certificate already issued to this student")
+
+    certificate, = await queue_certificates(db, course_id, [student_id], current_user)
+    student_name = await db.scalar(select(User.username).where(User.id == student_id))
+    return {
+        "message": "Certificate queued",
+        "job_id": certificate.job_id,
+        "certificate": serialize_issued(certificate, student_name),
+    }
+
+
+@router.post("/api/certificates/issue/{course_id}", status_code=status.HTTP_202_ACCEPTED)
+async def issue_course_certificates(
+    course_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    """Emisión masiva: todos los alumnos que completaron el curso y aún no tienen certificado.
+
+    Cada certificado es un trabajo independiente del mismo lote; los workers
+    los reparten entre los núcleos del pool de procesos.
+    """
+    await get_teacher_course(db, course_id, current_user)
+    await get_template(db, course_id)
+    # Elegibilidad desde los contadores de lecciones, no desde Enrollment.progress
+    student_ids = (await db.execute(
+        select(Enrollment.student_id)
+        .join(Course, Course.id == Enrollment.course_id)
+        .join(StudentProgress, and_(
+            StudentProgress.course_id == Enrollment.course_id,
+            StudentProgress.student_id == Enrollment.student_id,
+        ))
+        .outerjoin(Certificate, and_(
+            Certificate.course_id == Enrollment.course_id,
+            Certificate.student_id == Enrollment.student_id,
+        ))
+        .where(
+            Enrollment.course_id == course_id,
+            Course.lesson_count > 0,
+            StudentProgress.lessons_completed * 100 >= config.CERTIFICATE_COMPLETION_PROGRESS * Course.lesson_count,
+            (Certificate.id.is_(None)) | (Certificate.status != "ready"),
+        )
+    )).scalars().all()
+    if not student_ids:
+        return {"message": "No students pending a certificate", "batch_id": None, "queued": 0}
+
+    batch_id = uuid.uuid4().hex
+    await queue_certificates(db, course_id, student_ids, current_user, batch_id)
+    return {"message": "Certificates queued", "batch_id": batch_id, "queued": len(student_ids)}
+
+
+@router.get("/api/certificates/jobs/{job_id}")
+async def certificate_job(
+    job_id: str,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    job = await db.get(Job, job_id)
+    if job is None or job.kind != RENDER_JOB or (current_user.role != "admin" and job.created_by != current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialize_job(job)
+
+
+@router.get("/api/certificates/batches/{batch_id}")
+async def certificate_batch(
+    batch_id: str,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    query = select(Job.status, func.count()).where(Job.batch_id == batch_id, Job.kind == RENDER_JOB)
+    if current_user.role != "admin":
+        query = query.where(Job.created_by == current_user.id)
+    counts = dict((await db.execute(query.group_by(Job.status))).all())
+    if not counts:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    total = sum(counts.values())
+    finished = counts.get("done", 0) + counts.get("failed", 0)
+    return {"batch_id": batch_id, "total": total, "complete": finished == total, **counts}
+
+
+@router.get("/api/certificates/student")
+@response_cache.cached(tags=(student_certificates_tag("{user.id}"),), vary="user")
+async def student_certificates(
+    current_user: CachedUser = Depends(require_role("student")),
+    # Primario: lo que se lee aquí se cachea, y una réplica atrasada guardaría el estado anterior
+    db: AsyncSession = Depends(get_db),
+):
+    rows = (await db.execute(
+        select(Certificate, Course.course_name, Course.instructor_name, CertificateTemplate.title)
+        .join(Course, Course.id == Certificate.course_id)
+        .join(CertificateTemplate, CertificateTemplate.course_id == Certificate.course_id)
+        .where(Certificate.student_id == current_user.id, Certificate.status == "ready")
+        .order_by(Certificate.issued_at.desc())
+    )).all()
+    return {
+        "certificates": [
+            {
+                "_id": row.Certificate.id,
+                "title": row.title,
+                "course": {"_id": row.Certificate.course_id, "name": row.course_name, "instructor": row.instructor_name},
+                "credential_id": row.Certificate.credential_id,
+                "completion_date": row.Certificate.issued_at.date().isoformat(),
+                "certificate_url": certificate_url(row.Certificate.credential_id),
+            }
+            for row in rows
+        ]
+    }
+
+
+@router.api_route("/uploads/certificates/{credential}.pdf", methods=["GET", "HEAD"])
+async def download_certificate(credential: str, request: Request, db: AsyncSession = Depends(get_db)):
+    # Público a propósito: el identificador de credencial sirve para compartir y verificar
+    material = await db.scalar(
+        select(Material)
+        .join(Certificate, Certificate.material_id == Material.id)
+        .where(Certificate.credential_id == credential, Certificate.status == "ready")
+    )
+    if material is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    return material_response(request, material)
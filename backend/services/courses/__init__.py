@@ -0,0 +1,2 @@
+from services.courses.manage import router as manage_router
+from services.courses.routes import router
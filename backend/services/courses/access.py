@@ -0,0 +1,32 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import Course, Enrollment
+from shared.token_cache import CachedUser
+
+
+async def get_course_or_404(db: AsyncSession, course_id: int):
+    course = await db.get(Course, course_id)
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+
+async def get_teacher_course(db: AsyncSession, course_id: int, user: CachedUser):
+    """Curso que el usuario puede gestionar: su profesor o un administrador"""
+    course = await get_course_or_404(db, course_id)
+    if user.role != "admin" and course.teacher_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not the teacher of this course")
+    return course
+
+
+async def enrolled_student_ids(db: AsyncSession, course_id: int, student_ids):
+    """Subconjunto de ``student_ids`` matriculado en el curso, con una sola consulta"""
+    result = await db.execute(
+        select(Enrollment.student_id).where(
+            Enrollment.course_id == course_id,
+            Enrollment.student_id.in_(student_ids),
+        )
+    )
+    return set(result.scalars().all())
@@ -0,0 +1,307 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile, status
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from services.notifications.publisher import notify_course
+from services.progress.rollups import forget_lessons, refresh_enrollment_progress
+from services.search.catalog import course_search
+from services.uploads.materials import store_upload_file
+from services.uploads.storage import UploadInterrupted, UploadTooLarge
+from shared import config
+from shared.auth import require_role
+from shared.db import get_db
+from shared.http import etag_matches
+from shared.models import Course, Lesson, Module
+from shared.response_cache import response_cache
+from shared.schemas import CourseUpdate
+from shared.serialization import json_response
+from shared.token_cache import CachedUser
+
+from .access import get_teacher_course
+from .routes import CATALOG_TAG, serialize_course
+
+router = APIRouter(tags=["courses"])
+
+# Campos de CourseUpdate (nombres del frontend) -> atributos de Course
+COURSE_UPDATES = {
+    "courseName": "course_name",
+    "courseCode": "course_code",
+    "description": "description",
+    "category": "category",
+    "difficulty": "difficulty",
+    "duration": "duration",
+    "price": "price",
+    "maxStudents": "max_students",
+    "instructorName": "instructor_name",
+    "status": "status",
+}
+
+# Curso, módulos y lecciones (con su material en el mismo JOIN): tres consultas sin
+# importar cuántos haya. selectinload parte el IN en lotes de 500 claves, por eso el
+# material va con joinedload: el IN de lecciones lleva ids de módulo, no de lección
+MANAGE_OPTIONS = selectinload(Course.modules).selectinload(Module.lessons).joinedload(Lesson.material)
+
+
+def course_etag(course_id, version):
+    return f'"course-{course_id}-v{version}"'
+
+
+def material_url(material_id):
+    return f"/api/materials/{material_id}"
+
+
+def serialize_lesson(lesson):
+    material = lesson.material
+    return {
+        "_id": lesson.id,
+        "title": lesson.title,
+        "duration": lesson.duration,
+        "description": lesson.description,
+        "materialType": lesson.material_type,
+        "materialUrl": lesson.material_url,
+        "materialId": lesson.material_id,
+        "materialName": material.filename if material is not None else "",
+    }
+
+
+def serialize_module(module):
+    return {
+        "_id": module.id,
+        "title": module.title,
+        "description": module.description,
+        "lessons": [serialize_lesson(lesson) for lesson in module.lessons],
+    }
+
+
+def serialize_material(material):
+    return {
+        "_id": material.id,
+        "filename": material.filename,
+        "contentType": material.content_type,
+        "size": material.size,
+        "url": material_url(material.id),
+    }
+
+
+def serialize_manage_view(course):
+    materials = {}
+    for module in course.modules:
+        for lesson in module.lessons:
+            if lesson.material is not None:
+                materials.setdefault(lesson.material.id, lesson.material)
+    return {
+        **serialize_course(course),
+        "thumbnail": material_url(course.thumbnail_id) if course.thumbnail_id else None,
+        "version": course.version,
+        "modules": [serialize_module(module) for module in course.modules],
+        "materials": [serialize_material(material) for material in materials.values()],
+    }
+
+
+async def course_version(db: AsyncSession, course_id: int, user: CachedUser):
+    """Versión del curso comprobando permisos con una sola fila (sin cargar el agregado)"""
+    row = (await db.execute(
+        select(Course.teacher_id, Course.version).where(Course.id == course_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if user.role != "admin" and row.teacher_id != user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not the teacher of this course")
+    return row.version
+
+
+async def touch_course(db: AsyncSession, course_id: int, lessons: int = 0):
+    """Incrementa la versión del curso (invalida su ETag) y devuelve la nueva.
+
+    ``lessons`` es el cambio en el número de lecciones (``Course.lesson_count``);
+    si lo hay, recalcula en la misma transacción el progreso de los matriculados.
+    """
+    result = await db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(version=Course.version + 1, lesson_count=Course.lesson_count + lessons)
+        .returning(Course.version)
+    )
+    version = result.scalar_one()
+    if lessons:
+        await refresh_enrollment_progress(db, [course_id])
+    return version
+
+
+def check_if_match(request: Request, course_id: int, version: int):
+    # Concurrencia optimista opcional: If-Match con el ETag que el cliente editó
+    if_match = request.headers.get("if-match")
+    if if_match and not etag_matches(if_match, course_etag(course_id, version)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Course was modified by someone else, reload it",
+        )
+
+
+async def get_course_module(db: AsyncSession, course_id: int, module_id: int):
+    module = await db.scalar(select(Module).where(Module.id == module_id, Module.course_id == course_id))
+    if module is None:
+        raise HTTPException(status_code=404, detail="Module not found")
+    return module
+
+
+@router.get("/api/courses/{course_id}/manage")
+async def get_course_manage(
+    course_id: int,
+    request: Request,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    # Revalidación barata: si el ETag coincide no se carga el agregado
+    version = await course_version(db, course_id, current_user)
+    headers = {"ETag": course_etag(course_id, version), "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    course = (await db.execute(
+        select(Course).where(Course.id == course_id).options(MANAGE_OPTIONS)
+    )).scalar_one()
+    # El ETag corresponde a lo que se devuelve, aunque el curso cambiara entre ambas consultas
+    headers["ETag"] = course_etag(course_id, course.version)
+    return json_response({"course": serialize_manage_view(course)}, headers=headers)
+
+
+@router.put("/api/courses/{course_id}/manage")
+async def update_course_manage(
+    course_id: int,
+    data: CourseUpdate,
+    request: Request,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    course = await get_teacher_course(db, course_id, current_user)
+    check_if_match(request, course_id, course.version)
+    for field, attribute in COURSE_UPDATES.items():
+        value = getattr(data, field)
+        if value is not None:
+            setattr(course, attribute, value)
+    try:
+        # El UPDATE de la versión vuelca antes los cambios: el código duplicado puede fallar aquí
+        version = await touch_course(db, course_id)
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Course code already exists")
+    await course_search.refresh(db, [course_id])
+    await response_cache.invalidate(CATALOG_TAG)
+    return json_response(
+        {"message": "Course updated successfully", "course": serialize_course(course)},
+        headers={"ETag": course_etag(course_id, version)},
+    )
+
+
+@router.post("/api/courses/{course_id}/modules")
+async def add_module(
+    course_id: int,
+    title: str = Form(...),
+    description: str = Form(""),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    await course_version(db, course_id, current_user)
+    position = await db.scalar(
+        select(func.coalesce(func.max(Module.position) + 1, 0)).where(Module.course_id == course_id)
+    )
+    module = Module(course_id=course_id, title=title, description=description, position=position, lessons=[])
+    db.add(module)
+    await touch_course(db, course_id)
+    await db.commit()
+    await course_search.refresh(db, [course_id])
+    return {"message": "Module added successfully", "module": serialize_module(module)}
+
+
+@router.delete("/api/courses/{course_id}/modules/{module_id}")
+async def delete_module(
+    course_id: int,
+    module_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    await course_version(db, course_id, current_user)
+    module = await get_course_module(db, course_id, module_id)
+    await forget_lessons(db, course_id, select(Lesson.id).where(Lesson.module_id == module.id))
+    # Borrado en bloque de sus lecciones, sin cargarlas una a una
+    deleted = await db.execute(Lesson.__table__.delete().where(Lesson.module_id == module.id))
+    await db.execute(Module.__table__.delete().where(Module.id == module.id))
+    await touch_course(db, course_id, lessons=-deleted.rowcount)
+    await db.commit()
+    await course_search.refresh(db, [course_id])
+    return {"message": "Module deleted successfully"}
+
+
+@router.post("/api/courses/{course_id}/modules/{module_id}/lessons")
+async def add_lesson(
+    course_id: int,
+    module_id: int,
+    title: str = Form(...),
+    duration: str = Form(""),
+    description: str = Form(""),
+    material_type: str = Form("", alias="materialType"),
+    material_url_field: str = Form("", alias="materialUrl"),
+    material: Optional[UploadFile] = File(None),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    course = await get_teacher_course(db, course_id, current_user)
+    module = await get_course_module(db, course_id, module_id)
+
+    stored = None
+    if material is not None and material.filename:
+        try:
+            stored = await store_upload_file(db, material, current_user.id, config.UPLOAD_MAX_BYTES)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="Lesson material is too large")
+        except UploadInterrupted:
+            raise HTTPException(status_code=400, detail="Upload interrupted")
+
+    position = await db.scalar(
+        select(func.coalesce(func.max(Lesson.position) + 1, 0)).where(Lesson.module_id == module.id)
+    )
+    lesson = Lesson(
+        module_id=module.id,
+        title=title,
+        duration=duration,
+        description=description,
+        material_type=material_type,
+        material_url=material_url(stored.id) if stored is not None else material_url_field,
+        material=stored,
+        position=position,
+    )
+    db.add(lesson)
+    await touch_course(db, course_id, lessons=1)
+    await db.commit()
+    await course_search.refresh(db, [course_id])
+    await notify_course(db, course, "material", f"New lesson: {title}", f"{module.title} · {course.course_name}")
+    return {"message": "Lesson added successfully", "lesson": serialize_lesson(lesson)}
+
+
+@router.delete("/api/courses/{course_id}/modules/{module_id}/lessons/{lesson_id}")
+async def delete_lesson(
+    course_id: int,
+    module_id: int,
+    lesson_id: int,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    await course_version(db, course_id, current_user)
+    lesson_ids = select(Lesson.id).where(
+        Lesson.id == lesson_id,
+        Lesson.module_id.in_(select(Module.id).where(Module.id == module_id, Module.course_id == course_id)),
+    )
+    await forget_lessons(db, course_id, lesson_ids)
+    result = await db.execute(Lesson.__table__.delete().where(Lesson.id.in_(lesson_ids)))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    await touch_course(db, course_id, lessons=-1)
+    await db.commit()
+    await course_search.refresh(db, [course_id])
+    return {"message": "Lesson deleted successfully"}
@@ -0,0 +1,270 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.search.catalog import course_search
+from services.uploads.materials import store_upload_file
+from services.uploads.storage import UploadInterrupted, UploadTooLarge
+from shared import config
+from shared.auth import require_role
+from shared.db import SessionLocal, get_db, get_read_db
+from shared.models import Course, Enrollment, User
+from shared.pagination import Keyset, Projection, fetch_page, jsonable, page_response, stream_json_array
+from shared.response_cache import response_cache
+from shared.schemas import EnrollRequest
+from shared.token_cache import CachedUser
+
+from .access import get_course_or_404, get_teacher_course
+
+router = APIRouter(tags=["courses"])
+
+# Nombres de campo tal y como los usa el frontend
+COURSE_FIELDS = {
+    "_id": Course.id,
+    "courseName": Course.course_name,
+    "courseCode": Course.course_code,
+    "description": Course.description,
+    "category": Course.category,
+    "difficulty": Course.difficulty,
+    "duration": Course.duration,
+    "price": Course.price,
+    "maxStudents": Course.max_students,
+    "instructorName": Course.instructor_name,
+    "status": Course.status,
+    "thumbnailId": Course.thumbnail_id,
+    "teacherId": Course.teacher_id,
+    "createdAt": Course.created_at,
+}
+CATALOG = Projection(COURSE_FIELDS, default=(
+    "_id", "courseName", "courseCode", "description", "category", "difficulty",
+    "duration", "price", "maxStudents", "instructorName", "thumbnailId",
+))
+TEACHER_COURSES = Projection(COURSE_FIELDS, default=(
+    "_id", "courseName", "courseCode", "category", "duration", "maxStudents", "status", "createdAt",
+))
+ENROLLED_COURSES = Projection(
+    {**COURSE_FIELDS, "progress": Enrollment.progress, "enrolledAt": Enrollment.enrolled_at},
+    default=("_id", "courseName", "instructorName", "category", "duration", "progress"),
+)
+COURSE_STUDENTS = Projection(
+    {
+        "_id": User.id,
+        "username": User.username,
+        "email": User.email,
+        "progress": Enrollment.progress,
+        "enrolledAt": Enrollment.enrolled_at,
+    },
+    default=("_id", "username", "email", "progress"),
+)
+
+# Etiqueta de caché de getallcourses: crear o editar un curso la invalida
+CATALOG_TAG = "catalog"
+
+# Cada orden coincide con un índice: ix_courses_status_created,
+# ix_courses_teacher_created, uq_enrollments_course_student e ix_enrollments_student_course
+NEWEST_COURSES = Keyset(Course.created_at, Course.id, descending=True)
+BY_STUDENT = Keyset(Enrollment.student_id)
+BY_COURSE = Keyset(Enrollment.course_id)
+
+
+def page_size(limit: int = Query(config.PAGE_SIZE_DEFAULT, ge=1, le=config.PAGE_SIZE_MAX)):
+    return limit
+
+
+def serialize_course(course):
+    return {name: jsonable(getattr(course, column.key)) for name, column in COURSE_FIELDS.items()}
+
+
+def catalog_query(names):
+    return select(*CATALOG.columns(names)).where(Course.status == "active")
+
+
+def teacher_courses_query(names, user: CachedUser):
+    return select(*TEACHER_COURSES.columns(names)).where(Course.teacher_id == user.id)
+
+
+def course_students_query(names, course_id):
+    return (
+        select(*COURSE_STUDENTS.columns(names))
+        .select_from(Enrollment)
+        .join(User, User.id == Enrollment.student_id)
+        .where(Enrollment.course_id == course_id)
+    )
+
+
+def json_export(query, keyset, projection, names, filename):
+    return StreamingResponse(
+        stream_json_array(SessionLocal, query, keyset, projection, names),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/api/courses/addCourse")
+async def add_course(
+    course_name: str = Form(..., alias="courseName"),
+    course_code: str = Form(..., alias="courseCode"),
+    max_students: int = Form(0, alias="maxStudents"),
+    price: float = Form(0),
+    duration: str = Form(""),
+    difficulty: str = Form(""),
+    category: str = Form(""),
+    instructor_name: str = Form("", alias="instructorName"),
+    description: str = Form(""),
+    thumbnail: Optional[UploadFile] = File(None),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    thumbnail_id = None
+    if thumbnail is not None and thumbnail.filename:
+        if not (thumbnail.content_type or "").startswith("image/"):
+            raise HTTPException(status_code=400, detail="Thumbnail must be an image")
+        try:
+            material = await store_upload_file(db, thumbnail, current_user.id, config.UPLOAD_MAX_BYTES)
+        except UploadTooLarge:
+            raise HTTPException(status_code=413, detail="Thumbnail is too large")
+        except UploadInterrupted:
+            raise HTTPException(status_code=400, detail="Upload interrupted")
+        thumbnail_id = material.id
+
+    course = Course(
+        course_name=course_name,
+        course_code=course_code,
+        max_students=max_students,
+        price=price,
+        duration=duration,
+        difficulty=difficulty,
+        category=category,
+        instructor_name=instructor_name or current_user.username,
+        description=description,
+        thumbnail_id=thumbnail_id,
+        teacher_id=current_user.id,
+    )
+    db.add(course)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Course code already exists")
+    await course_search.refresh(db, [course.id])
+    await response_cache.invalidate(CATALOG_TAG)
+    return {"message": "Course created successfully", "course": serialize_course(course)}
+
+
+@router.get("/api/courses/getallcourses")
+@response_cache.cached(tags=(CATALOG_TAG,))
+async def get_all_courses(
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Depends(page_size),
+    # Primario: lo que se lee aquí se cachea, y una réplica atrasada guardaría el estado anterior
+    db: AsyncSession = Depends(get_db),
+):
+    names = CATALOG.parse(fields)
+    courses, next_cursor = await fetch_page(db, catalog_query(names), NEWEST_COURSES, CATALOG, names, cursor, limit)
+    return page_response("courses", courses, next_cursor)
+
+
+@router.get("/api/courses/teacher/courses")
+async def get_teacher_courses(
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    names = TEACHER_COURSES.parse(fields)
+    query = teacher_courses_query(names, current_user)
+    courses, next_cursor = await fetch_page(db, query, NEWEST_COURSES, TEACHER_COURSES, names, cursor, limit)
+    return page_response("courses", courses, next_cursor)
+
+
+@router.get("/api/courses/enrolled")
+async def get_enrolled_courses(
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    names = ENROLLED_COURSES.parse(fields)
+    query = (
+        select(*ENROLLED_COURSES.columns(names))
+        .select_from(Enrollment)
+        .join(Course, Course.id == Enrollment.course_id)
+        .where(Enrollment.student_id == current_user.id)
+    )
+    courses, next_cursor = await fetch_page(db, query, BY_COURSE, ENROLLED_COURSES, names, cursor, limit)
+    return page_response("courses", courses, next_cursor)
+
+
+@router.post("/api/courses/enroll")
+async def enroll_in_course(
+    data: EnrollRequest,
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_db),
+):
+    course = await get_course_or_404(db, data.courseId)
+    already_enrolled = await db.scalar(
+        select(Enrollment.id).where(Enrollment.course_id == course.id, Enrollment.student_id == current_user.id)
+    )
+    if already_enrolled:
+        raise HTTPException(status_code=400, detail="Already enrolled in this course")
+    if course.max_students:
+        enrolled = await db.scalar(select(func.count()).where(Enrollment.course_id == course.id))
+        if enrolled >= course.max_students:
+            raise HTTPException(status_code=400, detail="Course is full")
+    db.add(Enrollment(course_id=course.id, student_id=current_user.id))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Already enrolled in this course")
+    return {"message": "Successfully enrolled in the course", "courseId": course.id}
+
+
+@router.get("/api/courses/export")
+async def export_courses(
+    fields: Optional[str] = None,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+):
+    # Exportación completa en streaming: el administrador ve el catálogo, el profesor sus cursos
+    if current_user.role == "admin":
+        names = CATALOG.parse(fields)
+        return json_export(catalog_query(names), NEWEST_COURSES, CATALOG, names, "courses.json")
+    names = TEACHER_COURSES.parse(fields)
+    query = teacher_courses_query(names, current_user)
+    return json_export(query, NEWEST_COURSES, TEACHER_COURSES, names, "courses.json")
+
+
+@router.get("/api/courses/{course_id}/students")
+async def get_course_students(
+    course_id: int,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+    names = COURSE_STUDENTS.parse(fields)
+    query = course_students_query(names, course_id)
+    students, next_cursor = await fetch_page(db, query, BY_STUDENT, COURSE_STUDENTS, names, cursor, limit)
+    return page_response("students", students, next_cursor)
+
+
+@router.get("/api/courses/{course_id}/students/export")
+async def export_course_students(
+    course_id: int,
+    fields: Optional[str] = None,
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+    names = COURSE_STUDENTS.parse(fields)
+    query = course_students_query(names, course_id)
+    return json_export(query, BY_STUDENT, COURSE_STUDENTS, names, f"course-{course_id}-students.json")
@@ -0,0 +1 @@
+from services.notifications.routes import router
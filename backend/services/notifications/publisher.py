@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import false, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import Enrollment, Notification
+from shared.pagination import jsonable
+from shared.pubsub import broker
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def serialize_notification(notification):
+    """Mismo formato en GET /api/notifications/ y en los eventos en tiempo real"""
+    return {
+        "_id": notification.id,
+        "type": notification.type,
+        "title": notification.title,
+        "message": notification.message,
+        "course": notification.course_name,
+        "courseId": notification.course_id,
+        "read": notification.read,
+        "time": jsonable(notification.created_at),
+    }
+
+
+async def publish(user_id, event, data):
+    await broker.publish(user_channel(user_id), event, data)
+
+
+async def notify_users(db: AsyncSession, user_ids, type, title, message="", course=None):
+    """Crea una notificación por usuario, la confirma y la envía a sus conexiones abiertas"""
+    now = datetime.utcnow()
+    notifications = [
+        Notification(
+            user_id=user_id,
+            type=type,
+            title=title,
+            message=message,
+            course_id=course.id if course is not None else None,
+            course_name=course.course_name if course is not None else "",
+            read=False,
+            created_at=now,
+        )
+        for user_id in user_ids
+    ]
+    db.add_all(notifications)
+    await db.commit()
+    await broker.publish_many([
+        (user_channel(n.user_id), "notification", serialize_notification(n)) for n in notifications
+    ])
+    return notifications
+
+
+async def notify_course(db: AsyncSession, course, type, title, message=""):
+    """Notifica a todos los alumnos matriculados en ``course`` con un único INSERT ... SELECT"""
+    now = datetime.utcnow()
+    columns = ("user_id", "type", "title", "message", "course_id", "course_name", "read", "created_at")
+    rows = (await db.execute(
+        insert(Notification)
+        .from_select(columns, select(
+            Enrollment.student_id,
+            literal(type),
+            literal(title),
+            literal(message),
+            literal(course.id),
+            literal(course.course_name),
+            false(),
+            literal(now),
+        ).where(Enrollment.course_id == course.id))
+        .returning(Notification.id, Notification.user_id)
+    )).all()
+    await db.commit()
+    event = {
+        "type": type,
+        "title": title,
+        "message": message,
+        "course": course.course_name,
+        "courseId": course.id,
+        "read": False,
+        "time": jsonable(now),
+    }
+    await broker.publish_many([
+        (user_channel(user_id), "notification", {"_id": notification_id, **event})
+        for notification_id, user_id in rows
+    ])
+    return len(rows)
@@ -0,0 +1,201 @@
+import asyncio
+from typing import Optional
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config
+from shared.auth import get_current_user
+from shared.db import SessionLocal, get_db, get_read_db
+from shared.models import Notification
+from shared.pagination import Keyset
+from shared.pubsub import OVERFLOW, broker
+from shared.token_cache import CachedUser
+
+from .publisher import publish, serialize_notification, user_channel
+
+router = APIRouter(tags=["notifications"])
+
+# Más recientes primero · ix_notifications_user_id
+NEWEST_NOTIFICATIONS = Keyset(Notification.id, descending=True)
+
+
+async def unread_count(db: AsyncSession, user_id: int):
+    return await db.scalar(
+        select(func.count()).where(Notification.user_id == user_id, Notification.read.is_(False))
+    )
+
+
+def stream_token(authorization: Optional[str], token: Optional[str]):
+    # EventSource y WebSocket no permiten cabeceras propias: se acepta también ?token=
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    if token:
+        return token
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def open_stream(token: str):
+    """Autentica con el mismo JWT que get_current_user y comprueba el límite de conexiones.
+
+    La sesión de BD solo dura la autenticación: una conexión abierta durante
+    horas no retiene ninguna conexión del pool. La suscripción la abre quien
+    va a consumirla, dentro del bloque que la cierra: si el cliente se va
+    antes de empezar la respuesta no queda ninguna colgada.
+    """
+    async with SessionLocal() as db:
+        user = await get_current_user(token, db)
+        unread = await unread_count(db, user.id)
+    channel = user_channel(user.id)
+    if broker.subscribers(channel) >= config.NOTIFY_MAX_CONNECTIONS_PER_USER:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many open notification streams")
+    return channel, unread
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+async def sse_events(channel, unread):
+    subscription = broker.subscribe(channel)
+    try:
+        yield b"retry: 3000\n" + sse_message("ready", f'{{"unread_count":{unread}}}')
+        while True:
+            try:
+                message = await subscription.get(config.NOTIFY_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield b": ping\n\n"
+                continue
+            if message is OVERFLOW:
+                yield sse_message("resync", "{}")
+                return
+            yield sse_message(*message)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.get("/api/notifications/")
+async def get_notifications(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = NEWEST_NOTIFICATIONS.apply(
+        select(Notification).where(Notification.user_id == current_user.id), cursor, limit,
+    )
+    rows, next_cursor = NEWEST_NOTIFICATIONS.page((await db.execute(query)).all(), limit)
+    return {
+        "notifications": [serialize_notification(row.Notification) for row in rows],
+        "unread_count": await unread_count(db, current_user.id),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
+
+
+@router.get("/api/notifications/stream")
+async def notification_stream(request: Request, token: Optional[str] = None):
+    """Server-Sent Events: ``notification``, ``read``, ``read_all``, ``deleted`` y ``resync``"""
+    channel, unread = await open_stream(stream_token(request.headers.get("authorization"), token))
+    return StreamingResponse(
+        sse_events(channel, unread),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/api/notifications/ws")
+async def notification_socket(websocket: WebSocket, token: Optional[str] = None):
+    try:
+        channel, unread = await open_stream(stream_token(websocket.headers.get("authorization"), token))
+    except HTTPException as exc:
+        code = 1013 if exc.status_code == status.HTTP_429_TOO_MANY_REQUESTS else 1008
+        await websocket.close(code=code)
+        return
+
+    async def receive_until_closed(cancel_scope):
+        # El cliente no envía nada útil; leer es lo que detecta la desconexión
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            cancel_scope.cancel()
+
+    async def send_events(cancel_scope):
+        await websocket.send_text(f'{{"event":"ready","data":{{"unread_count":{unread}}}}}')
+        while True:
+            message = await subscription.get()
+            if message is OVERFLOW:
+                await websocket.send_text('{"event":"resync","data":{}}')
+                await websocket.close(code=1013)
+                cancel_scope.cancel()
+                return
+            event, data = message
+            await websocket.send_text(f'{{"event":"{event}","data":{data}}}')
+
+    subscription = broker.subscribe(channel)
+    try:
+        await websocket.accept()
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(receive_until_closed, tasks.cancel_scope)
+            tasks.start_soon(send_events, tasks.cancel_scope)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@router.post("/api/notifications/mark-read/{notification_id}")
+async def mark_read(
+    notification_id: int,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.id == notification_id, Notification.user_id == current_user.id)
+        .values(read=True)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    await db.commit()
+    # Las demás pestañas del usuario se actualizan sin volver a pedir la lista
+    await publish(current_user.id, "read", {"ids": [notification_id]})
+    return {"message": "Notification marked as read"}
+
+
+@router.post("/api/notifications/mark-all-read")
+async def mark_all_read(
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        update(Notification)
+        .where(Notification.user_id == current_user.id, Notification.read.is_(False))
+        .values(read=True)
+    )
+    await db.commit()
+    await publish(current_user.id, "read_all", {})
+    return {"message": "All notifications marked as read", "updated": result.rowcount}
+
+
+@router.delete("/api/notifications/{notification_id}")
+async def delete_notification(
+    notification_id: int,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        delete(Notification).where(Notification.id == notification_id, Notification.user_id == current_user.id)
+    )
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Notification not found")
+    await db.commit()
+    await publish(current_user.id, "deleted", {"ids": [notification_id]})
+    return {"message": "Notification deleted"}
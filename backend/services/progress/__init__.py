@@ -0,0 +1 @@
+from services.progress.routes import router
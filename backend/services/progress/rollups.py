@@ -0,0 +1,221 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.attendance.rollups import STATUS_COLUMNS, batches
+from shared.db import upsert
+from shared.models import (
+    Assignment,
+    Attendance,
+    AttendanceSummary,
+    Course,
+    Enrollment,
+    Lesson,
+    LessonCompletion,
+    Module,
+    StudentProgress,
+    Submission,
+)
+
+PROGRESS_COUNTERS = ("lessons_completed", "submitted", "graded", "grade_total")
+
+
+def grade_percent(score, max_score):
+    return score * 100 / max_score if max_score else 0.0
+
+
+def average_grade(grade_total, graded):
+    return round(grade_total / graded, 1) if graded else None
+
+
+def progress_percent(completed, lesson_count):
+    return round(min(completed, lesson_count) * 100 / lesson_count, 1) if lesson_count else 0.0
+
+
+def grade_delta(old_score, new_score, max_score):
+    """Cambio de los contadores al pasar la nota de ``old_score`` (None si no estaba calificada) a ``new_score``"""
+    old = grade_percent(old_score, max_score) if old_score is not None else 0.0
+    return {
+        "graded": 1 if old_score is None else 0,
+        "grade_total": grade_percent(new_score, max_score) - old,
+    }
+
+
+async def apply_progress_deltas(db: AsyncSession, course_id, deltas):
+    """Suma ``deltas`` ({student_id: {contador: delta}}) a los agregados con un único upsert multi-fila.
+
+    Quien llama hace commit, en la misma transacción que el cambio que origina los deltas.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "student_id": student_id,
+            "course_id": course_id,
+            **{column: delta.get(column, 0) for column in PROGRESS_COUNTERS},
+            "updated_at": now,
+        }
+        for student_id, delta in deltas.items()
+        if any(delta.values())
+    ]
+    table = StudentProgress.__table__
+    for batch in batches(rows):
+        stmt = upsert(db, table).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["student_id", "course_id"],
+            set_={
+                **{column: table.c[column] + stmt.excluded[column] for column in PROGRESS_COUNTERS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
+
+
+async def forget_lessons(db: AsyncSession, course_id, lesson_ids):
+    """Descuenta las lecciones completadas de ``lesson_ids`` (consulta o lista) antes de borrarlas.
+
+    Las filas de lesson_completions desaparecen con el borrado en cascada de la lección.
+    """
+    rows = (await db.execute(
+        select(LessonCompletion.student_id, func.count())
+        .where(LessonCompletion.lesson_id.in_(lesson_ids))
+        .group_by(LessonCompletion.student_id)
+    )).all()
+    await apply_progress_deltas(
+        db, course_id, {student_id: {"lessons_completed": -count} for student_id, count in rows},
+    )
+
+
+async def forget_assignment(db: AsyncSession, assignment):
+    """Descuenta las entregas y notas de una tarea antes de borrarla"""
+    rows = (await db.execute(
+        select(Submission.student_id, Submission.score).where(Submission.assignment_id == assignment.id)
+    )).all()
+    deltas = {}
+    for student_id, score in rows:
+        deltas[student_id] = {"submitted": -1}
+        if score is not None:
+            deltas[student_id].update(graded=-1, grade_total=-grade_percent(score, assignment.max_score))
+    await apply_progress_deltas(db, assignment.course_id, deltas)
+
+
+async def refresh_enrollment_progress(db: AsyncSession, course_ids, student_ids=None):
+    """Recalcula ``Enrollment.progress`` desde student_progress y ``Course.lesson_count``.
+
+    Hace falta cada vez que cambia el número de lecciones: el porcentaje de
+    todos los matriculados cambia aunque nadie haya completado nada. Es la
+    única fórmula del progreso guardado (como ``progress_percent``: completadas
+    topadas al total, un decimal, 0 sin lecciones), también al completar una
+    lección (``student_ids``), para que no dependa de qué camino escribió último.
+    """
+    lesson_count = select(Course.lesson_count).where(Course.id == Enrollment.course_id).scalar_subquery()
+    completed = func.coalesce(
+        select(StudentProgress.lessons_completed)
+        .where(
+            StudentProgress.student_id == Enrollment.student_id,
+            StudentProgress.course_id == Enrollment.course_id,
+        )
+        .scalar_subquery(),
+        0,
+    )
+    capped = case((completed > lesson_count, lesson_count), else_=completed)
+    query = update(Enrollment).where(Enrollment.course_id.in_(course_ids))
+    if student_ids is not None:
+        query = query.where(Enrollment.student_id.in_(student_ids))
+    await db.execute(
+        query
+        .values(progress=case(
+            (lesson_count > 0, func.round(capped * 100.0 / lesson_count, 1)),
+            else_=literal(0.0),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def rebuild_course_rollups(db: AsyncSession, course_ids):
+    """Recalcula desde cero los agregados de un lote de cursos con sentencias de conjunto.
+
+    Por lote: un UPDATE para ``lesson_count``, un DELETE + INSERT ... SELECT con
+    GROUP BY para student_progress y otro para attendance_summaries. Quien llama
+    hace commit; cada lote queda así en una sola transacción.
+    """
+    course_ids = list(course_ids)
+
+    await db.execute(
+        update(Course)
+        .where(Course.id.in_(course_ids))
+        .values(lesson_count=(
+            select(func.count(Lesson.id))
+            .join(Module, Module.id == Lesson.module_id)
+            .where(Module.course_id == Course.id)
+            .scalar_subquery()
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+    completions = (
+        select(LessonCompletion.student_id, LessonCompletion.course_id, func.count().label("lessons_completed"))
+        .where(LessonCompletion.course_id.in_(course_ids))
+        .group_by(LessonCompletion.student_id, LessonCompletion.course_id)
+        .subquery()
+    )
+    percent = case(
+        (Assignment.max_score > 0, Submission.score * 100.0 / Assignment.max_score),
+        else_=literal(0.0),
+    )
+    grades = (
+        select(
+            Submission.student_id,
+            Assignment.course_id,
+            func.count(Submission.id).label("submitted"),
+            func.count(Submission.score).label("graded"),
+            func.coalesce(func.sum(percent), 0.0).label("grade_total"),
+        )
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .where(Assignment.course_id.in_(course_ids))
+        .group_by(Submission.student_id, Assignment.course_id)
+        .subquery()
+    )
+    await db.execute(delete(StudentProgress).where(StudentProgress.course_id.in_(course_ids)))
+    progress = await db.execute(
+        insert(StudentProgress).from_select(
+            ["student_id", "course_id", *PROGRESS_COUNTERS, "updated_at"],
+            select(
+                Enrollment.student_id,
+                Enrollment.course_id,
+                func.coalesce(completions.c.lessons_completed, 0),
+                func.coalesce(grades.c.submitted, 0),
+                func.coalesce(grades.c.graded, 0),
+                func.coalesce(grades.c.grade_total, 0.0),
+                literal(datetime.utcnow()),
+            )
+            .outerjoin(completions, (completions.c.student_id == Enrollment.student_id)
+                       & (completions.c.course_id == Enrollment.course_id))
+            .outerjoin(grades, (grades.c.student_id == Enrollment.student_id)
+                       & (grades.c.course_id == Enrollment.course_id))
+            .where(Enrollment.course_id.in_(course_ids)),
+        )
+    )
+
+    await refresh_enrollment_progress(db, course_ids)
+
+    counters = [
+        func.sum(case((Attendance.status == status, 1), else_=0)).label(column)
+        for status, column in STATUS_COLUMNS.items()
+    ]
+    await db.execute(delete(AttendanceSummary).where(AttendanceSummary.course_id.in_(course_ids)))
+    attendance = await db.execute(
+        insert(AttendanceSummary).from_select(
+            ["student_id", "course_id", *STATUS_COLUMNS.values(), "total", "last_date"],
+            select(
+                Attendance.student_id,
+                Attendance.course_id,
+                *counters,
+                func.count(),
+                func.max(Attendance.date),
+            )
+            .where(Attendance.course_id.in_(course_ids))
+            .group_by(Attendance.student_id, Attendance.course_id),
+        )
+    )
+    return progress.rowcount, attendance.rowcount
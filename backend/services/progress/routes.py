@@ -0,0 +1,202 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import and_, case, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.attendance.rollups import attendance_rate
+from services.courses.access import enrolled_student_ids, get_teacher_course
+from services.courses.routes import BY_STUDENT, page_size
+from shared.auth import require_role
+from shared.db import get_db, get_read_db, upsert
+from shared.models import (
+    AttendanceSummary,
+    Course,
+    Enrollment,
+    Lesson,
+    LessonCompletion,
+    Module,
+    StudentProgress,
+    User,
+)
+from shared.pagination import Projection, fetch_page, page_response
+from shared.token_cache import CachedUser
+
+from .rollups import apply_progress_deltas, average_grade, progress_percent, refresh_enrollment_progress
+
+router = APIRouter(tags=["progress"])
+
+
+def counter(column):
+    # Sin fila en el agregado (alumno sin actividad) cuenta como cero
+    return func.coalesce(column, 0)
+
+
+COMPLETED = counter(StudentProgress.lessons_completed)
+GRADED = counter(StudentProgress.graded)
+ATTENDED = counter(AttendanceSummary.present) + counter(AttendanceSummary.late)
+ATTENDANCE_TOTAL = counter(AttendanceSummary.total)
+
+# Columnas del panel de notas del profesor: un alumno por fila
+COURSE_PROGRESS = Projection(
+    {
+        "_id": User.id,
+        "username": User.username,
+        "email": User.email,
+        "completed": COMPLETED,
+        "total": Course.lesson_count,
+        "progress": case(
+            (Course.lesson_count > 0, func.round(COMPLETED * 100.0 / Course.lesson_count, 1)), else_=literal(0.0),
+        ),
+        "submitted": counter(StudentProgress.submitted),
+        "graded": GRADED,
+        "averageGrade": case((GRADED > 0, func.round(StudentProgress.grade_total / GRADED, 1)), else_=None),
+        "attendanceRate": case(
+            (ATTENDANCE_TOTAL > 0, func.round(ATTENDED * 100.0 / ATTENDANCE_TOTAL, 1)), else_=literal(0.0),
+        ),
+    },
+    default=("_id", "username", "completed", "total", "progress", "graded", "averageGrade", "attendanceRate"),
+)
+
+
+def with_rollups(query):
+    """Une la matrícula con sus dos agregados por clave primaria (alumno, curso)"""
+    return (
+        query
+        .outerjoin(StudentProgress, and_(
+            StudentProgress.student_id == Enrollment.student_id,
+            StudentProgress.course_id == Enrollment.course_id,
+        ))
+        .outerjoin(AttendanceSummary, and_(
+            AttendanceSummary.student_id == Enrollment.student_id,
+            AttendanceSummary.course_id == Enrollment.course_id,
+        ))
+    )
+
+
+@router.post("/api/progress/lessons/{lesson_id}/complete")
+async def complete_lesson(
+    lesson_id: int,
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_db),
+):
+    lesson = (await db.execute(
+        select(Lesson.id, Module.course_id, Course.lesson_count)
+        .join(Module, Module.id == Lesson.module_id)
+        .join(Course, Course.id == Module.course_id)
+        .where(Lesson.id == lesson_id)
+    )).first()
+    if lesson is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    if not await enrolled_student_ids(db, lesson.course_id, [current_user.id]):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
+    # Idempotente: completar dos veces la misma lección no suma dos veces
+    result = await db.execute(
+        upsert(db, LessonCompletion.__table__)
+        .values(student_id=current_user.id, lesson_id=lesson.id, course_id=lesson.course_id,
+                completed_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["student_id", "lesson_id"])
+    )
+    if result.rowcount:
+        await apply_progress_deltas(db, lesson.course_id, {current_user.id: {"lessons_completed": 1}})
+    completed = await db.scalar(
+        select(StudentProgress.lessons_completed).where(
+            StudentProgress.student_id == current_user.id, StudentProgress.course_id == lesson.course_id,
+        )
+    ) or 0
+    await refresh_enrollment_progress(db, [lesson.course_id], [current_user.id])
+    progress = await db.scalar(
+        select(Enrollment.progress).where(
+            Enrollment.course_id == lesson.course_id, Enrollment.student_id == current_user.id,
+        )
+    )
+    await db.commit()
+    return {
+        "message": "Lesson completed",
+        "completed": completed,
+        "total": lesson.lesson_count,
+        "progress": progress,
+    }
+
+
+@router.get("/api/progress/student")
+async def student_progress(
+    current_user: CachedUser = Depends(require_role("student")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Progreso, nota media y asistencia por curso: una fila precalculada por matrícula"""
+    rows = (await db.execute(
+        with_rollups(
+            select(
+                Course.id,
+                Course.course_name,
+                Course.instructor_name,
+                Course.lesson_count,
+                StudentProgress.lessons_completed,
+                StudentProgress.submitted,
+                StudentProgress.graded,
+                StudentProgress.grade_total,
+                AttendanceSummary.present,
+                AttendanceSummary.late,
+                AttendanceSummary.total,
+            )
+            .select_from(Enrollment)
+            .join(Course, Course.id == Enrollment.course_id)
+        )
+        .where(Enrollment.student_id == current_user.id)
+        .order_by(Enrollment.course_id)
+    )).all()
+
+    courses = []
+    for row in rows:
+        completed = row.lessons_completed or 0
+        courses.append({
+            "_id": row.id,
+            "title": row.course_name,
+            "instructor": row.instructor_name,
+            "completed": completed,
+            "total": row.lesson_count,
+            "progress": progress_percent(completed, row.lesson_count),
+            "submitted": row.submitted or 0,
+            "graded": row.graded or 0,
+            "score": average_grade(row.grade_total or 0, row.graded or 0),
+            "attendanceRate": attendance_rate(row.present or 0, row.late or 0, row.total or 0),
+        })
+    completed = sum(course["completed"] for course in courses)
+    total = sum(course["total"] for course in courses)
+    graded = sum(row.graded or 0 for row in rows)
+    return {
+        "courses": courses,
+        "overall": {
+            "completed": completed,
+            "total": total,
+            "progress": progress_percent(completed, total),
+            "score": average_grade(sum(row.grade_total or 0 for row in rows), graded),
+        },
+    }
+
+
+@router.get("/api/progress/course/{course_id}")
+async def course_progress(
+    course_id: int,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Depends(page_size),
+    current_user: CachedUser = Depends(require_role("teacher", "admin")),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await get_teacher_course(db, course_id, current_user)
+    names = COURSE_PROGRESS.parse(fields)
+    query = (
+        with_rollups(
+            select(*COURSE_PROGRESS.columns(names))
+            .select_from(Enrollment)
+            .join(User, User.id == Enrollment.student_id)
+            .join(Course, Course.id == Enrollment.course_id)
+        )
+        .where(Enrollment.course_id == course_id)
+    )
+    students, next_cursor = await fetch_page(db, query, BY_STUDENT, COURSE_PROGRESS, names, cursor, limit)
+    return page_response("students", students, next_cursor)
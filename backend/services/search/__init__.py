@@ -0,0 +1,2 @@
+from services.search.catalog import course_search
+from services.search.routes import router
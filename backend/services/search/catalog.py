@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config
+from shared.models import Course, Lesson, Module
+
+from .index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Cursos por consulta IN al cargar documentos
+LOAD_BATCH_SIZE = 500
+
+# Peso de cada campo en el ranking: el nombre y el código pesan más que el temario
+COURSE_FIELDS = {
+    "name": 3.0,
+    "code": 3.0,
+    "category": 1.5,
+    "instructor": 1.5,
+    "difficulty": 1.0,
+    "description": 1.0,
+    "syllabus": 1.0,
+}
+
+
+async def load_course_documents(db: AsyncSession, course_ids):
+    """{course_id: (versión, documento)} de los cursos activos de ``course_ids``.
+
+    Tres consultas por lote: cursos, módulos y lecciones; el temario es el
+    texto de módulos y lecciones concatenado.
+    """
+    documents = {}
+    course_ids = list(course_ids)
+    for start in range(0, len(course_ids), LOAD_BATCH_SIZE):
+        batch = course_ids[start:start + LOAD_BATCH_SIZE]
+        courses = (await db.execute(
+            select(
+                Course.id, Course.version, Course.course_name, Course.course_code, Course.category,
+                Course.instructor_name, Course.difficulty, Course.description,
+            )
+            .where(Course.id.in_(batch), Course.status == "active")
+        )).all()
+        if not courses:
+            continue
+        ids = [course.id for course in courses]
+        syllabus = defaultdict(list)
+        modules = await db.execute(
+            select(Module.course_id, Module.title, Module.description).where(Module.course_id.in_(ids))
+        )
+        lessons = await db.execute(
+            select(Module.course_id, Lesson.title, Lesson.description)
+            .join(Module, Module.id == Lesson.module_id)
+            .where(Module.course_id.in_(ids))
+        )
+        for course_id, title, description in [*modules.all(), *lessons.all()]:
+            syllabus[course_id].extend((title, description or ""))
+        for course in courses:
+            documents[course.id] = (course.version, {
+                "name": course.course_name,
+                "code": course.course_code,
+                "category": course.category,
+                "instructor": course.instructor_name,
+                "difficulty": course.difficulty,
+                "description": course.description,
+                "syllabus": " ".join(syllabus[course.id]),
+            })
+    return documents
+
+
+class CourseSearch:
+    """Índice de búsqueda del catálogo de cursos activos, respaldado por la BD.
+
+    Las rutas que crean o modifican un curso, sus módulos o sus lecciones
+    llaman a ``refresh`` tras el commit y el índice del proceso se actualiza
+    al momento. ``sync`` compara ``Course.version`` de todos los cursos con la
+    indexada y recarga solo los que cambiaron, así cada worker recoge los
+    cambios hechos por los demás.
+    """
+
+    def __init__(self, sync_seconds=30.0):
+        self.index = SearchIndex(COURSE_FIELDS)
+        self.sync_seconds = sync_seconds
+        self._versions = {}
+        self._task = None
+        self.queries = 0
+        self.refreshed = 0
+        self.synced_at = None
+
+    def _apply(self, course_ids, documents):
+        for course_id in course_ids:
+            loaded = documents.get(course_id)
+            if loaded is None:
+                # Ya no está activo (o no existe): fuera del catálogo
+                self.index.remove(course_id)
+                self._versions.pop(course_id, None)
+            else:
+                version, document = loaded
+                self.index.add(course_id, document)
+                self._versions[course_id] = version
+        self.refreshed += len(course_ids)
+
+    async def refresh(self, db: AsyncSession, course_ids):
+        """Reindexa ``course_ids`` desde la BD (tras crear o modificar el curso)"""
+        course_ids = list(course_ids)
+        self._apply(course_ids, await load_course_documents(db, course_ids))
+
+    async def sync(self, db: AsyncSession):
+        """Recarga los cursos cuya versión no coincide con la indexada y quita los inactivos"""
+        current = dict((await db.execute(
+            select(Course.id, Course.version).where(Course.status == "active")
+        )).all())
+        stale = [course_id for course_id, version in current.items() if self._versions.get(course_id) != version]
+        gone = [course_id for course_id in self._versions if course_id not in current]
+        if stale:
+            self._apply(stale, await load_course_documents(db, stale))
+        if gone:
+            self._apply(gone, {})
+        self.synced_at = time.time()
+        return len(stale) + len(gone)
+
+    def search(self, query, limit=10):
+        self.queries += 1
+        return self.index.search(query, limit)
+
+    async def start(self, session_factory):
+        # Carga completa al arrancar y después sincronización periódica en segundo plano
+        async with session_factory() as db:
+            await self.sync(db)
+        if self.sync_seconds > 0:
+            self._task = asyncio.create_task(self._sync_loop(session_factory))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sync_loop(self, session_factory):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                async with session_factory() as db:
+                    await self.sync(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Course search index sync failed, retrying")
+
+    def stats(self):
+        return {
+            **self.index.stats(),
+            "queries": self.queries,
+            "refreshed": self.refreshed,
+            "synced_at": self.synced_at,
+        }
+
+
+course_search = CourseSearch(sync_seconds=config.SEARCH_SYNC_SECONDS)
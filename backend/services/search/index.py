@@ -0,0 +1,202 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Por debajo de estas longitudes no se expande: "a" o "py" casarían con medio vocabulario
+MIN_PREFIX = 2
+MIN_FUZZY = 4
+MAX_PREFIX_TERMS = 50
+# Las coincidencias aproximadas puntúan menos que la palabra exacta
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+
+
+def normalize(text):
+    # Sin mayúsculas ni tildes: "Programación" y "programacion" son el mismo término
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text)) if text else []
+
+
+def deletes(term):
+    """Variantes de ``term`` con una letra menos (índice de erratas tipo SymSpell)"""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """Distancia de edición (con transposición) de ``a`` a ``b`` como mucho 1"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la == lb:
+        diff = [i for i in range(la) if a[i] != b[i]]
+        if len(diff) == 1:
+            return True
+        return len(diff) == 2 and diff[1] == diff[0] + 1 and a[diff[0]] == b[diff[1]] and a[diff[1]] == b[diff[0]]
+    if la > lb:
+        a, b = b, a
+    # b tiene una letra más: quitarla en la primera diferencia debe dar a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+class SearchIndex:
+    """Índice invertido en memoria con ranking BM25 por campos ponderados.
+
+    - ``postings``: término -> {documento: frecuencia ponderada por campo}.
+    - Vocabulario ordenado para expandir prefijos con ``bisect``.
+    - Mapa de borrados (una letra menos -> términos) para encontrar en O(1)
+      los términos a una errata de distancia.
+
+    ``add`` sustituye el documento si ya existía, así que las actualizaciones
+    son incrementales. Sin locks: se usa desde el event loop y ninguna
+    operación cede el control a mitad.
+    """
+
+    def __init__(self, fields, k1=1.2, b=0.75):
+        self.fields = fields  # {campo: peso}
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_length = {}
+        self.total_length = 0.0
+        self._vocabulary = []
+        self._deletes = defaultdict(set)
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_terms
+
+    def add(self, doc_id, document):
+        """Indexa ``document`` ({campo: texto}) como ``doc_id``, sustituyendo la versión anterior"""
+        self.remove(doc_id)
+        terms = defaultdict(float)
+        for field, weight in self.fields.items():
+            for token in tokenize(document.get(field)):
+                terms[token] += weight
+        for term, frequency in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                self._add_term(term)
+            posting[doc_id] = frequency
+        self.doc_terms[doc_id] = terms
+        self.doc_length[doc_id] = length = sum(terms.values())
+        self.total_length += length
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        for term in terms:
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+                self._remove_term(term)
+        self.total_length -= self.doc_length.pop(doc_id)
+        return True
+
+    def _add_term(self, term):
+        insort(self._vocabulary, term)
+        if len(term) >= MIN_FUZZY - 1:
+            for variant in deletes(term):
+                self._deletes[variant].add(term)
+
+    def _remove_term(self, term):
+        position = bisect_left(self._vocabulary, term)
+        del self._vocabulary[position]
+        if len(term) >= MIN_FUZZY - 1:
+            for variant in deletes(term):
+                similar = self._deletes[variant]
+                similar.discard(term)
+                if not similar:
+                    del self._deletes[variant]
+
+    def _prefixed(self, prefix):
+        terms = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            terms.append(self._vocabulary[position])
+            position += 1
+        # Con prefijos muy comunes, los términos que más documentos tienen
+        if len(terms) > MAX_PREFIX_TERMS:
+            terms = heapq.nlargest(MAX_PREFIX_TERMS, terms, key=lambda term: len(self.postings[term]))
+        return terms
+
+    def _similar(self, token):
+        candidates = set(self._deletes.get(token, ()))
+        for variant in deletes(token):
+            if variant in self.postings:
+                candidates.add(variant)
+            candidates.update(self._deletes.get(variant, ()))
+        return [term for term in candidates if term != token and within_one_edit(token, term)]
+
+    def expand(self, token, prefix):
+        """Términos del índice que cuentan como ``token``: {término: peso}"""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if prefix and len(token) >= MIN_PREFIX:
+            for term in self._prefixed(token):
+                matches.setdefault(term, PREFIX_WEIGHT)
+        # Erratas solo si la palabra no existe tal cual: "pyton" -> "python", pero "java" no busca "lava"
+        if token not in self.postings and len(token) >= MIN_FUZZY:
+            for term in self._similar(token):
+                matches.setdefault(term, FUZZY_WEIGHT)
+        return matches
+
+    def _bm25(self, frequency, doc_id, idf, average_length):
+        norm = self.k1 * (1 - self.b + self.b * self.doc_length[doc_id] / average_length)
+        return idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+    def search(self, query, limit=10, prefix=True):
+        """Los ``limit`` mejores documentos para ``query``: [(doc_id, puntuación)].
+
+        Cada palabra aporta su mejor coincidencia (exacta, prefijo o errata);
+        la última admite prefijo porque el usuario aún la está escribiendo.
+        Primero van los documentos que contienen más palabras de la consulta.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self.doc_terms:
+            return []
+        count = len(self.doc_terms)
+        average_length = self.total_length / count or 1.0
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        for position, token in enumerate(tokens):
+            best = {}
+            for term, weight in self.expand(token, prefix and position == len(tokens) - 1).items():
+                posting = self.postings[term]
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, frequency in posting.items():
+                    score = weight * self._bm25(frequency, doc_id, idf, average_length)
+                    if score > best.get(doc_id, 0.0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+                matched[doc_id] += 1
+        top = heapq.nlargest(limit, scores, key=lambda doc_id: (matched[doc_id], scores[doc_id]))
+        return [(doc_id, scores[doc_id]) for doc_id in top]
+
+    def stats(self):
+        return {
+            "documents": len(self.doc_terms),
+            "terms": len(self.postings),
+            "fuzzy_keys": len(self._deletes),
+        }
@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.courses import routes as catalog
+from shared import config
+from shared.db import get_read_db
+from shared.models import Course
+
+from .catalog import course_search
+
+# Se importa el módulo y no sus nombres: services.courses importa a su vez el índice
+router = APIRouter(tags=["search"])
+
+
+@router.get("/api/search/courses")
+async def search_courses(
+    q: str = Query(..., min_length=1, max_length=200),
+    fields: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=config.SEARCH_MAX_RESULTS),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Los ``limit`` cursos del catálogo que mejor encajan con ``q`` (prefijos y erratas incluidos).
+
+    El ranking sale del índice en memoria; la BD solo aporta los campos de
+    esos ``limit`` cursos, en una consulta por clave primaria.
+    """
+    results = course_search.search(q, limit)
+    scores = {course_id: round(score, 4) for course_id, score in results}
+    names = catalog.CATALOG.parse(fields)
+    if not scores or names == ("_id",):
+        courses = [{"_id": course_id, "score": score} for course_id, score in scores.items()]
+        return {"courses": courses, "ids": list(scores)}
+
+    selected = names if "_id" in names else ("_id", *names)
+    rows = (await db.execute(catalog.catalog_query(selected).where(Course.id.in_(scores)))).all()
+    by_id = {row._mapping["_id"]: row for row in rows}
+    # Orden del ranking; un curso desactivado entre la búsqueda y la consulta simplemente no sale
+    ids = [course_id for course_id in scores if course_id in by_id]
+    courses = [{**catalog.CATALOG.to_dict(by_id[course_id], names), "score": scores[course_id]} for course_id in ids]
+    return {"courses": courses, "ids": ids}
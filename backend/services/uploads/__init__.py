@@ -0,0 +1 @@
+from services.uploads.routes import router
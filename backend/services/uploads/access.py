@@ -0,0 +1,60 @@
+from sqlalchemy import exists, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.models import Assignment, Certificate, Course, Enrollment, Lesson, Module, Submission
+from shared.token_cache import CachedUser
+
+
+async def can_read_material(db: AsyncSession, material_id: int, user: CachedUser):
+    """Si ``user`` puede descargar el material, según lo que lo referencia.
+
+    ``Material.uploaded_by`` no sirve: las subidas se deduplican por hash y el
+    mismo material puede ser la entrega de un alumno y el fichero de otro.
+
+    - Miniatura de un curso: cualquier usuario (el catálogo es público).
+    - Lección o enunciado de una tarea: matriculados y profesor del curso.
+    - Entrega: quien la entregó y el profesor del curso.
+    - Certificado: su alumno y el profesor del curso.
+
+    Un material que nada referencia no lo descarga nadie.
+    """
+    if user.role == "admin":
+        return await db.scalar(select(exists().where(or_(
+            exists().where(Course.thumbnail_id == material_id),
+            exists().where(Lesson.material_id == material_id),
+            exists().where(Assignment.attachment_id == material_id),
+            exists().where(Submission.material_id == material_id),
+            exists().where(Certificate.material_id == material_id),
+        ))))
+
+    enrolled = select(Enrollment.course_id).where(Enrollment.student_id == user.id)
+    member = or_(Course.teacher_id == user.id, Course.id.in_(enrolled))
+    lesson = (
+        select(Lesson.id)
+        .join(Module, Module.id == Lesson.module_id)
+        .join(Course, Course.id == Module.course_id)
+        .where(Lesson.material_id == material_id, member)
+    )
+    attachment = (
+        select(Assignment.id)
+        .join(Course, Course.id == Assignment.course_id)
+        .where(Assignment.attachment_id == material_id, member)
+    )
+    submission = (
+        select(Submission.id)
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .join(Course, Course.id == Assignment.course_id)
+        .where(Submission.material_id == material_id,
+               or_(Submission.student_id == user.id, Course.teacher_id == user.id))
+    )
+    certificate = (
+        select(Certificate.id)
+        .join(Course, Course.id == Certificate.course_id)
+        .where(Certificate.material_id == material_id,
+               or_(Certificate.student_id == user.id, Course.teacher_id == user.id))
+    )
+    thumbnail = select(Course.id).where(Course.thumbnail_id == material_id)
+    # Una sola consulta: EXISTS de cada referencia
+    return await db.scalar(select(or_(*(query.exists() for query in (
+        thumbnail, lesson, attachment, submission, certificate,
+    )))))
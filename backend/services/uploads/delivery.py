@@ -0,0 +1,222 @@
+import mmap
+import os
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+from urllib.parse import quote
+
+from fastapi import Request, status
+from fastapi.responses import FileResponse, Response
+
+from shared import config
+from shared.http import etag_matches
+from shared.metrics import MATERIAL_RESPONSES
+
+from .storage import object_store
+
+SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+MAPPED_CHUNK_SIZE = 256 * 1024
+
+
+def _map_file(path):
+    # El descriptor se puede cerrar: el mapeo sigue siendo válido
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class HotFileCache:
+    """Materiales más pedidos mapeados en memoria (mmap), con expulsión LRU por bytes.
+
+    Un fichero entra en la caché a partir de su ``admit_after``-ésima petición,
+    así los materiales que abre una sola persona no desplazan a los que abre
+    toda la clase. Expulsar un mapeo solo suelta la referencia: las respuestas
+    que todavía lo están enviando lo mantienen vivo hasta terminar.
+    """
+
+    def __init__(self, max_bytes, max_file_bytes, admit_after=2, max_tracked=4096):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.admit_after = admit_after
+        self.max_tracked = max_tracked
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._maps = OrderedDict()
+        self._seen = OrderedDict()
+
+    def get(self, sha256, path, size):
+        entry = self._maps.get(sha256)
+        if entry is not None:
+            self._maps.move_to_end(sha256)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        if not 0 < size <= self.max_file_bytes or size > self.max_bytes:
+            return None
+        count = self._seen.pop(sha256, 0) + 1
+        if count < self.admit_after:
+            self._seen[sha256] = count
+            while len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+            return None
+        try:
+            entry = _map_file(path)
+        except (OSError, ValueError):
+            return None
+        self._maps[sha256] = entry
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._maps.popitem(last=False)
+            self.bytes -= len(evicted)
+        return entry
+
+    def clear(self):
+        self._maps.clear()
+        self._seen.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            "files": len(self._maps),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class MappedFileResponse(Response):
+    """Respuesta que envía un rango de un mmap por trozos, sin hilos ni lecturas de fichero"""
+
+    def __init__(self, mapped, start, end, status_code, headers, media_type):
+        self.mapped = mapped
+        self.start = start
+        self.end = end
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.headers["content-length"] = str(end - start)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD" or self.start == self.end:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        position = self.start
+        while position < self.end:
+            stop = min(position + MAPPED_CHUNK_SIZE, self.end)
+            await send({
+                "type": "http.response.body",
+                "body": self.mapped[position:stop],
+                "more_body": stop < self.end,
+            })
+            position = stop
+
+
+def single_range(range_header, size):
+    """(start, end) de un único rango ``bytes=`` satisfacible, o None"""
+    match = SINGLE_RANGE.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(size, int(last) + 1) if last else size
+    if start >= end or start >= size:
+        return None
+    return start, end
+
+
+def material_headers(material, etag):
+    disposition = f"inline; filename*=utf-8''{quote(material.filename)}"
+    return {
+        "etag": etag,
+        # El contenido de un Material no cambia nunca: su ETag es el propio hash
+        "cache-control": "private, max-age=31536000, immutable",
+        "content-disposition": disposition,
+        "accept-ranges": "bytes",
+    }
+
+
+def material_response(request: Request, material):
+    """Respuesta de descarga de un Material con ETag, Range y envío sin copias.
+
+    Orden de preferencia: 304 si el cliente ya lo tiene; X-Accel-Redirect si
+    hay un proxy delante (nginx sirve el fichero con sendfile); mmap para los
+    ficheros calientes; y FileResponse para el resto, que usa
+    ``http.response.pathsend`` cuando el servidor ASGI lo soporta.
+    """
+    etag = f'"{material.sha256}"'
+    headers = material_headers(material, etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        MATERIAL_RESPONSES.labels("not_modified").inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    path = object_store.object_path(material.sha256)
+    if config.MATERIAL_ACCEL_REDIRECT:
+        relative = os.path.relpath(path, object_store.objects_dir).replace(os.sep, "/")
+        headers["x-accel-redirect"] = config.MATERIAL_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+        MATERIAL_RESPONSES.labels("accel_redirect").inc()
+        return Response(headers=headers, media_type=material.content_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = (0, material.size)
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = single_range(range_header, material.size)
+    mapped = hot_files.get(material.sha256, path, material.size) if byte_range else None
+    if mapped is not None:
+        start, end = byte_range
+        status_code = status.HTTP_200_OK
+        if (start, end) != (0, material.size):
+            status_code = status.HTTP_206_PARTIAL_CONTENT
+            headers["content-range"] = f"bytes {start}-{end - 1}/{material.size}"
+        MATERIAL_RESPONSES.labels("mmap").inc()
+        return MappedFileResponse(mapped, start, end, status_code, headers, material.content_type)
+
+    # Varios rangos, rangos no satisfacibles (416) o ficheros fríos
+    MATERIAL_RESPONSES.labels("file").inc()
+    return FileResponse(path, headers=headers, media_type=material.content_type)
+
+
+class CachedMaterial(NamedTuple):
+    """Lo necesario para servir un Material, sin arrastrar la fila ORM entre sesiones"""
+    id: int
+    sha256: str
+    size: int
+    content_type: str
+    filename: str
+
+    @classmethod
+    def from_orm(cls, material):
+        return cls(material.id, material.sha256, material.size, material.content_type, material.filename)
+
+
+class MaterialIndex:
+    """Metadatos de Material por id: son inmutables, así el camino caliente no consulta la BD"""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def get(self, material_id):
+        material = self._entries.get(material_id)
+        if material is not None:
+            self._entries.move_to_end(material_id)
+        return material
+
+    def put(self, material):
+        cached = CachedMaterial.from_orm(material)
+        self._entries[cached.id] = cached
+        self._entries.move_to_end(cached.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return cached
+
+
+hot_files = HotFileCache(
+    config.MATERIAL_CACHE_BYTES,
+    config.MATERIAL_CACHE_MAX_FILE_BYTES,
+    config.MATERIAL_CACHE_ADMIT_AFTER,
+)
+material_index = MaterialIndex()
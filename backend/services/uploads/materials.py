@@ -0,0 +1,89 @@
+import hashlib
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.db import upsert
+from shared.metrics import UPLOAD_RESULTS
+from shared.models import Material
+
+from .storage import object_store
+
+
+async def get_material_by_hash(db: AsyncSession, sha256: str):
+    result = await db.execute(select(Material).where(Material.sha256 == sha256))
+    return result.scalars().first()
+
+
+async def register_material(db: AsyncSession, partial_path, sha256, size, filename, content_type, owner_id):
+    """Mueve el fichero parcial al almacén y devuelve su Material (nuevo o existente).
+
+    Si el mismo contenido ya se subió antes, se reutiliza su fila y se borra el
+    parcial. Quien llame debe hacer commit de la sesión.
+    """
+    created = await object_store.promote(partial_path, sha256)
+    material = await get_material_by_hash(db, sha256)
+    if material is None:
+        # ON CONFLICT DO NOTHING y no un SAVEPOINT: en SQLite, si el INSERT es la
+        # primera escritura, el RELEASE confirma la fila aunque quien llama haga
+        # rollback. Si otra subida del mismo contenido terminó a la vez, gana su fila
+        await db.execute(
+            upsert(db, Material.__table__)
+            .values(sha256=sha256, size=size, content_type=content_type, filename=filename, uploaded_by=owner_id)
+            .on_conflict_do_nothing(index_elements=["sha256"])
+        )
+        material = await get_material_by_hash(db, sha256)
+    UPLOAD_RESULTS.labels("new" if created else "deduplicated").inc()
+    return material
+
+
+async def store_stream(db: AsyncSession, chunks, filename, content_type, owner_id, limit):
+    """Guarda un flujo completo (cuerpo en bruto o fichero de un formulario) como Material.
+
+    El contenido se hashea mientras se escribe, así que el fichero solo se
+    recorre una vez. Lanza UploadTooLarge si se supera ``limit`` y
+    UploadInterrupted si el cliente corta; en ambos casos no queda nada en disco.
+    Como en register_material, quien llame hace commit: así el Material entra
+    en la misma transacción que la fila que lo referencia.
+    """
+    object_store.ensure_dirs()
+    partial = object_store.partial_path(uuid.uuid4().hex)
+    hasher = hashlib.sha256()
+    try:
+        size = await object_store.write_stream(partial, 0, chunks, limit, hasher)
+    except BaseException:
+        await object_store.remove(partial)
+        raise
+    return await register_material(
+        db, partial, hasher.hexdigest(), size, filename, content_type, owner_id,
+    )
+
+
+async def iter_upload_file(upload_file, chunk_size):
+    """Lee un UploadFile de un formulario multipart por bloques"""
+    while True:
+        block = await upload_file.read(chunk_size)
+        if not block:
+            return
+        yield block
+
+
+async def store_upload_file(db: AsyncSession, upload_file, owner_id, limit):
+    """Guarda el fichero de un formulario multipart (p. ej. el material de una lección)"""
+    return await store_stream(
+        db,
+        iter_upload_file(upload_file, object_store.chunk_size),
+        upload_file.filename or "upload",
+        upload_file.content_type or "application/octet-stream",
+        owner_id,
+        limit,
+    )
+
+
+async def store_bytes(db: AsyncSession, data: bytes, filename, content_type, owner_id=None):
+    """Guarda contenido generado por el servidor (p. ej. el PDF de un certificado) como Material"""
+    async def single_chunk():
+        yield data
+
+    return await store_stream(db, single_chunk(), filename, content_type, owner_id, len(data))
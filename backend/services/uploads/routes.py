@@ -0,0 +1,270 @@
+import re
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config
+from shared.auth import get_current_user
+from shared.db import get_db
+from shared.metrics import UPLOADS_IN_PROGRESS
+from shared.models import Material, UploadSession
+from shared.schemas import MaterialResponse, UploadCreate, UploadStatus
+from shared.token_cache import CachedUser
+
+from .access import can_read_material
+from .delivery import material_index, material_response
+from .materials import register_material, store_stream
+from .storage import UploadInterrupted, UploadTooLarge, hashers, object_store
+
+router = APIRouter(tags=["uploads"])
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+def too_large(limit):
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload exceeds the maximum size of {limit} bytes",
+    )
+
+
+def check_content_length(request: Request, limit):
+    # Rechazar antes de leer un solo byte del cuerpo si el tamaño declarado no cabe
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+        raise too_large(limit)
+
+
+def upload_status(upload, offset, material=None):
+    # response_model=UploadStatus valida y serializa el Material ORM (orm_mode)
+    return {
+        "upload_id": upload.id,
+        "offset": offset,
+        "size": upload.total_size,
+        "chunk_size": config.UPLOAD_CHUNK_SIZE,
+        "complete": material is not None,
+        "material": material,
+    }
+
+
+def chunk_offset(request: Request, upload):
+    """Offset del trozo según Content-Range (o Upload-Offset); por defecto, lo ya recibido"""
+    content_range = request.headers.get("content-range")
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match or int(match.group(3)) != upload.total_size:
+            raise HTTPException(status_code=400, detail="Invalid Content-Range header")
+        return int(match.group(1))
+    offset = request.headers.get("upload-offset")
+    if offset is not None:
+        if not offset.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Upload-Offset header")
+        return int(offset)
+    return upload.received
+
+
+async def release_writer(db: AsyncSession, upload_id: str, writer: str):
+    # Devuelve la reserva sin avanzar el offset: el siguiente PATCH reescribe desde ``received``
+    await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload_id, UploadSession.writer == writer)
+        .values(writer=None, writing_until=None)
+    )
+    await db.commit()
+
+
+async def get_upload(db: AsyncSession, upload_id: str, user: CachedUser):
+    result = await db.execute(
+        select(UploadSession).where(UploadSession.id == upload_id, UploadSession.owner_id == user.id)
+    )
+    upload = result.scalars().first()
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.post("/api/uploads", response_model=UploadStatus, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    data: UploadCreate,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # El límite se aplica al declarar la subida, antes de recibir datos
+    if data.size <= 0:
+        raise HTTPException(status_code=400, detail="Upload size must be positive")
+    if data.size > config.UPLOAD_MAX_BYTES:
+        raise too_large(config.UPLOAD_MAX_BYTES)
+    object_store.ensure_dirs()
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        owner_id=current_user.id,
+        filename=data.filename,
+        content_type=data.content_type,
+        total_size=data.size,
+        received=0,
+    )
+    db.add(upload)
+    await db.commit()
+    return upload_status(upload, 0)
+
+
+@router.get("/api/uploads/{upload_id}", response_model=UploadStatus)
+async def get_upload_status(
+    upload_id: str,
+    response: Response,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Para reanudar: el cliente continúa desde Upload-Offset
+    upload = await get_upload(db, upload_id, current_user)
+    response.headers["Upload-Offset"] = str(upload.received)
+    return upload_status(upload, upload.received)
+
+
+@router.patch("/api/uploads/{upload_id}", response_model=UploadStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    start = chunk_offset(request, upload)
+    if start != upload.received:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload offset mismatch, expected {upload.received}",
+            headers={"Upload-Offset": str(upload.received)},
+        )
+    remaining = upload.total_size - start
+    check_content_length(request, remaining)
+
+    # Reservar el offset antes de escribir: dos PATCH al mismo offset (un
+    # reintento mientras el primero sigue en curso) mezclarían sus bytes en el
+    # fichero parcial y el SHA-256 saldría de esa mezcla
+    writer = uuid.uuid4().hex
+    now = datetime.utcnow()
+    claimed = await db.execute(
+        update(UploadSession)
+        .where(
+            UploadSession.id == upload.id,
+            UploadSession.received == start,
+            or_(UploadSession.writer.is_(None), UploadSession.writing_until < now),
+        )
+        .values(writer=writer, writing_until=now + timedelta(seconds=config.UPLOAD_WRITE_LEASE_SECONDS))
+    )
+    if claimed.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another request is already writing this upload",
+            headers={"Upload-Offset": str(start)},
+        )
+    # Liberar la conexión: no se retiene una transacción mientras llega el cuerpo
+    await db.commit()
+
+    path = object_store.partial_path(upload.id)
+    hasher = hashers.claim(upload.id, start)
+    interrupted = False
+    UPLOADS_IN_PROGRESS.inc()
+    try:
+        written = await object_store.write_stream(path, start, request.stream(), remaining, hasher)
+    except UploadTooLarge:
+        hashers.discard(upload.id)
+        await object_store.truncate(path, start)
+        await release_writer(db, upload.id, writer)
+        raise too_large(upload.total_size)
+    except UploadInterrupted as exc:
+        written, interrupted = exc.written, True
+    except Exception:
+        hashers.discard(upload.id)
+        await release_writer(db, upload.id, writer)
+        raise
+    finally:
+        UPLOADS_IN_PROGRESS.dec()
+
+    # Solo avanza quien tiene la reserva; si caducó y otro la tomó, esta petición pierde
+    end = start + written
+    result = await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id, UploadSession.writer == writer)
+        .values(received=end, writer=None, writing_until=None, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        hashers.discard(upload.id)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload was modified concurrently")
+    await db.commit()
+    upload.received = end
+
+    if interrupted or end < upload.total_size:
+        hashers.release(upload.id, end, hasher)
+        return upload_status(upload, end)
+
+    hashers.discard(upload.id)
+    sha256 = hasher.hexdigest() if hasher is not None else await object_store.hash_file(path)
+    material = await register_material(
+        db, path, sha256, upload.total_size, upload.filename, upload.content_type, upload.owner_id,
+    )
+    await db.execute(delete(UploadSession).where(UploadSession.id == upload.id))
+    await db.commit()
+    return upload_status(upload, end, material)
+
+
+@router.delete("/api/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    upload_id: str,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    upload = await get_upload(db, upload_id, current_user)
+    await db.delete(upload)
+    await db.commit()
+    hashers.discard(upload.id)
+    await object_store.remove(object_store.partial_path(upload.id))
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.put("/api/uploads/direct", response_model=MaterialResponse, status_code=status.HTTP_201_CREATED)
+async def direct_upload(
+    request: Request,
+    filename: str,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Subida en una sola petición (imágenes, PDFs pequeños): mismo streaming, sin reanudación
+    check_content_length(request, config.UPLOAD_MAX_BYTES)
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    try:
+        material = await store_stream(
+            db, request.stream(), filename, content_type, current_user.id, config.UPLOAD_MAX_BYTES,
+        )
+    except UploadTooLarge:
+        raise too_large(config.UPLOAD_MAX_BYTES)
+    except UploadInterrupted:
+        raise HTTPException(status_code=400, detail="Upload interrupted")
+    await db.commit()
+    return material
+
+
+@router.api_route("/api/materials/{material_id}", methods=["GET", "HEAD"])
+async def download_material(
+    material_id: int,
+    request: Request,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # 404 también sin permiso: no se revela qué ids existen
+    if not await can_read_material(db, material_id, current_user):
+        raise HTTPException(status_code=404, detail="Material not found")
+    # Range, If-Range e If-None-Match se resuelven en material_response
+    material = material_index.get(material_id)
+    if material is None:
+        db_material = await db.get(Material, material_id)
+        if db_material is None:
+            raise HTTPException(status_code=404, detail="Material not found")
+        material = material_index.put(db_material)
+    return material_response(request, material)
@@ -0,0 +1,179 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+from shared import config
+from shared.metrics import UPLOAD_BYTES
+
+
+class UploadTooLarge(Exception):
+    """El cuerpo recibido supera el tamaño declarado o el máximo permitido"""
+
+    def __init__(self, limit):
+        super().__init__(limit)
+        self.limit = limit
+
+
+class UploadInterrupted(Exception):
+    """El cliente cortó la conexión; ``written`` bytes quedaron guardados"""
+
+    def __init__(self, written):
+        super().__init__(written)
+        self.written = written
+
+
+def _open_at(path, offset):
+    # "r+b" conserva lo ya recibido; el fichero se crea la primera vez
+    f = open(path, "r+b" if os.path.exists(path) else "w+b")
+    f.seek(offset)
+    return f
+
+
+def _write_block(f, hasher, block):
+    # hashlib libera el GIL con bloques grandes: hash y escritura fuera del event loop
+    f.write(block)
+    if hasher is not None:
+        hasher.update(block)
+
+
+def _hash_file(path, chunk_size):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _truncate(path, size):
+    if os.path.exists(path):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+
+
+def _promote(partial, target):
+    # Si el contenido ya existe, el parcial sobra; si no, se mueve de forma atómica
+    if os.path.exists(target):
+        os.remove(partial)
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(partial, target)
+    return True
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ObjectStore:
+    """Almacén local direccionado por contenido, sustituto de un object store.
+
+    Las subidas en curso viven en ``partial/<upload_id>`` y, al completarse, se
+    mueven a ``objects/ab/cd/<sha256>``: dos subidas del mismo fichero comparten
+    un único objeto en disco.
+    """
+
+    def __init__(self, root, chunk_size):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.partial_dir = os.path.join(root, "partial")
+        self.objects_dir = os.path.join(root, "objects")
+
+    def ensure_dirs(self):
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    def partial_path(self, upload_id):
+        return os.path.join(self.partial_dir, upload_id)
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256)
+
+    async def write_stream(self, path, offset, chunks, limit, hasher=None):
+        """Escribe ``chunks`` en ``path`` desde ``offset`` en bloques de tamaño fijo.
+
+        Devuelve los bytes escritos. Si el cliente corta la conexión se guarda
+        lo recibido y se lanza UploadInterrupted (la subida se puede reanudar);
+        si se supera ``limit`` se lanza UploadTooLarge sin escribir el bloque
+        pendiente.
+        """
+        f = await run_in_threadpool(_open_at, path, offset)
+        written = 0
+        buffer = bytearray()
+        interrupted = False
+        try:
+            try:
+                async for piece in chunks:
+                    if written + len(buffer) + len(piece) > limit:
+                        raise UploadTooLarge(limit)
+                    buffer += piece
+                    if len(buffer) >= self.chunk_size:
+                        await run_in_threadpool(_write_block, f, hasher, buffer)
+                        written += len(buffer)
+                        buffer.clear()
+            except ClientDisconnect:
+                interrupted = True
+            if buffer:
+                await run_in_threadpool(_write_block, f, hasher, buffer)
+                written += len(buffer)
+        finally:
+            await run_in_threadpool(f.close)
+            UPLOAD_BYTES.inc(written)
+        if interrupted:
+            raise UploadInterrupted(written)
+        return written
+
+    async def hash_file(self, path):
+        return await run_in_threadpool(_hash_file, path, self.chunk_size)
+
+    async def truncate(self, path, size):
+        await run_in_threadpool(_truncate, path, size)
+
+    async def promote(self, partial, sha256):
+        """Mueve el parcial a su objeto definitivo; False si el contenido ya existía"""
+        return await run_in_threadpool(_promote, partial, self.object_path(sha256))
+
+    async def remove(self, path):
+        await run_in_threadpool(_remove, path)
+
+
+class HasherRegistry:
+    """Estado SHA-256 de las subidas en curso en este proceso.
+
+    Permite hashear mientras llegan los bytes sin volver a leer el fichero. Si
+    un trozo llega a otro worker o fuera de orden, la entrada se descarta y el
+    hash se calcula leyendo el fichero al completar la subida.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def claim(self, upload_id, offset):
+        """Hasher válido para continuar en ``offset`` (o None) y lo retira del registro"""
+        entry = self._entries.pop(upload_id, None)
+        if entry is not None and entry[0] == offset:
+            return entry[1]
+        if offset == 0:
+            return hashlib.sha256()
+        return None
+
+    def release(self, upload_id, offset, hasher):
+        if hasher is None:
+            return
+        self._entries[upload_id] = (offset, hasher)
+        self._entries.move_to_end(upload_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, upload_id):
+        self._entries.pop(upload_id, None)
+
+
+object_store = ObjectStore(config.UPLOAD_DIR, config.UPLOAD_CHUNK_SIZE)
+hashers = HasherRegistry()
@@ -0,0 +1 @@
+from services.users.routes import router
@@ -0,0 +1,223 @@
+import asyncio
+import csv
+import json
+import re
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config, hashing
+from shared.db import upsert
+from shared.models import User
+
+ROLES = ("student", "teacher", "admin")
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+FORMATS = ("csv", "jsonl")
+
+
+class ImportTooLarge(Exception):
+    """La entrada supera ``BULK_IMPORT_MAX_ROWS``"""
+
+
+def parse_rows(lines, fmt):
+    """Filas ``(línea, dict)`` de un CSV con cabecera o de un JSONL; las ilegibles llevan ``None``"""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Las claves de la cabecera sin espacios ni mayúsculas: "Email" o " email" valen
+            yield reader.line_num, {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+    elif fmt == "jsonl":
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def bulk_policy():
+    # Coste reducido opcional (BULK_IMPORT_BCRYPT_ROUNDS): el primer login rehace el hash
+    # con la política normal; hasta entonces el hash es más débil
+    if hashing.policy["default"] == "bcrypt" and config.BULK_IMPORT_BCRYPT_ROUNDS:
+        return hashing.build_policy("bcrypt", bcrypt_rounds=config.BULK_IMPORT_BCRYPT_ROUNDS)
+    return hashing.policy
+
+
+def hash_passwords(passwords):
+    # En el proceso hijo, con la política que fijó el initializer del pool
+    return [hashing.pwd_context.hash(password) for password in passwords]
+
+
+class BulkHasher:
+    """Pool de procesos propio del alta masiva.
+
+    No usa el pool de los logins (``password_hasher``): miles de hashes
+    llenarían su cola y los logins recibirían 503 durante la importación.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or config.BULK_IMPORT_WORKERS)
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=hashing.set_policy, initargs=(bulk_policy(),)
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        # Sin esperar: se sale desde el event loop, y si la petición se canceló no hay nada que aguardar
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    async def hash_many(self, passwords):
+        # Unos pocos trozos por worker: repartir la carga sin pagar un viaje por contraseña
+        size = max(1, -(-len(passwords) // (self.workers * 4)))
+        chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+        loop = asyncio.get_running_loop()
+        hashed = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, hash_passwords, chunk) for chunk in chunks
+        ))
+        return [value for chunk in hashed for value in chunk]
+
+
+def validate_row(number, row, default_role):
+    """(usuario, None) si la fila es válida; si no, (None, resultado con el error)"""
+    if row is None:
+        return None, {"line": number, "status": "invalid", "error": "Unreadable row"}
+    email = str(row.get("email") or "").strip()
+    if not EMAIL_RE.match(email):
+        return None, {"line": number, "email": email or None, "status": "invalid", "error": "Invalid email"}
+    role = str(row.get("role") or default_role).strip().lower()
+    if role not in ROLES:
+        return None, {"line": number, "email": email, "status": "invalid", "error": f"Invalid role: {role}"}
+    # Igual que /api/auth/register: sin username se usa la parte del email antes de @
+    username = str(row.get("username") or "").strip() or email.split("@")[0]
+    password = str(row.get("password") or "")
+    return {
+        "line": number,
+        "email": email,
+        "username": username,
+        "role": role,
+        "password": password,
+        "generated": not password,
+    }, None
+
+
+async def existing_accounts(db: AsyncSession, users):
+    """(emails, usernames) de ``users`` que ya existen, con una única consulta"""
+    emails = [user["email"] for user in users]
+    usernames = [user["username"] for user in users]
+    rows = (await db.execute(
+        select(User.email, User.username).where(or_(User.email.in_(emails), User.username.in_(usernames)))
+    )).all()
+    return {email for email, _ in rows}, {username for _, username in rows}
+
+
+async def import_users(db: AsyncSession, rows, default_role="student"):
+    """Da de alta las filas ``(línea, dict)`` y devuelve un resultado por fila, en orden de línea.
+
+    Por lote de ``BULK_IMPORT_BATCH_SIZE``: una consulta de existentes (email o
+    username), los hashes en paralelo en el pool de procesos y un INSERT
+    multi-fila con ON CONFLICT DO NOTHING. Un conflicto por otra alta
+    simultánea se informa en su fila en lugar de abortar el lote. Cada lote
+    hace commit: si el proceso cae, lo ya importado queda y al repetir la
+    importación sale como ``exists``.
+    """
+    results = []
+    pending = []
+    seen_emails, seen_usernames = set(), set()
+    for number, row in rows:
+        user, error = validate_row(number, row, default_role)
+        if error is None:
+            # Duplicados dentro del propio fichero: gana la primera aparición
+            if user["email"] in seen_emails:
+                error = {"line": number, "email": user["email"], "status": "duplicate",
+                         "error": "Duplicate email in input"}
+            elif user["username"] in seen_usernames:
+                error = {"line": number, "email": user["email"], "status": "duplicate",
+                         "error": f"Duplicate username in input: {user['username']}"}
+        if error is not None:
+            results.append(error)
+            continue
+        seen_emails.add(user["email"])
+        seen_usernames.add(user["username"])
+        pending.append(user)
+
+    if pending:
+        with BulkHasher() as hasher:
+            for start in range(0, len(pending), config.BULK_IMPORT_BATCH_SIZE):
+                batch = pending[start:start + config.BULK_IMPORT_BATCH_SIZE]
+                results.extend(await insert_batch(db, batch, hasher))
+    results.sort(key=lambda result: result["line"])
+    return results
+
+
+async def insert_batch(db: AsyncSession, batch, hasher):
+    results = []
+    taken_emails, taken_usernames = await existing_accounts(db, batch)
+    fresh = []
+    for user in batch:
+        if user["email"] in taken_emails:
+            results.append({"line": user["line"], "email": user["email"], "status": "exists",
+                            "error": "Email already registered"})
+        elif user["username"] in taken_usernames:
+            results.append({"line": user["line"], "email": user["email"], "status": "exists",
+                            "error": f"Username already taken: {user['username']}"})
+        else:
+            if user["generated"]:
+                user["password"] = secrets.token_urlsafe(12)
+            fresh.append(user)
+    if not fresh:
+        return results
+
+    hashed = await hasher.hash_many([user["password"] for user in fresh])
+    created = dict((await db.execute(
+        upsert(db, User.__table__)
+        .values([
+            {"email": user["email"], "username": user["username"], "hashed_password": hashed_password,
+             "role": user["role"], "is_active": True}
+            for user, hashed_password in zip(fresh, hashed)
+        ])
+        .on_conflict_do_nothing()
+        .returning(User.email, User.id)
+    )).all())
+    await db.commit()
+
+    for user in fresh:
+        user_id = created.get(user["email"])
+        if user_id is None:
+            results.append({"line": user["line"], "email": user["email"], "status": "exists",
+                            "error": "Email or username registered concurrently"})
+            continue
+        result = {"line": user["line"], "email": user["email"], "status": "created", "id": user_id,
+                  "username": user["username"], "role": user["role"]}
+        if user["generated"]:
+            # Única vez que se ve la contraseña generada: quien importa la reparte
+            result["password"] = user["password"]
+        results.append(result)
+    return results
+
+
+def summarize(results):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    created = counts.get("created", 0)
+    return {"total": len(results), "created": created, "failed": len(results) - created, "by_status": counts}
+
+
+def detect_format(name_or_type, default="csv"):
+    value = (name_or_type or "").lower()
+    if "jsonl" in value or "ndjson" in value or value.endswith(".json"):
+        return "jsonl"
+    if "csv" in value:
+        return "csv"
+    return default
+
@@ -0,0 +1,65 @@
+import codecs
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config
+from shared.auth import require_role
+from shared.db import get_db
+from shared.token_cache import CachedUser
+
+from .provisioning import ImportTooLarge, detect_format, import_users, parse_rows, summarize
+
+router = APIRouter(tags=["users"])
+
+
+async def read_lines(request: Request, max_lines: int):
+    """Líneas del cuerpo (con su salto, como las espera ``csv``) leyendo el stream por bloques"""
+    # utf-8-sig: los CSV exportados desde Excel empiezan con BOM
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    lines, pending = [], ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end == -1:
+                break
+            lines.append(pending[start:end + 1])
+            start = end + 1
+        pending = pending[start:]
+        if len(lines) > max_lines:
+            raise ImportTooLarge()
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        lines.append(pending)
+    if len(lines) > max_lines:
+        raise ImportTooLarge()
+    return lines
+
+
+@router.post("/api/users/bulk")
+async def bulk_import_users(
+    request: Request,
+    format: Optional[Literal["csv", "jsonl"]] = None,
+    default_role: Literal["student", "teacher", "admin"] = Query("student", alias="defaultRole"),
+    current_user: CachedUser = Depends(require_role("admin")),
+    db: AsyncSession = Depends(get_db),
+):
+    """Alta masiva desde un CSV (cabecera ``email,password,username,role``) o un JSONL en el cuerpo.
+
+    Devuelve un resultado por fila; las contraseñas vacías se generan y solo
+    aparecen en esta respuesta.
+    """
+    fmt = format or detect_format(request.headers.get("content-type"))
+    try:
+        # +1 por la cabecera del CSV
+        lines = await read_lines(request, config.BULK_IMPORT_MAX_ROWS + 1)
+    except ImportTooLarge:
+        raise HTTPException(status_code=413, detail=f"Import exceeds {config.BULK_IMPORT_MAX_ROWS} rows")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Import must be UTF-8 encoded")
+
+    results = await import_users(db, parse_rows(lines, fmt), default_role)
+    return {"summary": summarize(results), "results": results}
@@ -0,0 +1,5 @@
+"""
+Núcleo compartido de ProFlow: configuración, base de datos, hashing de
+contraseñas, tokens y rutas de autenticación. Lo importan la API principal
+(backend/main.py), el microservicio de auth y el router heredado routes.py.
+"""
@@ -0,0 +1,134 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter, Depends, FastAPI, Request, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+
+from shared import config
+from shared.auth import require_role, router as auth_router
+from shared.db import SessionLocal, create_all, dispose_engine, get_engine, get_pool_status, replica_set
+from shared.hashing import HashingOverloaded, calibrate, password_hasher
+from shared.jobs import job_queue
+from shared.metrics import PrometheusMiddleware, render_latest
+from shared.pubsub import broker
+from shared.ratelimit import AuthAdmissionMiddleware, RateLimited, auth_gate, rate_limited_response, rate_limiter
+from shared.refresh_tokens import revoked_sessions
+from shared.response_cache import response_cache
+from shared.serialization import FastJSONResponse
+from shared.token_cache import token_cache
+
+internal_router = APIRouter(include_in_schema=False)
+
+
+async def hashing_overloaded_handler(request: Request, exc: HashingOverloaded):
+    # Descartar carga en lugar de encolar logins sin límite
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": str(config.PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    return rate_limited_response(exc)
+
+
+async def calibrate_password_hashing():
+    # Elegir el coste que da el objetivo de ms por hash en este hardware
+    if config.PASSWORD_HASH_CALIBRATE_MS > 0:
+        loop = asyncio.get_running_loop()
+        policy = await loop.run_in_executor(None, calibrate, config.PASSWORD_HASH_CALIBRATE_MS)
+        password_hasher.apply_policy(policy)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Todo el trabajo pesado ocurre aquí y no al importar el módulo
+    get_engine()
+    if config.AUTO_CREATE_SCHEMA:
+        await create_all()
+    await replica_set.start()
+    await calibrate_password_hashing()
+    await revoked_sessions.start(SessionLocal)
+    await rate_limiter.start()
+    await response_cache.start()
+    await broker.start()
+    await job_queue.start()
+    for component in app.state.components.values():
+        await component.start(SessionLocal)
+    yield
+    for component in reversed(list(app.state.components.values())):
+        await component.stop()
+    await job_queue.stop()
+    await broker.stop()
+    await response_cache.stop()
+    await rate_limiter.stop()
+    await revoked_sessions.stop()
+    password_hasher.shutdown()
+    await dispose_engine()
+
+
+# Solo admin: expone el estado interno del proceso (colas, pools, réplicas)
+@internal_router.get("/api/internal/stats", dependencies=[Depends(require_role("admin"))])
+async def internal_stats(request: Request):
+    # Tiempos de espera en cola frente a tiempo de hash de bcrypt
+    return {
+        "password_hashing": password_hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "db_pool": get_pool_status(),
+        "db_replicas": replica_set.stats(),
+        "pubsub": broker.stats(),
+        "jobs": job_queue.stats(),
+        "revoked_sessions": revoked_sessions.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "auth_gate": auth_gate.stats(),
+        "response_cache": response_cache.stats(),
+        **{name: component.stats() for name, component in request.app.state.components.items()},
+    }
+
+
+@internal_router.get("/metrics")
+def prometheus_metrics():
+    # Síncrona a propósito: la serialización corre en el threadpool, no en el event loop
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+def create_app(title: str, components=None) -> FastAPI:
+    """App FastAPI con la autenticación, métricas y ciclo de vida comunes.
+
+    La API principal y el microservicio de auth se construyen con esta función,
+    así que comparten engine, pool de hashing y códec de tokens. ``components``
+    ({nombre: objeto con start(session_factory), stop() y stats()}) son los
+    índices en memoria propios de cada app: arrancan con ella y salen en
+    /api/internal/stats.
+    """
+    # Las rutas que devuelven dicts se codifican con orjson tras jsonable_encoder;
+    # las más usadas devuelven json_response y se saltan también ese paso
+    app = FastAPI(title=title, lifespan=lifespan, default_response_class=FastJSONResponse)
+    app.state.components = dict(components or {})
+
+    # Límite por IP y control de concurrencia de login/registro. Se añade antes que
+    # CORS para quedar por dentro: los 429/503 también llevan las cabeceras CORS
+    if config.RATE_LIMIT_ENABLED:
+        app.add_middleware(AuthAdmissionMiddleware, paths=config.AUTH_GATE_PATHS)
+
+    # Configuración CORS para permitir peticiones desde el frontend
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # En producción, limitar a dominios específicos
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Métricas Prometheus por ruta (latencia, recuento, peticiones en curso)
+    app.add_middleware(PrometheusMiddleware)
+
+    app.add_exception_handler(HashingOverloaded, hashing_overloaded_handler)
+    app.add_exception_handler(RateLimited, rate_limited_handler)
+
+    app.include_router(auth_router)
+    app.include_router(internal_router)
+    return app
@@ -0,0 +1,217 @@
+from typing import Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.security import OAuth2PasswordBearer
+from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config
+from shared.db import get_db, get_read_db
+from shared.hashing import password_hasher
+from shared.models import User
+from shared.ratelimit import limit_email
+from shared.refresh_tokens import (
+    clear_refresh_cookie,
+    issue_refresh_token,
+    revoke_refresh_token,
+    revoked_sessions,
+    rotate_refresh_token,
+    set_refresh_cookie,
+)
+from shared.schemas import RefreshRequest, TokenData, UserCreate, UserLogin, UserResponse
+from shared.serialization import Serializer, json_response
+from shared.token_cache import CachedUser, token_cache
+from shared.tokens import decode_access_token, issue_user_token
+
+router = APIRouter(tags=["auth"])
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+
+# Filas de la BD y CachedUser ya cumplen UserResponse: se serializan sin validar
+serialize_user = Serializer(UserResponse)
+
+
+# Funciones de utilidad
+# bcrypt se ejecuta en el pool acotado de hashing.py, nunca en el event loop
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
+
+async def get_user(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user(db, email)
+    if not user:
+        return False
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        # El hash usa otro esquema o coste: se guarda con la política actual
+        user.hashed_password = new_hash
+        await db.commit()
+    return user
+
+# Lectura pura: el usuario se busca en una réplica (o en el primario si no hay)
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = decode_access_token(token)
+        email: str = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+        token_data = TokenData(email=email)
+    except JWTError:
+        raise credentials_exception
+    # Sesión cerrada (logout o reutilización de refresh token): casi siempre lo resuelve el filtro de Bloom
+    family = payload.get("fam")
+    if family and await revoked_sessions.is_revoked(db, family):
+        raise credentials_exception
+    if config.TRUST_TOKEN_CLAIMS:
+        # Modo opcional: el token ya trae rol e is_active, no se consulta la BD
+        user = CachedUser.from_claims(payload)
+        if user is not None:
+            return user
+    exp = payload.get("exp")
+    user = token_cache.get(token_data.email, exp)
+    if user is None:
+        db_user = await get_user(db, email=token_data.email)
+        if db_user is None:
+            raise credentials_exception
+        user = CachedUser.from_orm(db_user)
+        token_cache.put(token_data.email, exp, user)
+    return user
+
+def require_role(*roles):
+    """Dependencia que exige uno de ``roles`` al usuario autenticado"""
+    async def dependency(current_user: CachedUser = Depends(get_current_user)):
+        if current_user.role not in roles:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+        return current_user
+    return dependency
+
+
+def token_response(user, access_token, refresh_token):
+    # Respuesta ya codificada (sin jsonable_encoder) y con la cookie del refresh token
+    response = json_response({
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "user": serialize_user(user),
+    })
+    set_refresh_cookie(response, refresh_token)
+    return response
+
+
+def request_refresh_token(request: Request, data: Optional[RefreshRequest]):
+    if data is not None and data.refresh_token:
+        return data.refresh_token
+    return request.cookies.get(config.REFRESH_COOKIE_NAME)
+
+
+# Rutas de la API
+
+@router.post("/api/auth/login")
+async def login_for_access_token(form_data: UserLogin, db: AsyncSession = Depends(get_db)):
+    # Antes de bcrypt: probar contraseñas contra una cuenta se corta sin gastar CPU
+    await limit_email(form_data.email)
+    user = await authenticate_user(db, form_data.email, form_data.password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Verificar que el rol coincida
+    if user.role != form_data.role:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"User is not a {form_data.role}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Cada login abre una sesión nueva (familia de refresh tokens)
+    refresh_token, family_id = issue_refresh_token(db, user.id)
+    await db.commit()
+    access_token = issue_user_token(user, family_id)
+
+    # ✅ Aquí agregamos el usuario al response
+    return token_response(user, access_token, refresh_token)
+
+
+@router.post("/api/auth/refresh-token")
+async def refresh_access_token(
+    request: Request,
+    data: Optional[RefreshRequest] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Rota el refresh token (cookie o cuerpo) y emite un token de acceso nuevo, sin bcrypt"""
+    token = request_refresh_token(request, data)
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token missing",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token, family_id = await rotate_refresh_token(db, token)
+    return token_response(user, issue_user_token(user, family_id), refresh_token)
+
+
+@router.post("/api/auth/logout")
+async def logout(
+    request: Request,
+    response: Response,
+    data: Optional[RefreshRequest] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    # Revoca la sesión entera: sus refresh tokens y los tokens de acceso que emitió
+    token = request_refresh_token(request, data)
+    if token and await revoke_refresh_token(db, token):
+        await db.commit()
+    clear_refresh_cookie(response)
+    return {"message": "Logged out"}
+
+
+@router.post("/api/auth/register", response_model=UserResponse)
+async def register_user(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
+    await limit_email(user_data.email)
+    db_user = await get_user(db, email=user_data.email)
+    if db_user:
+        raise HTTPException(
+            status_code=400,
+            detail="Email already registered"
+        )
+
+    # Si el username no se proporciona, usar la parte del email antes de @
+    username = user_data.username
+    if not username:
+        username = user_data.email.split('@')[0]
+
+    # Crear nuevo usuario
+    hashed_password = await get_password_hash(user_data.password)
+    db_user = User(
+        email=user_data.email,
+        username=username,
+        hashed_password=hashed_password,
+        role=user_data.role
+    )
+
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+
+    return json_response(serialize_user(db_user))
+
+# response_model queda para la documentación OpenAPI; la respuesta se codifica sin validarla
+@router.get("/api/auth/user", response_model=Dict[str, UserResponse])
+async def read_users_me(current_user: CachedUser = Depends(get_current_user)):
+    return json_response({"user": serialize_user(current_user)})
@@ -0,0 +1,177 @@
+import os
+from dotenv import load_dotenv
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Configuración de seguridad (JWT), común a la API principal y al microservicio de auth
+SECRET_KEY = os.getenv("SECRET_KEY", "secretkeyforproflowapp")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+
+# Refresh tokens opacos con rotación: cada uso emite otro y el anterior queda consumido
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+REFRESH_COOKIE_NAME = os.getenv("REFRESH_COOKIE_NAME", "refresh_token")
+REFRESH_COOKIE_SECURE = os.getenv("REFRESH_COOKIE_SECURE", "false").lower() in ("1", "true", "yes")
+REFRESH_COOKIE_SAMESITE = os.getenv("REFRESH_COOKIE_SAMESITE", "lax")
+# Reutilizar un token ya rotado revoca toda la sesión, salvo dentro de este margen
+# (dos pestañas que refrescan a la vez con la misma cookie)
+REFRESH_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+# Índice en memoria de sesiones revocadas (filtro de Bloom + mapa con TTL)
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+REVOCATION_MAP_SIZE = int(os.getenv("REVOCATION_MAP_SIZE", "10000"))
+REVOCATION_BLOOM_BITS = int(os.getenv("REVOCATION_BLOOM_BITS", str(1 << 20)))
+
+# Configuración de la base de datos (sqlite:// o postgresql://; se usa el driver asyncio)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./proflow.db")
+# Crear las tablas al arrancar cada proceso. En producción desactivarlo y
+# ejecutar `python manage.py create-schema` una vez por despliegue.
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Reciclar conexiones antes de que el servidor o un proxy las corte (segundos, -1 = nunca)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Réplicas de solo lectura (separadas por comas). Las dependencias de lectura
+# (get_read_db) se reparten entre las sanas; sin réplicas todo va al primario
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "5"))
+# Retraso de replicación máximo (PostgreSQL) antes de dejar de leer de una réplica
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "10"))
+# Tras escribir, las lecturas del mismo cliente van al primario durante este margen
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Perfil SQLite, aplicado con PRAGMAs en cada conexión nueva
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Configuración del pool de hashing de contraseñas (bcrypt)
+# "thread" libera el GIL dentro de bcrypt; "process" aísla el trabajo en otros núcleos
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Trabajos que pueden esperar en cola además de los que ya se están ejecutando;
+# por encima de este límite se responde 503 en lugar de acumular latencia
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+# Política de hashing: esquema y coste. Los hashes con otra política se
+# rehacen en el siguiente login correcto (subida o bajada de coste).
+PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+# Si es > 0, al arrancar se elige el coste que tarda ~N ms por hash en esta máquina
+PASSWORD_HASH_CALIBRATE_MS = float(os.getenv("PASSWORD_HASH_CALIBRATE_MS", "0"))
+
+# Alta masiva de usuarios (services/users). Los hashes se calculan en un pool de
+# procesos propio, con la política normal salvo que se pida un coste reducido
+BULK_IMPORT_WORKERS = int(os.getenv("BULK_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+# Opcional: coste de bcrypt reducido para el alta (0 = el normal). Las cuentas que
+# nunca inician sesión conservan ese hash débil
+BULK_IMPORT_BCRYPT_ROUNDS = int(os.getenv("BULK_IMPORT_BCRYPT_ROUNDS", "0"))
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+BULK_IMPORT_MAX_ROWS = int(os.getenv("BULK_IMPORT_MAX_ROWS", "50000"))
+
+# Caché de usuarios validados por token en get_current_user
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "60"))
+# Si está activo, se confía en los claims del token (rol, is_active...) sin ir a la BD
+TRUST_TOKEN_CLAIMS = os.getenv("TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Subidas de materiales (vídeos, PDFs, imágenes). El cuerpo se escribe a disco
+# en bloques de UPLOAD_CHUNK_SIZE: la memoria por subida no depende del tamaño del fichero.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Segundos que una subida incompleta puede quedar abandonada antes de purgarla
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", "86400"))
+# Segundos que un PATCH reserva el offset de su subida; pasado ese tiempo otro puede reanudar
+UPLOAD_WRITE_LEASE_SECONDS = int(os.getenv("UPLOAD_WRITE_LEASE_SECONDS", "600"))
+
+# Descarga de materiales: caché mmap de los ficheros más pedidos (LRU por bytes)
+MATERIAL_CACHE_BYTES = int(os.getenv("MATERIAL_CACHE_BYTES", str(256 * 1024 * 1024)))
+MATERIAL_CACHE_MAX_FILE_BYTES = int(os.getenv("MATERIAL_CACHE_MAX_FILE_BYTES", str(64 * 1024 * 1024)))
+MATERIAL_CACHE_ADMIT_AFTER = int(os.getenv("MATERIAL_CACHE_ADMIT_AFTER", "2"))
+# Prefijo interno de nginx (p. ej. /_materials/): la API valida y nginx envía el fichero con sendfile
+MATERIAL_ACCEL_REDIRECT = os.getenv("MATERIAL_ACCEL_REDIRECT", "")
+
+# Registros máximos por petición de /api/attendance/bulk-record
+ATTENDANCE_MAX_RECORDS = int(os.getenv("ATTENDANCE_MAX_RECORDS", "5000"))
+
+# Codificar las respuestas JSON con orjson (si está instalado) en lugar de json de la stdlib
+FAST_JSON = os.getenv("FAST_JSON", "true").lower() in ("1", "true", "yes")
+
+# Caché de respuestas de las rutas de catálogo (shared/response_cache.py).
+# "memory" es una LRU por proceso; con varios workers usar "redis" (REDIS_URL) para
+# compartir las entradas y que una invalidación llegue a todos
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_STALE_SECONDS = float(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "300"))
+RESPONSE_CACHE_LOCK_SECONDS = float(os.getenv("RESPONSE_CACHE_LOCK_SECONDS", "5"))
+
+# Paginación por cursor de los listados (cursos, alumnos...)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Límite de peticiones (token bucket) y control de admisión de las rutas de auth.
+# "memory" cuenta por proceso; con varios workers o réplicas usar "redis" (REDIS_URL)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+# Ráfaga y ritmo sostenido por IP (un aula entera suele salir por la misma IP) y por email
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "60"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "120"))
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "5"))
+# Tomar la IP del cliente de X-Forwarded-For (solo detrás de un proxy propio)
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+# Cubetas máximas en memoria; al pasarse se descartan las menos recientes
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+AUTH_GATE_PATHS = [
+    path.strip()
+    for path in os.getenv(
+        "AUTH_GATE_PATHS",
+        "/api/auth/login,/api/auth/register,/api/auth/forgot-password,/api/auth/verify-otp",
+    ).split(",")
+    if path.strip()
+]
+# Peticiones de auth en curso a la vez; las siguientes esperan en cola hasta
+# AUTH_GATE_QUEUE_TIMEOUT segundos y, si la cola está llena, reciben 503
+AUTH_GATE_MAX_CONCURRENT = int(os.getenv("AUTH_GATE_MAX_CONCURRENT", str(2 * PASSWORD_HASH_WORKERS)))
+AUTH_GATE_MAX_QUEUE = int(os.getenv("AUTH_GATE_MAX_QUEUE", "128"))
+AUTH_GATE_QUEUE_TIMEOUT = float(os.getenv("AUTH_GATE_QUEUE_TIMEOUT", "5"))
+
+# Pub/sub de eventos en tiempo real (notificaciones). "memory" solo reparte dentro
+# del proceso; con varios workers o réplicas usar "redis"
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Mensajes pendientes por conexión; si se llena, la conexión se cierra pidiendo resincronizar
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "100"))
+# Canal de notificaciones (SSE / WebSocket)
+NOTIFY_HEARTBEAT_SECONDS = float(os.getenv("NOTIFY_HEARTBEAT_SECONDS", "25"))
+NOTIFY_MAX_CONNECTIONS_PER_USER = int(os.getenv("NOTIFY_MAX_CONNECTIONS_PER_USER", "5"))
+
+# Cola de trabajos en segundo plano (tabla jobs de la propia BD). JOB_WORKERS trabajos
+# a la vez; la parte de CPU va a un pool de procesos ("process") o de hilos ("thread")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(os.cpu_count() or 1)))
+JOB_EXECUTOR = os.getenv("JOB_EXECUTOR", "process")
+# Sondeo de trabajos encolados por otros procesos; los del propio proceso despiertan al momento
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Espera antes del primer reintento; se duplica en cada intento fallido
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+# Un trabajo "running" más antiguo que esto se considera abandonado y vuelve a la cola al arrancar
+JOB_TIMEOUT_SECONDS = int(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+
+# Cada cuánto el índice de búsqueda de cursos recoge los cambios hechos por otros procesos
+SEARCH_SYNC_SECONDS = float(os.getenv("SEARCH_SYNC_SECONDS", "30"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+
+# Progreso (%) a partir del cual un alumno recibe certificado en la emisión masiva
+CERTIFICATE_COMPLETION_PROGRESS = float(os.getenv("CERTIFICATE_COMPLETION_PROGRESS", "100"))
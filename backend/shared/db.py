@@ -0,0 +1,487 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from starlette.requests import HTTPConnection
+
+from shared import config, metrics
+from shared.metrics import TimingStats
+
+logger = logging.getLogger(__name__)
+
+# Driver asíncrono para cada esquema de DATABASE_URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str):
+    """Traduce una URL síncrona (sqlite://, postgresql://) a su driver asyncio"""
+    parsed = make_url(url)
+    backend, _, driver = parsed.drivername.partition("+")
+    if driver in ("aiosqlite", "asyncpg"):
+        return parsed
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported DATABASE_URL scheme: {parsed.drivername}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class PoolStats:
+    """Contadores del pool de conexiones, expuestos para monitorización"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.checkout_wait = TimingStats()
+
+    def observe_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.checkout_wait.observe(seconds)
+        if timed_out:
+            metrics.DB_POOL_TIMEOUTS.inc()
+        else:
+            metrics.DB_POOL_CHECKOUT_WAIT.observe(seconds)
+
+    def observe_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "checkout_wait": self.checkout_wait.snapshot(),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool que mide cuánto espera cada checkout hasta obtener una conexión"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.observe_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.observe_wait(time.perf_counter() - started)
+        return connection
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # Perfil SQLite: WAL permite lectores concurrentes con un escritor,
+    # synchronous=NORMAL es seguro con WAL y busy_timeout evita "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _sqlite_query_only(dbapi_connection, connection_record):
+    # Una réplica SQLite rechaza cualquier escritura: una ruta mal enrutada falla en lugar de divergir
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _count_connect(dbapi_connection, connection_record):
+    pool_stats.observe_connect()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    metrics.DB_POOL_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    metrics.DB_POOL_CHECKED_OUT.dec()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - context._query_started)
+
+
+def create_engine_from_config(url=None, read_only=False):
+    """Crea el engine asíncrono con el tamaño de pool y el perfil SQLite de config"""
+    url = async_database_url(url or config.DATABASE_URL)
+    if _is_memory_sqlite(url):
+        # Una única conexión compartida: cada conexión nueva sería otra base vacía
+        engine = create_async_engine(url, poolclass=StaticPool)
+    else:
+        engine = create_async_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+        )
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        if read_only:
+            event.listen(engine.sync_engine, "connect", _sqlite_query_only)
+    event.listen(engine.sync_engine, "connect", _count_connect)
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine.pool, "checkout", _on_checkout)
+    event.listen(engine.sync_engine.pool, "checkin", _on_checkin)
+    return engine
+
+
+def get_pool_status():
+    """Estado actual del pool más los contadores acumulados"""
+    if _engine is None:
+        return {"pool": None, **pool_stats.snapshot()}
+    pool = _engine.sync_engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    status.update(pool_stats.snapshot())
+    return status
+
+
+class ReadYourWrites:
+    """Clientes que acaban de escribir, para leer del primario mientras las réplicas se ponen al día.
+
+    Por proceso: con varios workers la garantía solo se cumple si el balanceador
+    mantiene al cliente en el mismo (o con un margen mayor que el retraso real).
+    """
+
+    def __init__(self, window_seconds, max_entries=10000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, key):
+        if not key or self.window_seconds <= 0:
+            return
+        with self._lock:
+            self._until[key] = time.monotonic() + self.window_seconds
+            self._until.move_to_end(key)
+            while len(self._until) > self.max_entries:
+                self._until.popitem(last=False)
+
+    def recent(self, key):
+        if not key:
+            return False
+        with self._lock:
+            until = self._until.get(key)
+            if until is None:
+                return False
+            if until > time.monotonic():
+                return True
+            del self._until[key]
+            return False
+
+    def __len__(self):
+        return len(self._until)
+
+
+read_your_writes = ReadYourWrites(config.DB_READ_YOUR_WRITES_SECONDS)
+
+
+class TrackedSession(Session):
+    """Sesión que recuerda si escribió, para abrir la ventana de read-your-writes al hacer commit"""
+
+
+@event.listens_for(TrackedSession, "do_orm_execute")
+def _track_statement_writes(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(TrackedSession, "after_flush")
+def _track_flush_writes(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(TrackedSession, "after_commit")
+def _open_read_your_writes(session):
+    if session.info.pop("wrote", False):
+        read_your_writes.mark(session.info.get("consistency_key"))
+
+
+@event.listens_for(TrackedSession, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+
+# Consultas de salud: ¿responde? y, en PostgreSQL, segundos de retraso respecto al primario
+REPLICA_LAG_SQL = {
+    "postgresql": text(
+        "SELECT CASE WHEN NOT pg_is_in_recovery() "
+        "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+PING_SQL = text("SELECT 0")
+
+
+class Replica:
+    def __init__(self, url):
+        self.url = url
+        self.engine = None
+        self.healthy = False
+        self.lag = None
+        self.reads = 0
+        self.failures = 0
+        self.checked_at = None
+
+    def describe(self):
+        return {
+            "url": make_url(self.url).render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+class ReplicaSet:
+    """Réplicas de lectura con reparto round-robin entre las sanas.
+
+    Una comprobación periódica (``check``) marca cada réplica como sana si
+    responde y, en PostgreSQL, si su retraso no supera ``max_lag``. Un error
+    de desconexión la retira al momento, sin esperar a la siguiente
+    comprobación. Sin réplicas sanas ``choose`` devuelve None y se lee del
+    primario.
+    """
+
+    def __init__(self, urls, check_seconds=5.0, max_lag=10.0):
+        self.replicas = [Replica(url) for url in urls]
+        self.check_seconds = check_seconds
+        self.max_lag = max_lag
+        self._next = 0
+        self._task = None
+        self.primary_reads = 0
+
+    def connect(self):
+        # Engines creados en el primer uso, como el del primario; sanas hasta que la comprobación diga otra cosa
+        for replica in self.replicas:
+            if replica.engine is None:
+                replica.engine = create_engine_from_config(replica.url, read_only=True)
+                event.listen(replica.engine.sync_engine, "handle_error", self._disconnect_listener(replica))
+                replica.healthy = True
+
+    def _disconnect_listener(self, replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                self._mark_down(replica)
+        return handle_error
+
+    def _mark_down(self, replica):
+        if replica.healthy:
+            logger.warning("Read replica %s is down, reading from the others", replica.describe()["url"])
+        replica.healthy = False
+        replica.failures += 1
+
+    def choose(self):
+        """Engine de la siguiente réplica sana, o None para leer del primario"""
+        count = len(self.replicas)
+        for offset in range(count):
+            replica = self.replicas[(self._next + offset) % count]
+            if replica.healthy and replica.engine is not None:
+                self._next = (self._next + offset + 1) % count
+                replica.reads += 1
+                return replica.engine
+        self.primary_reads += 1
+        return None
+
+    async def check(self):
+        self.connect()
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    query = REPLICA_LAG_SQL.get(conn.dialect.name, PING_SQL)
+                    lag = await asyncio.wait_for(conn.scalar(query), timeout=max(self.check_seconds, 1.0))
+                replica.lag = float(lag or 0)
+                healthy = replica.lag <= self.max_lag
+                if healthy and not replica.healthy:
+                    logger.info("Read replica %s is back", replica.describe()["url"])
+                elif not healthy:
+                    self._mark_down(replica)
+                replica.healthy = healthy
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                replica.lag = None
+                self._mark_down(replica)
+            replica.checked_at = time.time()
+
+    async def start(self):
+        if not self.replicas:
+            return
+        await self.check()
+        if self.check_seconds > 0:
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await replica.engine.dispose()
+                replica.engine = None
+                replica.healthy = False
+
+    async def _check_loop(self):
+        while True:
+            await asyncio.sleep(self.check_seconds)
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Read replica health check failed, retrying")
+
+    def stats(self):
+        return {
+            "replicas": [replica.describe() for replica in self.replicas],
+            "primary_reads": self.primary_reads,
+            "read_your_writes_clients": len(read_your_writes),
+        }
+
+
+# El engine se crea en el primer uso (arranque de la app o primera sesión), no al
+# importar: importar el módulo no carga el driver ni abre conexiones.
+_engine = None
+SessionLocal = async_sessionmaker(class_=AsyncSession, sync_session_class=TrackedSession, expire_on_commit=False)
+Base = declarative_base()
+replica_set = ReplicaSet(
+    config.DATABASE_REPLICA_URLS,
+    check_seconds=config.DB_REPLICA_CHECK_SECONDS,
+    max_lag=config.DB_REPLICA_MAX_LAG_SECONDS,
+)
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine_from_config()
+        SessionLocal.configure(bind=_engine)
+        replica_set.connect()
+    return _engine
+
+
+def __getattr__(name):
+    # Compatibilidad con `from shared.db import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def consistency_key(connection: HTTPConnection):
+    # El mismo token de acceso identifica al cliente en su escritura y en sus lecturas siguientes
+    return connection.headers.get("authorization")
+
+
+async def get_db(connection: HTTPConnection):
+    """Sesión del primario: escrituras y lecturas que deben ver el último estado"""
+    get_engine()
+    async with SessionLocal(info={"consistency_key": consistency_key(connection)}) as db:
+        yield db
+
+
+async def get_read_db(connection: HTTPConnection):
+    """Sesión de solo lectura en una réplica sana (round-robin).
+
+    Va al primario si no hay réplicas sanas o si este cliente escribió hace
+    menos de ``DB_READ_YOUR_WRITES_SECONDS``, para que vea su propio cambio.
+    """
+    get_engine()
+    engine = None
+    if not read_your_writes.recent(consistency_key(connection)):
+        engine = replica_set.choose()
+    async with SessionLocal(bind=engine or _engine) as db:
+        yield db
+
+
+async def create_all():
+    from shared import models  # noqa: F401  registra las tablas en Base.metadata
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engine():
+    global _engine
+    await replica_set.stop()
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+
+
+def upsert(db: AsyncSession, table):
+    """INSERT con soporte de ON CONFLICT para el dialecto de la sesión (SQLite o PostgreSQL).
+
+    Devuelve el ``insert()`` específico del dialecto, que ofrece
+    ``on_conflict_do_update`` / ``on_conflict_do_nothing`` y ``.excluded``.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Recoge las sentencias SQL ejecutadas dentro del bloque.
+
+    Para comprobar presupuestos de consultas (detectar N+1)::
+
+        with count_queries() as statements:
+            ...
+        assert len(statements) <= 4
+    """
+    statements = []
+    target = (engine or get_engine()).sync_engine
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", record)
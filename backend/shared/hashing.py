@@ -0,0 +1,240 @@
+import asyncio
+import math
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from passlib.context import CryptContext
+
+from shared import config, metrics
+from shared.metrics import TimingStats
+
+SCHEMES = ("bcrypt", "argon2")
+
+
+class HashingOverloaded(Exception):
+    """La cola del pool de hashing está llena y la petición se descarta"""
+
+
+def build_policy(scheme=None, bcrypt_rounds=None, argon2_time_cost=None,
+                 argon2_memory_cost=None, argon2_parallelism=None):
+    """Opciones de CryptContext para el esquema y coste indicados (o los de config).
+
+    Ambos esquemas se mantienen en la lista para poder verificar hashes antiguos;
+    el que no es el activo queda obsoleto y se rehace en el siguiente login.
+    Fijar min/max al coste configurado hace que un hash con otro coste también
+    se rehaga, tanto para subirlo como para bajarlo.
+    """
+    scheme = scheme or config.PASSWORD_HASH_SCHEME
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    policy = {
+        "schemes": [scheme] + [other for other in SCHEMES if other != scheme],
+        "default": scheme,
+        "deprecated": ["auto"],
+    }
+    if scheme == "bcrypt":
+        rounds = bcrypt_rounds or config.BCRYPT_ROUNDS
+        policy.update(bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+    else:
+        policy.update(
+            argon2__time_cost=argon2_time_cost or config.ARGON2_TIME_COST,
+            argon2__memory_cost=argon2_memory_cost or config.ARGON2_MEMORY_COST,
+            argon2__parallelism=argon2_parallelism or config.ARGON2_PARALLELISM,
+        )
+    return policy
+
+
+def describe_policy(policy):
+    """Resumen legible de la política activa (esquema y parámetros de coste)"""
+    summary = {"scheme": policy["default"]}
+    for key, value in policy.items():
+        if "__" in key and not key.endswith(("min_rounds", "max_rounds")):
+            summary[key.split("__", 1)[1]] = value
+    return summary
+
+
+# Password context para hash; se reconstruye al cambiar de política
+policy = None
+pwd_context = None
+
+
+def set_policy(new_policy):
+    global policy, pwd_context
+    if new_policy["default"] == "argon2":
+        from passlib.hash import argon2
+
+        if not argon2.has_backend():
+            raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires argon2-cffi (pip install passlib[argon2])")
+    policy = new_policy
+    pwd_context = CryptContext(**new_policy)
+
+
+def _time_hash(context, samples=3):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def calibrate(target_ms, scheme=None):
+    """Política cuyo hash tarda aproximadamente ``target_ms`` en esta máquina"""
+    scheme = scheme or config.PASSWORD_HASH_SCHEME
+    target = target_ms / 1000
+    if scheme == "bcrypt":
+        # Cada ronda adicional duplica el coste de bcrypt
+        probe = 8
+        took = _time_hash(CryptContext(schemes=["bcrypt"], bcrypt__rounds=probe))
+        rounds = probe + round(math.log2(target / took))
+        return build_policy(scheme, bcrypt_rounds=min(max(rounds, 4), 31))
+    # En argon2 el tiempo crece linealmente con time_cost a memoria fija
+    probe_policy = build_policy(scheme, argon2_time_cost=1)
+    took = _time_hash(CryptContext(**probe_policy))
+    return build_policy(scheme, argon2_time_cost=max(1, round(target / took)))
+
+
+set_policy(build_policy())
+
+
+# Funciones a nivel de módulo para que el pool de procesos pueda serializarlas.
+# Devuelven también el tiempo de CPU del hash para separarlo de la espera en cola.
+def _hash(password):
+    started = time.perf_counter()
+    hashed = pwd_context.hash(password)
+    return hashed, time.perf_counter() - started
+
+
+def _verify(password, hashed_password):
+    started = time.perf_counter()
+    valid = pwd_context.verify(password, hashed_password)
+    return valid, time.perf_counter() - started
+
+
+def _verify_and_update(password, hashed_password):
+    started = time.perf_counter()
+    result = pwd_context.verify_and_update(password, hashed_password)
+    return result, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Pool acotado para ejecutar bcrypt fuera del event loop.
+
+    Admite como mucho ``workers + max_queue`` trabajos a la vez; a partir de ahí
+    lanza ``HashingOverloaded`` para que la API responda 503 en vez de encolar
+    logins sin límite.
+    """
+
+    def __init__(self, workers, max_queue, kind="thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.kind = kind
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self.queue_wait = TimingStats()
+        self.hash_time = TimingStats()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        # Los procesos hijos arrancan con la política vigente del padre
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers, initializer=set_policy, initargs=(policy,)
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="pwd-hash"
+                        )
+        return self._executor
+
+    def _submit(self, operation, func, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                metrics.PASSWORD_HASH_REJECTED.inc()
+                raise HashingOverloaded()
+            self._pending += 1
+        enqueued_at = time.perf_counter()
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(partial(self._on_done, operation, enqueued_at))
+        return future
+
+    def _on_done(self, operation, enqueued_at, future):
+        elapsed = time.perf_counter() - enqueued_at
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            _, took = future.result()
+            waited = max(0.0, elapsed - took)
+            self.hash_time.observe(took)
+            self.queue_wait.observe(waited)
+        metrics.PASSWORD_HASH_SECONDS_BY_OP[operation].observe(took)
+        metrics.PASSWORD_HASH_QUEUE_WAIT_BY_OP[operation].observe(waited)
+
+    async def hash(self, password):
+        hashed, _ = await asyncio.wrap_future(self._submit("hash", _hash, password))
+        return hashed
+
+    async def verify(self, password, hashed_password):
+        valid, _ = await asyncio.wrap_future(
+            self._submit("verify", _verify, password, hashed_password)
+        )
+        return valid
+
+    async def verify_and_update(self, password, hashed_password):
+        """Devuelve (válida, nuevo_hash); nuevo_hash es None si no hace falta rehacerlo"""
+        result, _ = await asyncio.wrap_future(
+            self._submit("verify", _verify_and_update, password, hashed_password)
+        )
+        return result
+
+    def apply_policy(self, new_policy):
+        set_policy(new_policy)
+        if self.kind == "process":
+            # Los workers ya lanzados conservan la política anterior
+            with self._lock:
+                executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "policy": describe_policy(policy),
+                "executor": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "rejected": self._rejected,
+                "queue_wait": self.queue_wait.snapshot(),
+                "hash_time": self.hash_time.snapshot(),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher(
+    workers=config.PASSWORD_HASH_WORKERS,
+    max_queue=config.PASSWORD_HASH_MAX_QUEUE,
+    kind=config.PASSWORD_HASH_EXECUTOR,
+)
@@ -0,0 +1,11 @@
+def etag_matches(if_none_match, etag):
+    """True si la cabecera If-None-Match incluye ``etag``.
+
+    Comparación débil (RFC 9110): W/"x" equivale a "x".
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
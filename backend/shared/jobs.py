@@ -0,0 +1,234 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config, metrics
+from shared.db import SessionLocal
+from shared.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "batch_id": job.batch_id,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+    }
+
+
+class JobQueue:
+    """Cola de trabajos en segundo plano sobre la tabla ``jobs``.
+
+    La petición HTTP solo inserta la fila y devuelve su id; los workers del
+    proceso (tareas asyncio) reclaman trabajos con un UPDATE atómico, así que
+    varios procesos pueden compartir la misma tabla sin repartirse un trabajo
+    dos veces. La parte de CPU de cada trabajo se ejecuta con ``run_cpu`` en un
+    pool de procesos para no bloquear el event loop.
+
+    No necesita servicios externos: en local la cola es la propia SQLite.
+    """
+
+    def __init__(self, workers, executor_kind="process", poll_seconds=2.0, max_attempts=3, timeout=600,
+                 retry_backoff=30.0):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown job executor: {executor_kind}")
+        self.workers = workers
+        self.executor_kind = executor_kind
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.retry_backoff = retry_backoff
+        self.handlers = {}
+        self.failure_handlers = {}
+        self._executor = None
+        self._tasks = []
+        self._wakeup = None
+
+    def handler(self, kind, on_failure=None):
+        """Registra la corrutina ``func(payload) -> dict`` que procesa los trabajos ``kind``.
+
+        ``on_failure(payload, error)`` se llama cuando el trabajo agota sus
+        intentos y queda ``failed``, para que el dominio refleje el fallo.
+        """
+        def register(func):
+            self.handlers[kind] = func
+            if on_failure is not None:
+                self.failure_handlers[kind] = on_failure
+            return func
+        return register
+
+    def retry_delay(self, attempts):
+        # Espera exponencial: un error persistente no agota los intentos en segundos
+        return timedelta(seconds=self.retry_backoff * 2 ** (attempts - 1))
+
+    async def enqueue(self, db: AsyncSession, kind, payload, created_by=None, batch_id=None):
+        """Añade el trabajo a la sesión; se ejecutará cuando el llamante haga commit y llame a wake()"""
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status="queued",
+            payload=json.dumps(payload),
+            attempts=0,
+            batch_id=batch_id,
+            created_by=created_by,
+            created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        return job
+
+    def wake(self):
+        # Despierta a los workers de este proceso sin esperar al siguiente sondeo
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _get_executor(self):
+        if self._executor is None:
+            workers = max(1, self.workers)
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="jobs")
+        return self._executor
+
+    async def run_cpu(self, func, *args):
+        """Ejecuta ``func(*args)`` en el pool (la función y sus argumentos deben poder serializarse)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def start(self):
+        # Sin manejadores (p. ej. el microservicio de auth) no se reclama nada
+        if not self.handlers or self.workers <= 0:
+            return
+        await self.requeue_stale()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def requeue_stale(self):
+        """Devuelve a la cola los trabajos que un proceso caído dejó a medias"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.timeout)
+        async with SessionLocal() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.started_at < cutoff, Job.kind.in_(self.handlers))
+                .values(status="queued")
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _claim(self):
+        # Atómico: si otro worker se lleva la misma fila, este UPDATE no afecta a ninguna
+        candidate = (
+            select(Job.id)
+            .where(
+                Job.status == "queued",
+                Job.kind.in_(self.handlers),
+                or_(Job.run_after.is_(None), Job.run_after <= datetime.utcnow()),
+            )
+            .order_by(Job.created_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+        async with SessionLocal() as db:
+            row = (await db.execute(
+                update(Job)
+                .where(Job.id == candidate, Job.status == "queued")
+                .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+                .returning(Job.id, Job.kind, Job.payload, Job.attempts)
+                .execution_options(synchronize_session=False)
+            )).first()
+            await db.commit()
+        return row
+
+    async def _worker(self):
+        while True:
+            try:
+                self._wakeup.clear()
+                job = await self._claim()
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Un fallo de la BD no debe matar al worker
+                logger.exception("Job worker failed, retrying")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _run(self, job):
+        started = time.perf_counter()
+        values = {}
+        try:
+            result = await self.handlers[job.kind](json.loads(job.payload))
+            values.update(status="done", result=json.dumps(result), error=None)
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            error = f"{type(exc).__name__}: {exc}"
+            if job.attempts < self.max_attempts:
+                values.update(status="queued", error=error, run_after=datetime.utcnow() + self.retry_delay(job.attempts))
+            else:
+                values.update(status="failed", error=error)
+                await self._give_up(job, error)
+        values["finished_at"] = datetime.utcnow()
+        metrics.JOB_SECONDS.labels(job.kind).observe(time.perf_counter() - started)
+        metrics.JOB_RESULTS.labels(job.kind, values["status"]).inc()
+        async with SessionLocal() as db:
+            await db.execute(
+                update(Job).where(Job.id == job.id).values(**values).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _give_up(self, job, error):
+        on_failure = self.failure_handlers.get(job.kind)
+        if on_failure is None:
+            return
+        try:
+            await on_failure(json.loads(job.payload), error)
+        except Exception:
+            logger.exception("Failure handler of job %s (%s) failed", job.id, job.kind)
+
+    def stats(self):
+        return {
+            "handlers": sorted(self.handlers),
+            "workers": len(self._tasks),
+            "executor": self.executor_kind,
+        }
+
+
+job_queue = JobQueue(
+    config.JOB_WORKERS,
+    config.JOB_EXECUTOR,
+    config.JOB_POLL_SECONDS,
+    config.JOB_MAX_ATTEMPTS,
+    config.JOB_TIMEOUT_SECONDS,
+    config.JOB_RETRY_BACKOFF_SECONDS,
+)
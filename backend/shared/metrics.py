@@ -0,0 +1,236 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+class TimingStats:
+    """Acumulador simple de duraciones (segundos)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self):
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+# Métricas Prometheus. Con PROMETHEUS_MULTIPROC_DIR definido, prometheus_client
+# escribe cada valor en ficheros mmap por proceso y /metrics los agrega, de modo
+# que los números son correctos con varios workers de uvicorn.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+HASH_BUCKETS = (0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HTTP_REQUESTS = Counter(
+    "proflow_http_requests_total",
+    "HTTP requests by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "proflow_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "proflow_http_requests_in_progress",
+    "HTTP requests currently being served",
+    multiprocess_mode="livesum",
+)
+
+PASSWORD_HASH_SECONDS = Histogram(
+    "proflow_password_hash_seconds",
+    "CPU time spent in bcrypt per operation",
+    ["operation"],
+    buckets=HASH_BUCKETS,
+)
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "proflow_password_hash_queue_wait_seconds",
+    "Time a password hashing job waited for a free worker",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "proflow_password_hash_rejected_total",
+    "Password hashing jobs shed with 503 because the queue was full",
+)
+
+DB_QUERY_SECONDS = Histogram(
+    "proflow_db_query_duration_seconds",
+    "Time spent executing SQL statements",
+    buckets=QUERY_BUCKETS,
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "proflow_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=QUERY_BUCKETS,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "proflow_db_pool_timeouts_total",
+    "Connection checkouts that timed out waiting for the pool",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "proflow_db_pool_checked_out",
+    "Database connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+
+TOKEN_CACHE_REQUESTS = Counter(
+    "proflow_token_cache_requests_total",
+    "get_current_user token cache lookups",
+    ["result"],
+)
+REFRESH_RESULTS = Counter(
+    "proflow_refresh_tokens_total",
+    "Refresh token requests by outcome",
+    ["result"],
+)
+REVOCATION_CHECKS = Counter(
+    "proflow_revocation_checks_total",
+    "Revocation index lookups by where they were answered",
+    ["result"],
+)
+UPLOAD_BYTES = Counter(
+    "proflow_upload_bytes_total",
+    "Bytes of lesson material written to the upload store",
+)
+UPLOAD_RESULTS = Counter(
+    "proflow_uploads_completed_total",
+    "Completed uploads, split into new objects and deduplicated ones",
+    ["result"],
+)
+UPLOADS_IN_PROGRESS = Gauge(
+    "proflow_uploads_in_progress",
+    "Upload request bodies currently being streamed to disk",
+    multiprocess_mode="livesum",
+)
+MATERIAL_RESPONSES = Counter(
+    "proflow_material_responses_total",
+    "Material downloads by how the body was served",
+    ["source"],
+)
+PUBSUB_SUBSCRIPTIONS = Gauge(
+    "proflow_pubsub_subscriptions",
+    "Open real-time connections subscribed to a pub/sub channel",
+    multiprocess_mode="livesum",
+)
+PUBSUB_OVERFLOWS = Counter(
+    "proflow_pubsub_overflows_total",
+    "Subscriptions closed because the client fell behind and its queue filled up",
+)
+RATE_LIMITED = Counter(
+    "proflow_rate_limited_total",
+    "Requests rejected by the token-bucket rate limiter, by key scope",
+    ["scope"],
+)
+AUTH_ADMISSION = Counter(
+    "proflow_auth_admission_total",
+    "Auth requests through the concurrency gate, by outcome",
+    ["result"],
+)
+RESPONSE_CACHE = Counter(
+    "proflow_response_cache_total",
+    "Requests to cached endpoints, by outcome (hit, stale, miss, coalesced, uncacheable)",
+    ["result"],
+)
+JOB_RESULTS = Counter(
+    "proflow_jobs_finished_total",
+    "Background jobs finished, by kind and outcome",
+    ["kind", "status"],
+)
+JOB_SECONDS = Histogram(
+    "proflow_job_seconds",
+    "Time spent running a background job",
+    ["kind"],
+)
+
+# Hijos resueltos de antemano: el camino caliente no paga la búsqueda por etiquetas
+TOKEN_CACHE_HIT = TOKEN_CACHE_REQUESTS.labels("hit")
+TOKEN_CACHE_MISS = TOKEN_CACHE_REQUESTS.labels("miss")
+PASSWORD_HASH_SECONDS_BY_OP = {
+    op: PASSWORD_HASH_SECONDS.labels(op) for op in ("hash", "verify")
+}
+PASSWORD_HASH_QUEUE_WAIT_BY_OP = {
+    op: PASSWORD_HASH_QUEUE_WAIT.labels(op) for op in ("hash", "verify")
+}
+
+
+class PrometheusMiddleware:
+    """Middleware ASGI que mide latencia y peticiones por plantilla de ruta.
+
+    La ruta se toma de ``scope["route"]`` una vez resuelta, así
+    ``/api/courses/{id}`` cuenta como una única serie sea cual sea el id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children = {}
+
+    def _series(self, method, route):
+        key = (method, route)
+        series = self._children.get(key)
+        if series is None:
+            series = (HTTP_LATENCY.labels(method, route), {})
+            self._children[key] = series
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "<unmatched>"
+            latency, counters = self._series(scope["method"], template)
+            latency.observe(elapsed)
+            counter = counters.get(status_code)
+            if counter is None:
+                counter = HTTP_REQUESTS.labels(scope["method"], template, str(status_code))
+                counters[status_code] = counter
+            counter.inc()
+
+
+def render_latest():
+    """Devuelve (cuerpo, content-type) de la exposición Prometheus"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,365 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    event,
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import relationship
+
+from shared.db import Base
+from shared.token_cache import token_cache
+
+
+# Modelos SQLAlchemy
+class User(Base):
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True)
+    username = Column(String, unique=True, index=True)
+    hashed_password = Column(String)
+    role = Column(String, default="student")
+    is_active = Column(Boolean, default=True)
+
+
+# Cualquier cambio en la fila del usuario (alta, baja, cambio de rol) invalida
+# la caché de tokens. Las actualizaciones masivas con query.update() no disparan
+# estos eventos y deben llamar a token_cache.invalidate() explícitamente.
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    token_cache.invalidate(target.email)
+
+
+class RefreshToken(Base):
+    """Refresh token opaco: solo se guarda su SHA-256.
+
+    Todos los tokens de una misma sesión (el del login y los que salen de cada
+    rotación) comparten ``family_id``; revocar la sesión es revocar la familia.
+    """
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_family", "family_id"),
+        Index("ix_refresh_tokens_revoked", "revoked_at"),
+    )
+
+    id = Column(String(64), primary_key=True)
+    family_id = Column(String(32), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    rotated_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+
+class Material(Base):
+    """Fichero subido (vídeo, PDF, imagen), deduplicado por su SHA-256"""
+    __tablename__ = "materials"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """Subida reanudable en curso: bytes recibidos hasta ahora en el fichero parcial"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    received = Column(BigInteger, nullable=False, default=0)
+    # Petición que está escribiendo el trozo en ``received`` y hasta cuándo vale su reserva
+    writer = Column(String(32), nullable=True)
+    writing_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Course(Base):
+    __tablename__ = "courses"
+    __table_args__ = (
+        # Un índice por orden de listado: catálogo público y cursos de un profesor,
+        # ambos del más reciente al más antiguo (paginación por cursor)
+        Index("ix_courses_status_created", "status", "created_at", "id"),
+        Index("ix_courses_teacher_created", "teacher_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_name = Column(String, nullable=False)
+    course_code = Column(String, unique=True, index=True, nullable=False)
+    description = Column(Text, default="")
+    category = Column(String, default="")
+    difficulty = Column(String, default="")
+    duration = Column(String, default="")
+    price = Column(Float, default=0)
+    max_students = Column(Integer, default=0)
+    instructor_name = Column(String, default="")
+    status = Column(String, default="active")
+    thumbnail_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    teacher_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Se incrementa con cada cambio del curso, sus módulos o sus lecciones (ETag de la vista de gestión)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Número de lecciones, mantenido al añadir o borrar lecciones (denominador del progreso)
+    lesson_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # lazy="raise": el agregado se carga siempre con selectinload, nunca fila a fila
+    modules = relationship(
+        "Module",
+        order_by="(Module.position, Module.id)",
+        cascade="all, delete-orphan",
+        lazy="raise",
+    )
+
+
+class Module(Base):
+    __tablename__ = "modules"
+    __table_args__ = (
+        Index("ix_modules_course_position", "course_id", "position"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, default="")
+    position = Column(Integer, nullable=False, default=0)
+
+    lessons = relationship(
+        "Lesson",
+        order_by="(Lesson.position, Lesson.id)",
+        cascade="all, delete-orphan",
+        lazy="raise",
+    )
+
+
+class Lesson(Base):
+    __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_module_position", "module_id", "position"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    module_id = Column(Integer, ForeignKey("modules.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    duration = Column(String, default="")
+    description = Column(Text, default="")
+    material_type = Column(String, default="")
+    material_url = Column(String, default="")
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    position = Column(Integer, nullable=False, default=0)
+
+    material = relationship("Material", lazy="raise")
+
+
+class Enrollment(Base):
+    __tablename__ = "enrollments"
+    __table_args__ = (
+        UniqueConstraint("course_id", "student_id", name="uq_enrollments_course_student"),
+        Index("ix_enrollments_student_course", "student_id", "course_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    progress = Column(Float, default=0)
+    enrolled_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LessonCompletion(Base):
+    """Lección completada por un alumno (como mucho una fila por alumno y lección)"""
+    __tablename__ = "lesson_completions"
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    completed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Assignment(Base):
+    __tablename__ = "assignments"
+    __table_args__ = (
+        Index("ix_assignments_course_deadline", "course_id", "deadline"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, default="")
+    deadline = Column(DateTime, nullable=False)
+    max_score = Column(Float, nullable=False, default=100)
+    attachment_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Submission(Base):
+    """Entrega de un alumno; ``score`` es None hasta que se califica"""
+    __tablename__ = "submissions"
+    __table_args__ = (
+        UniqueConstraint("assignment_id", "student_id", name="uq_submissions_assignment_student"),
+        Index("ix_submissions_student", "student_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    submitted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    score = Column(Float, nullable=True)
+    feedback = Column(Text, default="")
+    graded_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    graded_at = Column(DateTime, nullable=True)
+
+
+class StudentProgress(Base):
+    """Agregados precalculados por alumno y curso para los paneles de progreso y notas.
+
+    Se actualizan con deltas en cada lección completada, entrega y calificación;
+    ``manage.py rebuild-rollups`` los recalcula desde cero. ``grade_total`` es la
+    suma de las notas en porcentaje de ``max_score``.
+    """
+    __tablename__ = "student_progress"
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True, index=True)
+    lessons_completed = Column(Integer, nullable=False, default=0)
+    submitted = Column(Integer, nullable=False, default=0)
+    graded = Column(Integer, nullable=False, default=0)
+    grade_total = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=True)
+
+
+ATTENDANCE_STATUSES = ("Present", "Absent", "Late", "Excused")
+
+
+class Attendance(Base):
+    """Asistencia de un alumno a un curso en una fecha (como mucho una fila por día)"""
+    __tablename__ = "attendance"
+    __table_args__ = (
+        # Clave del upsert masivo y de las consultas por curso y rango de fechas
+        UniqueConstraint("course_id", "date", "student_id", name="uq_attendance_course_date_student"),
+        Index("ix_attendance_student_date", "student_id", "date"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    status = Column(String, nullable=False)
+    time = Column(String, default="")
+    note = Column(String, default="")
+    recorded_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AttendanceSummary(Base):
+    """Recuento precalculado por alumno y curso; se actualiza en cada registro de asistencia"""
+    __tablename__ = "attendance_summaries"
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), primary_key=True, index=True)
+    present = Column(Integer, nullable=False, default=0)
+    absent = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    excused = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)
+    last_date = Column(Date, nullable=True)
+
+
+class Notification(Base):
+    """Aviso para un usuario (nueva lección, nota, anuncio...); se envía también por SSE/WebSocket"""
+    __tablename__ = "notifications"
+    __table_args__ = (
+        # Listado del más reciente al más antiguo y recuento de no leídas
+        Index("ix_notifications_user_id", "user_id", "id"),
+        Index("ix_notifications_user_read", "user_id", "read"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    type = Column(String, nullable=False, default="announcement")
+    title = Column(String, nullable=False)
+    message = Column(Text, default="")
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=True)
+    course_name = Column(String, default="")
+    read = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class Job(Base):
+    """Trabajo en segundo plano; la propia tabla hace de cola (ver shared/jobs.py)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Siguiente trabajo pendiente, en orden de llegada
+        Index("ix_jobs_status_created", "status", "created_at"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    payload = Column(Text, nullable=False, default="{}")
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Tras un intento fallido no se vuelve a reclamar antes de este instante (espera exponencial)
+    run_after = Column(DateTime, nullable=True)
+    # Trabajos lanzados juntos (p. ej. certificados de todo un curso)
+    batch_id = Column(String(32), nullable=True, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class CertificateTemplate(Base):
+    """Título y texto del certificado de un curso (uno por curso)"""
+    __tablename__ = "certificate_templates"
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), unique=True, nullable=False)
+    title = Column(String, nullable=False)
+    description = Column(Text, default="")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Certificate(Base):
+    """Certificado emitido a un alumno; el PDF se genera en segundo plano"""
+    __tablename__ = "certificates"
+    __table_args__ = (
+        UniqueConstraint("course_id", "student_id", name="uq_certificates_course_student"),
+        Index("ix_certificates_student", "student_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    credential_id = Column(String, unique=True, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    # Hash de los datos renderizados: dos certificados con el mismo contenido comparten PDF
+    content_hash = Column(String(64), nullable=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, index=True)
+    job_id = Column(String(32), nullable=True)
+    issued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    rendered_at = Column(DateTime, nullable=True)
@@ -0,0 +1,149 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from shared.serialization import dumps, json_response
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    python_type = column.type.python_type
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def jsonable(value):
+    """Valor apto para JSON (fechas en ISO 8601)"""
+    return _encode_value(value)
+
+
+class Projection:
+    """Campos que un listado puede devolver, cada uno asociado a una columna.
+
+    Con ``?fields=a,b`` solo se seleccionan esas columnas: la consulta no carga
+    filas ORM completas ni columnas que la vista no usa.
+    """
+
+    def __init__(self, fields, default):
+        self.fields = fields
+        self.default = tuple(default)
+
+    def parse(self, fields_param):
+        if not fields_param:
+            return self.default
+        names = tuple(dict.fromkeys(name.strip() for name in fields_param.split(",") if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {unknown}. Available: {sorted(self.fields)}",
+            )
+        return names
+
+    def columns(self, names):
+        return [self.fields[name].label(name) for name in names]
+
+    def to_dict(self, row, names):
+        mapping = row._mapping
+        return {name: jsonable(mapping[name]) for name in names}
+
+
+class Keyset:
+    """Paginación por cursor sobre un orden total (la última columna debe ser única).
+
+    En lugar de ``OFFSET n``, cada página empieza donde acabó la anterior con
+    ``WHERE (a, b) < (:a, :b)``; con un índice que siga el mismo orden el coste
+    de una página no depende de lo lejos que esté.
+    """
+
+    def __init__(self, *columns, descending=False):
+        self.columns = columns
+        self.descending = descending
+
+    def sort_columns(self):
+        return [column.label(f"_k{i}") for i, column in enumerate(self.columns)]
+
+    def encode(self, row):
+        mapping = row._mapping
+        values = [_encode_value(mapping[f"_k{i}"]) for i in range(len(self.columns))]
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise ValueError(cursor)
+            return [_decode_value(column, value) for column, value in zip(self.columns, values)]
+        except (ValueError, TypeError, binascii.Error):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def apply(self, query, cursor, limit):
+        """Añade columnas de orden, filtro del cursor, ORDER BY y LIMIT (uno más para saber si hay otra página)"""
+        query = query.add_columns(*self.sort_columns())
+        if cursor:
+            key = tuple_(*self.columns)
+            values = tuple_(*self.decode(cursor))
+            query = query.where(key < values if self.descending else key > values)
+        order = [column.desc() if self.descending else column.asc() for column in self.columns]
+        return query.order_by(*order).limit(limit + 1)
+
+    def page(self, rows, limit):
+        """(filas de la página, cursor siguiente o None)"""
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, self.encode(rows[-1])
+        return rows, None
+
+
+async def fetch_page(db, query, keyset, projection, names, cursor, limit):
+    """Una página de ``query``: (lista de dicts proyectados, cursor siguiente o None)"""
+    rows = (await db.execute(keyset.apply(query, cursor, limit))).all()
+    rows, next_cursor = keyset.page(rows, limit)
+    return [projection.to_dict(row, names) for row in rows], next_cursor
+
+
+def page_response(key, items, next_cursor):
+    """Respuesta de una página de ``fetch_page`` ya codificada.
+
+    Los dicts proyectados ya son aptos para JSON: se evita jsonable_encoder,
+    que recorre cada valor de cada fila.
+    """
+    return json_response({key: items, "next_cursor": next_cursor, "has_more": next_cursor is not None})
+
+
+async def stream_json_array(session_factory, query, keyset, projection, names, batch_size=500):
+    """Genera un array JSON recorriendo ``query`` por lotes con keyset.
+
+    Cada lote es una consulta corta con su propia sesión, así una exportación
+    larga no mantiene abierta una transacción ni acumula filas en memoria.
+    """
+    yield b"["
+    cursor = None
+    first = True
+    while True:
+        async with session_factory() as db:
+            rows = (await db.execute(keyset.apply(query, cursor, batch_size))).all()
+        rows, cursor = keyset.page(rows, batch_size)
+        if rows:
+            chunk = b",".join(dumps(projection.to_dict(row, names)) for row in rows)
+            yield chunk if first else b"," + chunk
+            first = False
+        if cursor is None:
+            break
+    yield b"]"
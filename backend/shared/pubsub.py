@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+
+from shared import config, metrics
+
+logger = logging.getLogger(__name__)
+
+# Mensaje que recibe una suscripción cuando su cola se desborda: debe resincronizarse
+OVERFLOW = None
+
+
+class Subscription:
+    """Cola acotada de una conexión (WebSocket o SSE) suscrita a un canal.
+
+    Los mensajes son tuplas ``(evento, datos_json)`` ya serializadas: el
+    publicador codifica una vez y todas las conexiones envían el mismo texto.
+    """
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self.queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Consumidor lento: no se bloquea al publicador ni crece la memoria. Se
+            # descarta lo pendiente y la conexión termina pidiendo una resincronización
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+            metrics.PUBSUB_OVERFLOWS.inc()
+
+    async def get(self, timeout=None):
+        """Siguiente mensaje u OVERFLOW; asyncio.TimeoutError si no llega nada en ``timeout``"""
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class MemoryBroker:
+    """Pub/sub dentro del proceso: vale para un único worker y para desarrollo"""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self._subscriptions.clear()
+
+    def subscribe(self, channel):
+        subscription = Subscription(channel, self.queue_size)
+        self._subscriptions[channel].add(subscription)
+        metrics.PUBSUB_SUBSCRIPTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.channel)
+        if subscriptions is None or subscription not in subscriptions:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.channel]
+        metrics.PUBSUB_SUBSCRIPTIONS.dec()
+
+    def subscribers(self, channel):
+        return len(self._subscriptions.get(channel, ()))
+
+    async def publish(self, channel, event, data):
+        self._deliver(channel, (event, json.dumps(data, separators=(",", ":"))))
+
+    async def publish_many(self, messages):
+        """Publica varios ``(canal, evento, datos)`` de una vez (p. ej. un aviso a toda una clase)"""
+        for channel, event, data in messages:
+            await self.publish(channel, event, data)
+
+    def _deliver(self, channel, message):
+        for subscription in tuple(self._subscriptions.get(channel, ())):
+            subscription.deliver(message)
+
+    def stats(self):
+        return {
+            "backend": type(self).__name__,
+            "channels": len(self._subscriptions),
+            "subscriptions": sum(len(subs) for subs in self._subscriptions.values()),
+        }
+
+
+class RedisBroker(MemoryBroker):
+    """Pub/sub entre procesos a través de Redis.
+
+    Cada proceso mantiene una sola suscripción a Redis y reparte localmente
+    los mensajes a sus conexiones: miles de sockets no abren miles de
+    suscripciones en Redis.
+    """
+
+    def __init__(self, url, queue_size, redis_channel="proflow:pubsub"):
+        super().__init__(queue_size)
+        self.url = url
+        self.redis_channel = redis_channel
+        self._redis = None
+        self._listener = None
+
+    async def start(self):
+        from redis import asyncio as aioredis  # dependencia opcional, solo con PUBSUB_BACKEND=redis
+
+        self._redis = aioredis.from_url(self.url)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        await super().stop()
+
+    async def publish(self, channel, event, data):
+        payload = json.dumps([channel, event, data], separators=(",", ":"))
+        await self._redis.publish(self.redis_channel, payload)
+
+    async def publish_many(self, messages):
+        # Un solo viaje de ida y vuelta a Redis para todo el lote
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.publish(self.redis_channel, json.dumps(message, separators=(",", ":")))
+            await pipe.execute()
+
+    async def _listen(self):
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.redis_channel)
+                async for message in pubsub.listen():
+                    channel, event, data = json.loads(message["data"])
+                    self._deliver(channel, (event, json.dumps(data, separators=(",", ":"))))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Redis caído o reiniciado: reintentar sin tumbar la app
+                logger.exception("Redis pub/sub listener failed, retrying")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+def create_broker():
+    if config.PUBSUB_BACKEND == "redis":
+        return RedisBroker(config.REDIS_URL, config.PUBSUB_QUEUE_SIZE)
+    if config.PUBSUB_BACKEND == "memory":
+        return MemoryBroker(config.PUBSUB_QUEUE_SIZE)
+    raise ValueError(f"Unsupported PUBSUB_BACKEND: {config.PUBSUB_BACKEND}")
+
+
+broker = create_broker()
@@ -0,0 +1,350 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+
+from starlette.responses import JSONResponse
+
+from shared import config, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(Exception):
+    """Se agotó la cubeta; ``retry_after`` son los segundos hasta el siguiente token"""
+
+    def __init__(self, scope, retry_after):
+        super().__init__(scope)
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class AuthBusy(Exception):
+    """La cola del control de admisión está llena o se esperó demasiado"""
+
+
+class RateLimit:
+    """Cubeta de ``burst`` tokens que se rellena a ``per_minute`` por minuto"""
+
+    def __init__(self, scope, burst, per_minute):
+        # Sin ritmo la cubeta no se rellena nunca y Retry-After sería infinito
+        if per_minute <= 0 or burst <= 0:
+            raise ValueError(f"Rate limit {scope!r} needs a positive burst and per_minute, got {burst} and {per_minute}")
+        self.scope = scope
+        self.capacity = float(burst)
+        self.rate = per_minute / 60.0
+
+
+class MemoryBucketStore:
+    """Cubetas en un dict del proceso.
+
+    Sin locks: ``take`` no cede el control al event loop entre leer y escribir
+    la cubeta, así que cada operación es atómica dentro del proceso. Cada
+    worker cuenta por su cuenta; con varios, usar ``RedisBucketStore``.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # clave -> (tokens, instante de la última lectura)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        self._buckets.clear()
+
+    async def take(self, key, capacity, rate, cost=1.0):
+        """Gasta ``cost`` tokens si los hay; devuelve 0 o los segundos que faltan para tenerlos"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        # Expulsar la menos reciente equivale, como mucho, a devolverle su ráfaga
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def stats(self):
+        return {"backend": "memory", "keys": len(self._buckets), "max_keys": self.max_keys}
+
+
+# Rellena y gasta en el propio Redis: atómico entre procesos y con el reloj del servidor.
+# Los decimales vuelven como texto porque Redis trunca los números de Lua a enteros.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+  tokens = capacity
+else
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+end
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+
+class RedisBucketStore:
+    """Cubetas compartidas por todos los procesos en Redis (o compatible: Valkey, KeyDB...).
+
+    Un único EVALSHA por comprobación. Si Redis no responde se deja pasar la
+    petición: caído el limitador, el login sigue funcionando.
+    """
+
+    def __init__(self, url, prefix="proflow:ratelimit:"):
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+        self._script = None
+        self.errors = 0
+
+    async def start(self):
+        from redis import asyncio as aioredis  # dependencia opcional, solo con RATE_LIMIT_BACKEND=redis
+
+        self._redis = aioredis.from_url(self.url)
+        self._script = self._redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def stop(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+            self._script = None
+
+    async def take(self, key, capacity, rate, cost=1.0):
+        try:
+            retry_after = await self._script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        except Exception:
+            self.errors += 1
+            logger.warning("Rate limit store unavailable, letting request through", exc_info=True)
+            return 0.0
+        return float(retry_after)
+
+    def stats(self):
+        return {"backend": "redis", "errors": self.errors}
+
+
+def create_bucket_store():
+    if config.RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore(config.RATE_LIMIT_MAX_KEYS)
+    if config.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(config.REDIS_URL)
+    raise ValueError(f"Unsupported RATE_LIMIT_BACKEND: {config.RATE_LIMIT_BACKEND}")
+
+
+class RateLimiter:
+    def __init__(self, store, enabled=True):
+        self.store = store
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = 0
+
+    async def start(self):
+        if self.enabled:
+            await self.store.start()
+
+    async def stop(self):
+        if self.enabled:
+            await self.store.stop()
+
+    async def hit(self, limit: RateLimit, key: str):
+        """Consume un token de ``key``; lanza ``RateLimited`` si la cubeta está vacía"""
+        if not self.enabled:
+            return
+        retry_after = await self.store.take(f"{limit.scope}:{key}", limit.capacity, limit.rate)
+        if retry_after > 0:
+            self.limited += 1
+            metrics.RATE_LIMITED.labels(limit.scope).inc()
+            raise RateLimited(limit.scope, retry_after)
+        self.allowed += 1
+
+    def stats(self):
+        return {"enabled": self.enabled, "allowed": self.allowed, "limited": self.limited, **self.store.stats()}
+
+
+class ConcurrencyGate:
+    """Semáforo con cola acotada para el trabajo caro de autenticación.
+
+    Hasta ``max_concurrent`` peticiones pasan a la vez; las siguientes esperan
+    en orden de llegada (como mucho ``max_queue`` y ``queue_timeout``
+    segundos) y el resto se rechaza con ``AuthBusy``. Al salir, el hueco pasa
+    directamente al primero de la cola. Se crea sin event loop: la cola son
+    futures creados en el loop de cada petición.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self):
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            metrics.AUTH_ADMISSION.labels("admitted").inc()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            metrics.AUTH_ADMISSION.labels("rejected").inc()
+            raise AuthBusy()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # shield: al vencer el plazo el future sigue vivo y se puede ver si llegó el hueco
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._abandon(waiter)
+                self.timed_out += 1
+                metrics.AUTH_ADMISSION.labels("timed_out").inc()
+                raise AuthBusy()
+        except asyncio.CancelledError:
+            # Cliente desconectado: si ya tenía el hueco lo devuelve, si no sale de la cola
+            if waiter.done():
+                self.release()
+            else:
+                self._abandon(waiter)
+            raise
+        self.queued += 1
+        metrics.AUTH_ADMISSION.labels("queued").inc()
+
+    def _abandon(self, waiter):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        # El hueco se traspasa sin bajar in_flight: nadie puede colarse por delante de la cola
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+IP_LIMIT = RateLimit("ip", config.RATE_LIMIT_IP_BURST, config.RATE_LIMIT_IP_PER_MINUTE)
+EMAIL_LIMIT = RateLimit("email", config.RATE_LIMIT_EMAIL_BURST, config.RATE_LIMIT_EMAIL_PER_MINUTE)
+
+rate_limiter = RateLimiter(create_bucket_store(), enabled=config.RATE_LIMIT_ENABLED)
+auth_gate = ConcurrencyGate(
+    config.AUTH_GATE_MAX_CONCURRENT, config.AUTH_GATE_MAX_QUEUE, config.AUTH_GATE_QUEUE_TIMEOUT,
+)
+
+
+def email_key(email: str):
+    # En Redis no quedan direcciones en claro; el mismo email con otras mayúsculas es la misma cubeta
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=16).hexdigest()
+
+
+async def limit_email(email: str):
+    """Cubeta por email para las rutas que reciben uno (login, registro, recuperación)"""
+    await rate_limiter.hit(EMAIL_LIMIT, email_key(email))
+
+
+def client_ip(scope):
+    if config.RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                # La última entrada la añade nuestro proxy; las anteriores las pone el cliente
+                return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def rate_limited_response(exc: RateLimited):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests, please retry later"},
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+def auth_busy_response():
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": str(config.PASSWORD_HASH_RETRY_AFTER)},
+    )
+
+
+class AuthAdmissionMiddleware:
+    """Middleware ASGI para las rutas de ``paths``: cubeta por IP y control de concurrencia.
+
+    Ambos se deciden antes de leer el cuerpo, así que una avalancha de logins
+    se corta sin parsear JSON, tocar la BD ni ocupar el pool de bcrypt. La
+    cubeta por email necesita el cuerpo y la aplican las propias rutas
+    (``limit_email``).
+    """
+
+    def __init__(self, app, paths, limiter=None, gate=None, limit=None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.limiter = limiter or rate_limiter
+        self.gate = gate or auth_gate
+        self.limit = limit or IP_LIMIT
+
+    async def __call__(self, scope, receive, send):
+        # OPTIONS (preflight CORS) no cuenta: no hace trabajo y el navegador lo repite
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.limiter.hit(self.limit, client_ip(scope))
+        except RateLimited as exc:
+            await rate_limited_response(exc)(scope, receive, send)
+            return
+
+        try:
+            await self.gate.acquire()
+        except AuthBusy:
+            await auth_busy_response()(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.release()
@@ -0,0 +1,195 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared import config, metrics
+from shared.models import RefreshToken, User
+from shared.revocation import RevocationIndex
+
+
+def hash_token(token: str):
+    # Los tokens son aleatorios de 256 bits: basta un SHA-256, no hace falta bcrypt
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_family(token: str) -> Optional[str]:
+    """Familia a la que dice pertenecer el token (la BD lo confirma al rotarlo)"""
+    family, _, secret = token.partition(".")
+    if len(family) != 32 or not secret:
+        return None
+    return family
+
+
+def epoch(moment: datetime):
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+async def load_revoked_families(db: AsyncSession, since: Optional[float]):
+    query = (
+        select(RefreshToken.family_id, func.max(RefreshToken.expires_at))
+        .where(RefreshToken.revoked_at.isnot(None), RefreshToken.expires_at > datetime.utcnow())
+        .group_by(RefreshToken.family_id)
+    )
+    if since is not None:
+        query = query.where(RefreshToken.revoked_at >= datetime.utcfromtimestamp(since))
+    return [(family, epoch(expires_at)) for family, expires_at in (await db.execute(query)).all()]
+
+
+async def lookup_revoked_family(db: AsyncSession, family: str):
+    expires_at = await db.scalar(
+        select(func.max(RefreshToken.expires_at))
+        .where(RefreshToken.family_id == family, RefreshToken.revoked_at.isnot(None))
+    )
+    return epoch(expires_at) if expires_at is not None else None
+
+
+# Sesiones revocadas: lo consultan el refresh y get_current_user (claim "fam" del token de acceso)
+revoked_sessions = RevocationIndex(
+    load_revoked_families,
+    lookup_revoked_family,
+    max_entries=config.REVOCATION_MAP_SIZE,
+    bloom_bits=config.REVOCATION_BLOOM_BITS,
+    sync_seconds=config.REVOCATION_SYNC_SECONDS,
+)
+
+
+def refresh_rejected(result, detail="Invalid refresh token"):
+    metrics.REFRESH_RESULTS.labels(result).inc()
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: AsyncSession, user_id: int, family_id: Optional[str] = None):
+    """Añade un refresh token a la sesión (nueva familia si no se indica) y devuelve (token, familia).
+
+    Quien llama hace commit. El token en claro solo existe en la respuesta.
+    """
+    family_id = family_id or uuid.uuid4().hex
+    token = f"{family_id}.{secrets.token_urlsafe(32)}"
+    now = datetime.utcnow()
+    db.add(RefreshToken(
+        id=hash_token(token),
+        family_id=family_id,
+        user_id=user_id,
+        created_at=now,
+        expires_at=now + timedelta(days=config.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return token, family_id
+
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    """Revoca todos los tokens de la sesión y la apunta en el índice; quien llama hace commit"""
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .returning(RefreshToken.expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    expires = result.scalars().all()
+    if expires:
+        revoked_sessions.add(family_id, epoch(max(expires)))
+    return bool(expires)
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str):
+    """Consume ``token`` y emite el siguiente de su familia: (usuario, token nuevo, familia).
+
+    Sin bcrypt: un UPDATE atómico marca el token como rotado solo si sigue
+    vigente, así que dos usos simultáneos no pueden rotarlo dos veces. Si llega
+    un token ya rotado (fuera del margen de gracia) se considera robado y se
+    revoca toda la sesión.
+    """
+    family_id = token_family(token)
+    if family_id is None:
+        raise refresh_rejected("invalid")
+    # Sesiones cerradas o comprometidas: se rechazan sin consultar la BD
+    if await revoked_sessions.is_revoked(db, family_id):
+        raise refresh_rejected("revoked", "Session has been revoked")
+
+    token_id = hash_token(token)
+    now = datetime.utcnow()
+    user_id = (await db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.id == token_id,
+            RefreshToken.family_id == family_id,
+            RefreshToken.rotated_at.is_(None),
+            RefreshToken.revoked_at.is_(None),
+            RefreshToken.expires_at > now,
+        )
+        .values(rotated_at=now)
+        .returning(RefreshToken.user_id)
+        .execution_options(synchronize_session=False)
+    )).scalar()
+
+    if user_id is None:
+        previous = (await db.execute(
+            select(RefreshToken.rotated_at, RefreshToken.revoked_at, RefreshToken.expires_at)
+            .where(RefreshToken.id == token_id, RefreshToken.family_id == family_id)
+        )).first()
+        if previous is None:
+            raise refresh_rejected("invalid")
+        if previous.revoked_at is not None:
+            raise refresh_rejected("revoked", "Session has been revoked")
+        if previous.expires_at <= now:
+            raise refresh_rejected("expired", "Refresh token expired")
+        if now - previous.rotated_at <= timedelta(seconds=config.REFRESH_REUSE_GRACE_SECONDS):
+            # Carrera legítima entre pestañas: la otra ya recibió la cookie nueva
+            raise refresh_rejected("grace", "Refresh token already used")
+        await revoke_family(db, family_id)
+        await db.commit()
+        raise refresh_rejected("reused", "Refresh token reuse detected, session revoked")
+
+    user = await db.get(User, user_id)
+    if user is None or not user.is_active:
+        await revoke_family(db, family_id)
+        await db.commit()
+        raise refresh_rejected("inactive", "User is not active")
+    new_token, _ = issue_refresh_token(db, user.id, family_id)
+    await db.commit()
+    metrics.REFRESH_RESULTS.labels("rotated").inc()
+    return user, new_token, family_id
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str):
+    """Cierra la sesión de ``token`` si existe (logout); quien llama hace commit"""
+    family_id = token_family(token)
+    if family_id is None:
+        return False
+    owned = await db.scalar(
+        select(RefreshToken.id).where(RefreshToken.id == hash_token(token), RefreshToken.family_id == family_id)
+    )
+    return bool(owned) and await revoke_family(db, family_id)
+
+
+def set_refresh_cookie(response: Response, token: str):
+    # HttpOnly y limitada a /api/auth: el JavaScript no la ve y el resto de la API no la recibe
+    response.set_cookie(
+        config.REFRESH_COOKIE_NAME,
+        token,
+        max_age=int(config.REFRESH_TOKEN_EXPIRE_DAYS * 86400),
+        path="/api/auth",
+        httponly=True,
+        secure=config.REFRESH_COOKIE_SECURE,
+        samesite=config.REFRESH_COOKIE_SAMESITE,
+    )
+
+
+def clear_refresh_cookie(response: Response):
+    response.delete_cookie(
+        config.REFRESH_COOKIE_NAME,
+        path="/api/auth",
+        httponly=True,
+        secure=config.REFRESH_COOKIE_SECURE,
+        samesite=config.REFRESH_COOKIE_SAMESITE,
+    )
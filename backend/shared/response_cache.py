@@ -0,0 +1,423 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
+from shared import config, metrics
+from shared.db import SessionLocal
+from shared.serialization import dumps
+from shared.token_cache import CachedUser
+
+logger = logging.getLogger(__name__)
+
+# Cabeceras que puede llevar una respuesta para guardarse: con cualquier otra
+# (Set-Cookie, ETag...) la respuesta es específica de la petición
+CACHEABLE_HEADERS = {"content-length", "content-type"}
+VARY = (None, "role", "user")
+
+
+class CachedResponse(NamedTuple):
+    """Respuesta guardada: cuerpo ya codificado y hasta cuándo es fresca o servible"""
+
+    body: bytes
+    status_code: int
+    media_type: str
+    fresh_until: float
+    stale_until: float
+    tags: dict  # {etiqueta: versión} al calcularla
+
+    def to_bytes(self):
+        meta = [self.status_code, self.media_type, self.fresh_until, self.stale_until, self.tags]
+        return json.dumps(meta, separators=(",", ":")).encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, raw):
+        meta, body = raw.split(b"\n", 1)
+        status_code, media_type, fresh_until, stale_until, tags = json.loads(meta)
+        return cls(body, status_code, media_type, fresh_until, stale_until, tags)
+
+
+class MemoryResponseStore:
+    """LRU en el proceso, limitada en entradas y en bytes de cuerpo.
+
+    Las etiquetas son contadores de versión: invalidar sube la versión y las
+    entradas calculadas con la anterior dejan de servirse. Sin locks, como
+    ``MemoryBucketStore``: nada cede el control al event loop a mitad.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._tags = {}
+        self.size_bytes = 0
+        self.evictions = 0
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(entry.body)
+
+    async def get(self, key, tags):
+        """(entrada servible o None, versiones actuales de ``tags``)"""
+        versions = {tag: self._tags.get(tag, 0) for tag in tags}
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, versions
+        if entry.tags != versions or entry.stale_until <= time.time():
+            self._discard(key)
+            return None, versions
+        self._entries.move_to_end(key)
+        return entry, versions
+
+    async def set(self, key, entry):
+        if len(entry.body) > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = entry
+        self.size_bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted.body)
+            self.evictions += 1
+
+    async def invalidate(self, tags):
+        for tag in tags:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    async def lock(self, key, seconds):
+        # Un solo proceso: la agrupación en vuelo de ResponseCache ya basta
+        return True
+
+    async def unlock(self, key):
+        pass
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "evictions": self.evictions,
+            "tags": len(self._tags),
+        }
+
+
+class RedisResponseStore:
+    """Entradas compartidas por todos los procesos en Redis (o compatible).
+
+    Cada entrada es una clave que caduca al final de su periodo stale y las
+    versiones de etiqueta son contadores INCR: una lectura es un único MGET de
+    la entrada y sus etiquetas. Si Redis falla se comporta como un fallo de
+    caché y la petición se calcula normalmente.
+    """
+
+    def __init__(self, url, prefix="proflow:cache:"):
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+        self.errors = 0
+
+    async def start(self):
+        from redis import asyncio as aioredis  # dependencia opcional, solo con RESPONSE_CACHE_BACKEND=redis
+
+        self._redis = aioredis.from_url(self.url)
+
+    async def stop(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}tag:{tag}"
+
+    async def get(self, key, tags):
+        try:
+            values = await self._redis.mget([self.prefix + key, *map(self._tag_key, tags)])
+        except Exception:
+            self.errors += 1
+            logger.warning("Response cache store unavailable, computing response", exc_info=True)
+            # Sin versiones: la respuesta calculada no se guarda
+            return None, None
+        versions = {tag: int(value or 0) for tag, value in zip(tags, values[1:])}
+        entry = CachedResponse.from_bytes(values[0]) if values[0] else None
+        if entry is not None and entry.tags != versions:
+            entry = None
+        return entry, versions
+
+    async def set(self, key, entry):
+        ttl_ms = int((entry.stale_until - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        try:
+            await self._redis.set(self.prefix + key, entry.to_bytes(), px=ttl_ms)
+        except Exception:
+            self.errors += 1
+            logger.warning("Could not store cached response", exc_info=True)
+
+    async def invalidate(self, tags):
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(self._tag_key(tag))
+                await pipe.execute()
+        except Exception:
+            # Las entradas afectadas se sirven hasta que caduquen
+            self.errors += 1
+            logger.warning("Could not invalidate cache tags %s", tags, exc_info=True)
+
+    async def lock(self, key, seconds):
+        try:
+            return bool(await self._redis.set(f"{self.prefix}lock:{key}", b"1", nx=True, px=int(seconds * 1000)))
+        except Exception:
+            self.errors += 1
+            return True
+
+    async def unlock(self, key):
+        try:
+            await self._redis.delete(f"{self.prefix}lock:{key}")
+        except Exception:
+            self.errors += 1
+
+    def stats(self):
+        return {"backend": "redis", "errors": self.errors}
+
+
+def create_response_store():
+    if config.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryResponseStore(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_MAX_BYTES)
+    if config.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisResponseStore(config.REDIS_URL)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_BACKEND: {config.RESPONSE_CACHE_BACKEND}")
+
+
+def to_entry(result, versions, ttl, stale_ttl):
+    """La respuesta del endpoint como ``CachedResponse``, o None si no se puede guardar"""
+    if isinstance(result, Response):
+        body = getattr(result, "body", None)  # StreamingResponse no tiene body
+        if body is None or result.status_code != 200:
+            return None
+        if any(name.decode().lower() not in CACHEABLE_HEADERS for name, _ in result.raw_headers):
+            return None
+        media_type = result.headers.get("content-type", "application/json")
+    else:
+        body, media_type = dumps(jsonable_encoder(result)), "application/json"
+    now = time.time()
+    return CachedResponse(body, 200, media_type, now + ttl, now + ttl + stale_ttl, versions)
+
+
+class ResponseCache:
+    """Caché de respuestas de rutas GET con invalidación por etiquetas.
+
+    - Clave: ruta, parámetros de query y, según ``vary``, el rol o el usuario.
+    - Etiquetas: las rutas que escriben llaman a ``invalidate`` tras el commit
+      y las entradas con esas etiquetas dejan de servirse.
+    - Stale-while-revalidate: pasado ``ttl`` la entrada se sigue sirviendo
+      ``stale_ttl`` segundos más mientras se recalcula en segundo plano.
+    - Agrupación: los fallos simultáneos de una clave esperan al primero, así
+      que solo uno llega a la BD (entre procesos, con un lock en Redis).
+    """
+
+    def __init__(self, store, enabled=True, ttl=30.0, stale_ttl=300.0, lock_seconds=5.0):
+        self.store = store
+        self.enabled = enabled
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_seconds = lock_seconds
+        self._inflight = {}
+        self._tasks = set()
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.revalidations = 0
+        self.invalidations = 0
+
+    async def start(self):
+        if self.enabled:
+            await self.store.start()
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.enabled:
+            await self.store.stop()
+
+    async def invalidate(self, *tags):
+        """Deja de servir las entradas con alguna de ``tags`` (llamar tras el commit)"""
+        if self.enabled and tags:
+            self.invalidations += len(tags)
+            await self.store.invalidate(tags)
+
+    def cached(self, ttl=None, stale_ttl=None, tags=(), vary=None):
+        """Decorador de rutas GET que devuelven JSON; va debajo de ``@router.get``.
+
+        FastAPI resuelve antes las dependencias, así que la autenticación y los
+        permisos se comprueban también en los aciertos. ``vary`` es None (la
+        misma respuesta para todos), ``"role"`` o ``"user"``; ``tags`` admite
+        los parámetros de ruta y ``user``: ``"certificates:student:{user.id}"``.
+        """
+        if vary not in VARY:
+            raise ValueError(f"vary must be one of {VARY}")
+        ttl = self.ttl if ttl is None else ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+
+        def decorator(endpoint):
+            signature = inspect.signature(endpoint)
+            parameters = list(signature.parameters.values())
+            request_param = next((p.name for p in parameters if p.annotation is Request), None)
+            pass_request = request_param is not None
+            if not pass_request:
+                # La clave necesita la petición: se añade un parámetro que FastAPI rellena
+                request_param = "_cache_request"
+                parameters.append(inspect.Parameter(request_param, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+
+            @functools.wraps(endpoint)
+            async def wrapper(**kwargs):
+                request = kwargs[request_param] if pass_request else kwargs.pop(request_param)
+                if not self.enabled:
+                    return await endpoint(**kwargs)
+                user = next((value for value in kwargs.values() if isinstance(value, CachedUser)), None)
+                key = self.key(endpoint, request, vary, user)
+                entry_tags = [tag.format(user=user, **request.path_params) for tag in tags]
+                return await self._serve(key, entry_tags, ttl, stale_ttl, endpoint, kwargs)
+
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+            return wrapper
+
+        return decorator
+
+    def key(self, endpoint, request, vary, user):
+        if vary is not None and user is None:
+            raise RuntimeError(f"{endpoint.__name__}: vary={vary!r} needs an authenticated user dependency")
+        who = "" if vary is None else user.role if vary == "role" else str(user.id)
+        query = urlencode(sorted(request.query_params.multi_items()))
+        digest = hashlib.blake2b(f"{request.url.path}?{query}|{who}".encode(), digest_size=16).hexdigest()
+        return f"{endpoint.__name__}:{digest}"
+
+    def _response(self, entry, state):
+        metrics.RESPONSE_CACHE.labels(state.lower()).inc()
+        return Response(entry.body, status_code=entry.status_code, media_type=entry.media_type,
+                        headers={"X-Cache": state})
+
+    async def _serve(self, key, tags, ttl, stale_ttl, endpoint, kwargs):
+        entry, versions = await self.store.get(key, tags)
+        if entry is not None:
+            if time.time() < entry.fresh_until:
+                self.hits += 1
+                return self._response(entry, "HIT")
+            self.stale += 1
+            self._revalidate(key, tags, versions, ttl, stale_ttl, endpoint, kwargs)
+            return self._response(entry, "STALE")
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Otra petición ya está calculando esta clave: se espera a su resultado
+            self.coalesced += 1
+            entry = await asyncio.shield(future)
+            if entry is not None:
+                return self._response(entry, "COALESCED")
+            return await endpoint(**kwargs)
+
+        self.misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        result = entry = None
+        try:
+            result, entry = await self._fill(key, tags, versions, ttl, stale_ttl, lambda: endpoint(**kwargs))
+        finally:
+            # Si falló, quienes esperaban calculan la respuesta por su cuenta
+            self._inflight.pop(key, None)
+            future.set_result(entry)
+        if entry is None:
+            metrics.RESPONSE_CACHE.labels("uncacheable").inc()
+            return result
+        return self._response(entry, "MISS")
+
+    async def _fill(self, key, tags, versions, ttl, stale_ttl, call):
+        """Calcula y guarda la respuesta: (resultado del endpoint, entrada o None)"""
+        locked = await self.store.lock(key, self.lock_seconds)
+        if not locked:
+            # Otro proceso la está calculando: se espera a que la guarde
+            deadline = time.monotonic() + self.lock_seconds
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                entry, _ = await self.store.get(key, tags)
+                if entry is not None:
+                    self.coalesced += 1
+                    return None, entry
+        try:
+            result = await call()
+            entry = to_entry(result, versions, ttl, stale_ttl)
+            # Sin versiones (el almacén falló al leer) no se sabe si sigue siendo válida
+            if entry is not None and versions is not None:
+                await self.store.set(key, entry)
+            return result, entry
+        finally:
+            if locked:
+                await self.store.unlock(key)
+
+    def _revalidate(self, key, tags, versions, ttl, stale_ttl, endpoint, kwargs):
+        if key in self._inflight:
+            return
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._refresh(key, tags, versions, ttl, stale_ttl, endpoint, kwargs, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key, tags, versions, ttl, stale_ttl, endpoint, kwargs, future):
+        entry = None
+        try:
+            # La sesión de la petición se cierra al responder: el recálculo abre la suya
+            async with AsyncExitStack() as stack:
+                fresh = {}
+                for name, value in kwargs.items():
+                    if isinstance(value, AsyncSession):
+                        value = await stack.enter_async_context(SessionLocal())
+                    fresh[name] = value
+                _, entry = await self._fill(key, tags, versions, ttl, stale_ttl, lambda: endpoint(**fresh))
+            self.revalidations += 1
+        except Exception:
+            logger.exception("Background revalidation of cached response %s failed", key)
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(entry)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "revalidations": self.revalidations,
+            "invalidations": self.invalidations,
+            "inflight": len(self._inflight),
+            **self.store.stats(),
+        }
+
+
+response_cache = ResponseCache(
+    create_response_store(),
+    enabled=config.RESPONSE_CACHE_ENABLED,
+    ttl=config.RESPONSE_CACHE_TTL,
+    stale_ttl=config.RESPONSE_CACHE_STALE_SECONDS,
+    lock_seconds=config.RESPONSE_CACHE_LOCK_SECONDS,
+)
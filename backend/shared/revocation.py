@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from shared import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Conjunto aproximado en ``size_bits`` bits: sin falsos negativos, pocos falsos positivos.
+
+    Las ``hashes`` posiciones de cada clave salen de un único blake2b
+    (doble hashing), así que añadir o consultar cuesta un hash por clave.
+    """
+
+    def __init__(self, size_bits=1 << 20, hashes=7):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size_bits for i in range(self.hashes)]
+
+    @property
+    def capacity(self):
+        # Claves hasta las que la tasa de falsos positivos se mantiene en torno al 1 %
+        return self.size_bits // 10
+
+    def add(self, key: str):
+        new = False
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, key: str):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationIndex:
+    """Índice en memoria de claves revocadas (familias de refresh tokens), respaldado por la BD.
+
+    - Filtro de Bloom con todas las revocaciones vigentes: si dice que no, la
+      clave no está revocada y no se consulta nada más (el caso habitual).
+    - Mapa LRU con TTL de las revocaciones recientes (hasta ``max_entries``):
+      confirma la mayoría de positivos sin ir a la BD.
+    - Si el filtro dice que sí pero el mapa no la tiene (expulsada del mapa o
+      falso positivo) se pregunta a la BD con ``lookup(db, key)``.
+
+    ``sync(db)`` incorpora las revocaciones que hicieron otros procesos; la BD
+    sigue siendo la fuente de verdad, el índice solo evita consultarla. Como el
+    filtro no admite borrados, cuando se llena se reconstruye con una carga
+    completa de las revocaciones vigentes.
+    """
+
+    def __init__(self, loader, lookup, max_entries=10000, bloom_bits=1 << 20, bloom_hashes=7, sync_seconds=30.0):
+        # loader(db, since) -> [(clave, expira_en_epoch)] revocadas desde ``since`` (None: todas las vigentes)
+        # lookup(db, clave) -> expira_en_epoch si está revocada, si no None
+        self.loader = loader
+        self.lookup = lookup
+        self.max_entries = max_entries
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        self.sync_seconds = sync_seconds
+        self._bloom = BloomFilter(bloom_bits, bloom_hashes)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._task = None
+        self.bloom_negatives = 0
+        self.map_hits = 0
+        self.db_lookups = 0
+
+    def add(self, key: str, expires_at: float):
+        """Marca ``key`` como revocada hasta ``expires_at`` (epoch); pasado ese momento ya no importa"""
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._bloom.add(key)
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def is_revoked(self, db, key: str):
+        now = time.time()
+        with self._lock:
+            if key not in self._bloom:
+                self.bloom_negatives += 1
+                result = None
+            else:
+                expires_at = self._entries.get(key)
+                if expires_at is not None:
+                    self._entries.move_to_end(key)
+                    self.map_hits += 1
+                    result = expires_at > now
+                else:
+                    result = "lookup"
+        if result is None:
+            metrics.REVOCATION_CHECKS.labels("bloom_negative").inc()
+            return False
+        if result != "lookup":
+            metrics.REVOCATION_CHECKS.labels("map_hit").inc()
+            return result
+
+        self.db_lookups += 1
+        metrics.REVOCATION_CHECKS.labels("db").inc()
+        expires_at = await self.lookup(db, key)
+        if expires_at is None:
+            return False
+        self.add(key, expires_at)
+        return expires_at > now
+
+    async def sync(self, db):
+        """Carga las revocaciones posteriores a la última sincronización (todas si toca reconstruir)"""
+        started = time.time()
+        full = self._synced_at is None or self._bloom.count >= self._bloom.capacity
+        # Solape de un intervalo: una revocación confirmada justo durante la consulta anterior no se pierde
+        since = None if full else self._synced_at - max(self.sync_seconds, 1.0)
+        rows = await self.loader(db, since)
+        if full:
+            self._rebuild(rows)
+        else:
+            for key, expires_at in rows:
+                self.add(key, expires_at)
+        self._synced_at = started
+        return len(rows)
+
+    def _rebuild(self, rows):
+        now = time.time()
+        bloom = BloomFilter(self.bloom_bits, self.bloom_hashes)
+        for key, expires_at in rows:
+            if expires_at > now:
+                bloom.add(key)
+        with self._lock:
+            for key in [key for key, expires_at in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+            # Las añadidas por este proceso mientras se cargaba también se conservan
+            for key in self._entries:
+                bloom.add(key)
+            self._bloom = bloom
+
+    async def start(self, session_factory):
+        # Carga completa al arrancar y después sincronización periódica en segundo plano
+        async with session_factory() as db:
+            await self.sync(db)
+        if self.sync_seconds > 0:
+            self._task = asyncio.create_task(self._sync_loop(session_factory))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sync_loop(self, session_factory):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                async with session_factory() as db:
+                    await self.sync(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Revocation index sync failed, retrying")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bloom_keys": self._bloom.count,
+                "bloom_bits": self.bloom_bits,
+                "bloom_negatives": self.bloom_negatives,
+                "map_hits": self.map_hits,
+                "db_lookups": self.db_lookups,
+            }
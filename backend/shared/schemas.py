@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, EmailStr
+
+
+# Schemas Pydantic
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+
+class TokenData(BaseModel):
+    email: Optional[str] = None
+    role: Optional[str] = None
+
+
+class UserBase(BaseModel):
+    email: EmailStr
+
+
+class UserCreate(UserBase):
+    password: str
+    # Los administradores se dan de alta con `manage.py import-users --role admin`
+    role: Literal["student", "teacher"] = "student"
+    username: Optional[str] = None
+
+
+class UserLogin(BaseModel):
+    email: str
+    password: str
+    role: str = "student"
+
+
+class RefreshRequest(BaseModel):
+    # Clientes sin cookies (apps, scripts); el navegador usa la cookie HttpOnly
+    refresh_token: Optional[str] = None
+
+
+class UserResponse(UserBase):
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    class Config:
+        orm_mode = True
+
+
+class MaterialResponse(BaseModel):
+    id: int
+    sha256: str
+    size: int
+    content_type: str
+    filename: str
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+class UploadCreate(BaseModel):
+    filename: str
+    content_type: str = "application/octet-stream"
+    size: int
+
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    offset: int
+    size: int
+    chunk_size: int
+    complete: bool = False
+    material: Optional[MaterialResponse] = None
+
+
+class AttendanceRecordIn(BaseModel):
+    student_id: int
+    status: Literal["Present", "Absent", "Late", "Excused"]
+    time: str = ""
+    note: str = ""
+
+
+class BulkAttendance(BaseModel):
+    course_id: int
+    date: date
+    records: List[AttendanceRecordIn]
+
+
+class EnrollRequest(BaseModel):
+    courseId: int
+
+
+class CourseUpdate(BaseModel):
+    # Los campos ausentes (None) no se modifican
+    courseName: Optional[str] = None
+    courseCode: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+    duration: Optional[str] = None
+    price: Optional[float] = None
+    maxStudents: Optional[int] = None
+    instructorName: Optional[str] = None
+    status: Optional[str] = None
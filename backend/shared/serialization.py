@@ -0,0 +1,64 @@
+import json
+from datetime import date, datetime
+from operator import attrgetter
+
+from fastapi.responses import JSONResponse
+
+from shared import config
+
+try:
+    import orjson
+except ImportError:  # Opcional: sin orjson se usa json de la stdlib
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None and config.FAST_JSON:
+    def dumps(value) -> bytes:
+        # orjson serializa fechas (ISO 8601, como jsonable) sin pasar por Python
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que codifica con orjson (o json de la stdlib si no está instalado)"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, status_code=200, headers=None):
+    """Respuesta ya codificada: FastAPI no pasa ``content`` por jsonable_encoder ni por response_model.
+
+    Solo con datos de confianza (filas de la BD, dicts construidos aquí): no
+    se valida nada.
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+class Serializer:
+    """Serializador precompilado de un schema para objetos de confianza (filas ORM, CachedUser).
+
+    Lee los campos del schema con un único ``attrgetter`` construido al
+    importar, sin validar ni construir el modelo pydantic: el objeto ya cumple
+    el schema porque sale de la BD.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.names = tuple(schema.model_fields)
+        getter = attrgetter(*self.names)
+        self._values = getter if len(self.names) > 1 else (lambda obj: (getter(obj),))
+
+    def __call__(self, obj):
+        return dict(zip(self.names, self._values(obj)))
+
+    def many(self, objs):
+        return [self(obj) for obj in objs]
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from shared import config, metrics
+
+
+class CachedUser(NamedTuple):
+    """Copia inmutable de la fila de usuario, segura para compartir entre peticiones"""
+
+    id: int
+    email: str
+    username: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_orm(cls, user):
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            role=user.role,
+            is_active=user.is_active,
+        )
+
+    @classmethod
+    def from_claims(cls, payload):
+        # Solo si el token trae todos los datos necesarios para responder
+        try:
+            return cls(
+                id=int(payload["uid"]),
+                email=payload["sub"],
+                username=payload["username"],
+                role=payload["role"],
+                is_active=bool(payload["is_active"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class TokenCache:
+    """Caché LRU con TTL de usuarios validados, indexada por (sub, exp) del token.
+
+    Cada entrada caduca en ``ttl`` segundos o cuando expira el token, lo que
+    ocurra antes. ``invalidate(email)`` descarta todas las entradas de un usuario
+    cuando su fila cambia.
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_email = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, email: str, exp) -> Optional[CachedUser]:
+        if not self.enabled:
+            return None
+        key = (email, exp)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.TOKEN_CACHE_MISS.inc()
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.misses += 1
+                metrics.TOKEN_CACHE_MISS.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        metrics.TOKEN_CACHE_HIT.inc()
+        return user
+
+    def put(self, email: str, exp, user: CachedUser):
+        if not self.enabled:
+            return
+        key = (email, exp)
+        expires_at = time.monotonic() + self.ttl
+        if exp is not None:
+            # No mantener en caché un token más allá de su propia expiración
+            expires_at = min(expires_at, time.monotonic() + max(0.0, exp - time.time()))
+        with self._lock:
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            self._by_email.setdefault(email, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest, _ = self._entries.popitem(last=False)
+                self._forget(oldest)
+                self.evictions += 1
+
+    def invalidate(self, email: str):
+        with self._lock:
+            for key in self._by_email.pop(email, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_email.clear()
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        self._forget(key)
+
+    def _forget(self, key):
+        keys = self._by_email.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_email[key[0]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+token_cache = TokenCache(max_size=config.TOKEN_CACHE_SIZE, ttl=config.TOKEN_CACHE_TTL)
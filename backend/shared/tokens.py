@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import jwt
+
+from shared import config
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=15)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
+    return encoded_jwt
+
+
+def decode_access_token(token: str):
+    """Valida firma y expiración; lanza JWTError si el token no es válido"""
+    return jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+
+
+def issue_user_token(user, family_id: Optional[str] = None):
+    """Token de acceso con los claims que usa get_current_user (incluido TRUST_TOKEN_CLAIMS).
+
+    ``family_id`` es la sesión de refresh tokens que lo emitió (claim ``fam``):
+    al revocarla dejan de aceptarse también sus tokens de acceso.
+    """
+    data = {
+        "sub": user.email,
+        "role": user.role,
+        "uid": user.id,
+        "username": user.username,
+        "is_active": user.is_active,
+    }
+    if family_id is not None:
+        data["fam"] = family_id
+    return create_access_token(data=data, expires_delta=timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { FiClock, FiUser, FiCalendar, FiBookOpen, FiX } from "react-icons/fi";
+import { FiClock, FiUser, FiCalendar, FiBookOpen, FiX, FiSearch } from "react-icons/fi";
 import { toast } from "react-toastify";
 import axios from "axios";
 
@@ -8,14 +8,20 @@ const NewCourses = () => {
   const [selectedCourse, setSelectedCourse] = useState(null);
   const [showModal, setShowModal] = useState(false);
   const [newCourses, setNewCourses] = useState([]);
+  const [searchQuery, setSearchQuery] = useState("");
   const BASE_URL = process.env.REACT_APP_API_URL || "http://localhost:8000";
 
   useEffect(() => {
+    const query = searchQuery.trim();
     const fetchCourses = async () => {
       try {
+        // With a query, the server returns only the top matches from its index
         const response = await axios.get(
-          `${BASE_URL}/api/courses/getallcourses`,
+          query
+            ? `${BASE_URL}/api/search/courses`
+            : `${BASE_URL}/api/courses/getallcourses`,
           {
+            params: query ? { q: query, limit: 20 } : undefined,
             headers: {
               Authorization: `Bearer ${localStorage.getItem("accessToken")}`,
             },
@@ -27,8 +33,10 @@ const NewCourses = () => {
       }
     };
 
-    fetchCourses();
-  }, []);
+    // Wait until the user stops typing before searching
+    const timer = setTimeout(fetchCourses, query ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
   const handleEnrollCourse = async (courseId) => {
     setEnrollingCourseId(courseId);
@@ -81,7 +89,19 @@ const NewCourses = () => {
   return (
     <div className="space-y-6">
       <div className="bg-white rounded-xl shadow-sm p-6">
-        <h2 className="text-xl font-bold mb-6">New Available Courses</h2>
+        <div className="flex flex-col md:flex-row md:items-center justify-between gap-4 mb-6">
+          <h2 className="text-xl font-bold">New Available Courses</h2>
+          <div className="relative w-full md:w-72">
+            <FiSearch className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" />
+            <input
+              type="text"
+              value={searchQuery}
+              onChange={(e) => setSearchQuery(e.target.value)}
+              placeholder="Search courses..."
+              className="w-full pl-9 pr-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-[#19a4db]"
+            />
+          </div>
+        </div>
 
         {newCourses.length === 0 ? (
           <div className="text-center py-12 bg-gray-50 rounded-xl">
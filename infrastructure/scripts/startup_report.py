@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Informe de arranque en frío de la API (importación y primera respuesta).
+
+Ejecuta `python -X importtime -c "import main"` en un intérprete limpio, agrega
+los tiempos por paquete y, con --serve, mide también cuánto tarda un uvicorn
+recién lanzado en responder 200 en "/". Sale con código 1 si se supera el
+objetivo, para usarlo en CI antes de tocar el autoescalado de Kubernetes:
+
+    python infrastructure/scripts/startup_report.py --max-import-ms 800 --serve --max-ready-ms 2000
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend")
+
+
+def parse_importtime(stderr):
+    """Devuelve [(módulo, self_us, cumulative_us, profundidad)] de la salida de -X importtime"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_field, cumulative_field, raw_name = line.split("|", 2)
+        self_us = int(self_field.split(":")[1])
+        cumulative_us = int(cumulative_field)
+        depth = (len(raw_name) - len(raw_name.lstrip(" "))) // 2
+        entries.append((raw_name.strip(), self_us, cumulative_us, depth))
+    return entries
+
+
+def measure_import(backend_dir, module, env):
+    """Importa `module` en un proceso nuevo y devuelve (tiempo total, entradas de importtime)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(backend_dir, env, timeout=60.0):
+    """Segundos desde lanzar uvicorn hasta obtener 200 en /"""
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("API did not become ready")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def summarize(entries, top):
+    """Módulos más caros y tiempo acumulado por paquete de primer nivel"""
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        by_package[name.split(".")[0]] += self_us
+    total_us = sum(self_us for _, self_us, _, _ in entries)
+    slowest = sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_import_ms": round(total_us / 1000, 1),
+        "modules_imported": len(entries),
+        "top_packages_ms": {name: round(us / 1000, 1) for name, us in packages},
+        "top_modules_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _, _ in slowest},
+    }
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend-dir", default=BACKEND_DIR)
+    parser.add_argument("--module", default="main", help="Módulo a importar (main, auth.main...)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3, help="Importaciones a medir; se usa la mediana")
+    parser.add_argument("--serve", action="store_true", help="Medir también el tiempo hasta la primera respuesta")
+    parser.add_argument("--max-import-ms", type=float, help="Objetivo de importación (falla si se supera)")
+    parser.add_argument("--max-ready-ms", type=float, help="Objetivo hasta la primera respuesta")
+    args = parser.parse_args()
+
+    backend_dir = os.path.abspath(args.backend_dir)
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'startup.db')}")
+        env["PYTHONWARNINGS"] = "ignore"
+
+        walls, entries = [], []
+        for _ in range(max(1, args.runs)):
+            wall, entries = measure_import(backend_dir, args.module, env)
+            walls.append(wall)
+        walls.sort()
+        report = summarize(entries, args.top)
+        report["import_wall_ms"] = round(walls[len(walls) // 2] * 1000, 1)
+        if args.serve:
+            report["ready_ms"] = round(measure_ready(backend_dir, env) * 1000, 1)
+
+    failures = []
+    if args.max_import_ms is not None and report["import_wall_ms"] > args.max_import_ms:
+        failures.append(f"import {report['import_wall_ms']}ms > {args.max_import_ms}ms")
+    if args.max_ready_ms is not None and report.get("ready_ms", 0) > args.max_ready_ms:
+        failures.append(f"ready {report['ready_ms']}ms > {args.max_ready_ms}ms")
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
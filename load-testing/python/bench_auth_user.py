@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de peticiones/segundo sobre GET /api/auth/user.
+
+Arranca un uvicorn local con una base SQLite temporal, registra un usuario,
+obtiene su token y lanza N clientes concurrentes durante D segundos.
+Permite comparar dos versiones del backend (p. ej. un worktree del commit
+anterior) con exactamente la misma carga:
+
+    python bench_auth_user.py --backend-dir ../../backend --env TOKEN_CACHE_SIZE=0
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import httpx
+
+from common import (
+    DEFAULT_BACKEND_DIR,
+    free_port,
+    latency_summary,
+    start_server,
+    stop_server,
+    wait_ready,
+)
+
+
+async def get_token(client):
+    """Registra el usuario de prueba y devuelve su access token"""
+    user = {"email": "bench@proflow.dev", "password": "bench-password", "role": "student"}
+    await client.post("/api/auth/register", json=user)
+    response = await client.post("/api/auth/login", json=user)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client, headers, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get("/api/auth/user", headers=headers)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append(time.perf_counter() - started)
+        if not ok:
+            errors.append(1)
+
+
+async def run(base_url, concurrency, duration, warmup):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        await wait_ready(client)
+        headers = {"Authorization": f"Bearer {await get_token(client)}"}
+        # Calentamiento: no se contabiliza
+        await asyncio.gather(*[
+            worker(client, headers, time.monotonic() + warmup, [], [])
+            for _ in range(concurrency)
+        ])
+        latencies, errors = [], []
+        started = time.monotonic()
+        await asyncio.gather(*[
+            worker(client, headers, started + duration, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.monotonic() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": latency_summary(latencies),
+    }
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend-dir", default=DEFAULT_BACKEND_DIR)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variable de entorno extra para el servidor")
+    args = parser.parse_args()
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(args.backend_dir, port, workdir, extra_env)
+        try:
+            result = asyncio.run(run(f"http://127.0.0.1:{port}", args.concurrency, args.duration, args.warmup))
+        finally:
+            stop_server(server)
+    result.update({"concurrency": args.concurrency, "env": extra_env})
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
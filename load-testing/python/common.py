@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Utilidades compartidas por los scripts de carga: arrancar un uvicorn local
+contra una base temporal y resumir latencias.
+"""
+
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+DEFAULT_BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend")
+
+
+def free_port():
+    """Devuelve un puerto TCP libre en localhost"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(backend_dir, port, workdir, extra_env, database_url=None, workers=1):
+    """Lanza uvicorn con main:app en un subproceso"""
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    env.update(extra_env)
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", os.path.abspath(backend_dir),
+        "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning",
+    ]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    return subprocess.Popen(cmd, cwd=workdir, env=env)
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def wait_ready(client, timeout=30.0):
+    """Espera a que la API responda en /"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("API did not become ready")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    """Resumen en milisegundos de una lista de duraciones en segundos"""
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": round(statistics.fmean(latencies) * 1000, 3),
+        "p50": round(percentile(latencies, 50) * 1000, 3),
+        "p95": round(percentile(latencies, 95) * 1000, 3),
+        "p99": round(percentile(latencies, 99) * 1000, 3),
+        "max": round(max(latencies) * 1000, 3),
+    }
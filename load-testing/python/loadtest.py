@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Arnés de carga para la API de autenticación.
+
+Siembra N usuarios y ejecuta escenarios mixtos con usuarios virtuales (VUs)
+asíncronos:
+
+  login     tormenta de logins (bcrypt + BD en cada petición)
+  poll      consulta continua de GET /api/auth/user con tokens ya emitidos
+  register  ráfagas de altas de usuario nuevas
+
+Por defecto arranca un uvicorn local con SQLite temporal; con --url apunta a
+un servidor ya levantado. El resultado es JSON (throughput, p50/p95/p99 y
+tasa de errores por escenario) e incluye el commit, para comparar ejecuciones:
+
+    python loadtest.py --profile mixed --users 500 --output run.json
+    python loadtest.py --profile mixed --users 500 --baseline run.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+from common import (
+    DEFAULT_BACKEND_DIR,
+    free_port,
+    latency_summary,
+    start_server,
+    stop_server,
+    wait_ready,
+)
+
+SEED_PASSWORD = "loadtest-password"
+PROFILES = {
+    "login-storm": {"login": 1},
+    "poll": {"poll": 1},
+    "register-burst": {"register": 1},
+    "mixed": {"poll": 8, "login": 1, "register": 1},
+}
+
+
+class Recorder:
+    """Latencias y códigos de estado de un escenario"""
+
+    def __init__(self):
+        self.latencies = []
+        self.status_codes = Counter()
+        self.errors = 0
+
+    def record(self, started, response=None, ok_statuses=(200,)):
+        self.latencies.append(time.perf_counter() - started)
+        if response is None:
+            self.status_codes["transport_error"] += 1
+            self.errors += 1
+            return
+        self.status_codes[str(response.status_code)] += 1
+        if response.status_code not in ok_statuses:
+            self.errors += 1
+
+    def summary(self, elapsed):
+        requests = len(self.latencies)
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / requests, 4) if requests else 0.0,
+            "status_codes": dict(self.status_codes),
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": latency_summary(self.latencies),
+        }
+
+
+def seed_email(index):
+    return f"loadtest-{index}@proflow.dev"
+
+
+def seed_sqlite(database_path, count):
+    """Inserta los usuarios directamente: un único hash bcrypt para todos"""
+    from passlib.context import CryptContext
+
+    hashed = CryptContext(schemes=["bcrypt"]).hash(SEED_PASSWORD)
+    rows = [
+        (seed_email(i), f"loadtest-{i}", hashed, "student", True)
+        for i in range(count)
+    ]
+    with sqlite3.connect(database_path, timeout=30) as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (email, username, hashed_password, role, is_active) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+async def seed_api(client, count, concurrency):
+    """Siembra a través de /api/auth/register (lento: un bcrypt por usuario)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def register(index):
+        async with semaphore:
+            await client.post("/api/auth/register", json={
+                "email": seed_email(index), "password": SEED_PASSWORD, "role": "student",
+            })
+
+    await asyncio.gather(*[register(i) for i in range(count)])
+
+
+async def login(client, email):
+    return await client.post("/api/auth/login", json={
+        "email": email, "password": SEED_PASSWORD, "role": "student",
+    })
+
+
+async def login_vu(client, emails, deadline, recorder):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await login(client, next(emails))
+        except httpx.HTTPError:
+            response = None
+        recorder.record(started, response)
+
+
+async def poll_vu(client, token, deadline, recorder, interval):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get("/api/auth/user", headers=headers)
+        except httpx.HTTPError:
+            response = None
+        recorder.record(started, response)
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def register_vu(client, run_id, sequence, deadline, recorder):
+    while time.monotonic() < deadline:
+        email = f"burst-{run_id}-{next(sequence)}@proflow.dev"
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/auth/register", json={
+                "email": email, "password": SEED_PASSWORD, "role": "student",
+            })
+        except httpx.HTTPError:
+            response = None
+        recorder.record(started, response)
+
+
+def split_vus(mix, concurrency):
+    """Reparte los VUs entre escenarios según sus pesos (al menos 1 por escenario)"""
+    total = sum(mix.values())
+    return {name: max(1, round(concurrency * weight / total)) for name, weight in mix.items()}
+
+
+async def run(base_url, mix, args, seed_path):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await wait_ready(client)
+        if seed_path:
+            seed_sqlite(seed_path, args.users)
+        else:
+            await seed_api(client, args.users, args.concurrency)
+
+        vus = split_vus(mix, args.concurrency)
+        emails = itertools.cycle([seed_email(i) for i in range(args.users)])
+
+        # Los VUs de poll necesitan un token previo; se obtiene fuera de la medición
+        tokens = []
+        for i in range(vus.get("poll", 0)):
+            response = await login(client, seed_email(i % args.users))
+            response.raise_for_status()
+            tokens.append(response.json()["access_token"])
+
+        recorders = {name: Recorder() for name in vus}
+        sequence = itertools.count()
+        run_id = int(time.time())
+        started = time.monotonic()
+        deadline = started + args.duration
+        tasks = []
+        for name, count in vus.items():
+            for i in range(count):
+                if name == "login":
+                    tasks.append(login_vu(client, emails, deadline, recorders[name]))
+                elif name == "poll":
+                    tasks.append(poll_vu(client, tokens[i], deadline, recorders[name], args.poll_interval))
+                elif name == "register":
+                    tasks.append(register_vu(client, run_id, sequence, deadline, recorders[name]))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+
+    total = Recorder()
+    for recorder in recorders.values():
+        total.latencies.extend(recorder.latencies)
+        total.status_codes.update(recorder.status_codes)
+        total.errors += recorder.errors
+    return {
+        "scenarios": {name: rec.summary(elapsed) for name, rec in recorders.items()},
+        "total": total.summary(elapsed),
+        "virtual_users": vus,
+        "elapsed_s": round(elapsed, 3),
+    }
+
+
+def git_commit(path):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=path,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Diferencias relativas frente a una ejecución anterior"""
+    comparison = {}
+    for name, current in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        entry = {}
+        for key in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][key], current["latency_ms"][key]
+            entry[f"{key}_change"] = round((new - old) / old, 4) if old else None
+        old, new = before["throughput_rps"], current["throughput_rps"]
+        entry["throughput_change"] = round((new - old) / old, 4) if old else None
+        entry["error_rate_delta"] = round(current["error_rate"] - before["error_rate"], 4)
+        comparison[name] = entry
+    return {"baseline_commit": baseline.get("meta", {}).get("commit"), "scenarios": comparison}
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("login", "poll", "register"):
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="mixed")
+    parser.add_argument("--mix", type=parse_mix, help="Pesos propios, p. ej. poll=8,login=1,register=1")
+    parser.add_argument("--users", type=int, default=200, help="Usuarios sembrados")
+    parser.add_argument("--concurrency", type=int, default=50, help="Usuarios virtuales")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--poll-interval", type=float, default=0.0, help="Pausa entre consultas de un VU de poll")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--url", help="Servidor existente; si no se indica se arranca uno local")
+    parser.add_argument("--backend-dir", default=DEFAULT_BACKEND_DIR)
+    parser.add_argument("--database-url", help="DATABASE_URL del servidor local (por defecto SQLite temporal)")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn del servidor local")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variable de entorno extra para el servidor local")
+    parser.add_argument("--output", help="Fichero JSON de salida (por defecto stdout)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    mix = args.mix or PROFILES[args.profile]
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        seed_path = None
+        base_url = args.url
+        if base_url is None:
+            seed_path = None if args.database_url else os.path.join(workdir, "loadtest.db")
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(args.backend_dir, port, workdir, extra_env,
+                                  database_url=args.database_url, workers=args.workers)
+        try:
+            result = asyncio.run(run(base_url, mix, args, seed_path))
+        finally:
+            if server is not None:
+                stop_server(server)
+
+    report = {
+        "meta": {
+            "commit": git_commit(args.backend_dir),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "profile": "custom" if args.mix else args.profile,
+            "mix": mix,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "target": args.url or "local",
+            "env": extra_env,
+        },
+        **result,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if report["total"]["requests"] == 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
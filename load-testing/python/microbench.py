@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks de los caminos calientes de autenticación.
+
+Aísla el coste de cada pieza de backend/shared sin HTTP de por medio:
+create_access_token, jwt.decode, verify_password por factor de coste de
+bcrypt, get_user con y sin índice, serialización de UserResponse, el
+renderizado de respuestas (response_model + jsonable_encoder frente a
+serializadores precompilados + orjson) y la cadena completa de
+get_current_user (con y sin caché de tokens).
+
+    python microbench.py                       # imprime resultados
+    python microbench.py --save-baseline       # guarda microbench_baseline.json
+    python microbench.py --check               # falla si algo empeora > umbral
+
+Las baselines dependen de la máquina: regenerarlas en el hardware donde se
+vayan a comprobar.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+from common import DEFAULT_BACKEND_DIR
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "microbench_baseline.json")
+BCRYPT_ROUNDS = (4, 8, 10, 12)
+SEED_USERS = 20000
+
+
+def measure(func, repeat, min_time):
+    """Mediana del tiempo por llamada (segundos) tras calibrar el nº de iteraciones"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - started) / loops)
+    return statistics.median(samples), loops
+
+
+def measure_async(loop, coro_factory, repeat, min_time):
+    return measure(lambda: loop.run_until_complete(coro_factory()), repeat, min_time)
+
+
+def serialize_user(model, user):
+    """Validación + JSON de un modelo ORM, en Pydantic v1 o v2"""
+    if hasattr(model, "model_validate"):
+        return model.model_validate(user, from_attributes=True).model_dump_json()
+    return model.from_orm(user).json()
+
+
+def course_page(size):
+    """Página de catálogo como la que devuelve fetch_page (dicts ya proyectados)"""
+    return [
+        {
+            "_id": i, "courseName": f"Course {i}", "courseCode": f"C{i:05d}",
+            "description": "Lorem ipsum dolor sit amet " * 4, "category": "Programming",
+            "difficulty": "Beginner", "duration": "8 weeks", "price": 49.9, "maxStudents": 120,
+            "instructorName": "Teacher", "thumbnailId": None,
+        }
+        for i in range(size)
+    ]
+
+
+def seed(database_path, count):
+    """Base SQLite con `count` usuarios, creada con el esquema del propio backend"""
+    import sqlite3
+
+    from passlib.context import CryptContext
+
+    from shared.db import create_all
+
+    asyncio.run(create_all())
+    hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("bench")
+    with sqlite3.connect(database_path) as conn:
+        conn.executemany(
+            "INSERT INTO users (email, username, hashed_password, role, is_active) VALUES (?, ?, ?, ?, ?)",
+            [(f"user{i}@proflow.dev", f"user{i}", hashed, "student", True) for i in range(count)],
+        )
+
+
+def run_benchmarks(repeat, min_time, selected):
+    from jose import jwt
+    from passlib.context import CryptContext
+
+    from shared import auth, config, db
+    from shared.schemas import UserResponse
+    from shared.token_cache import token_cache
+    from shared.tokens import create_access_token
+
+    results = {}
+
+    def record(name, func, is_async=False):
+        if selected and not any(name.startswith(prefix) for prefix in selected):
+            return
+        if is_async:
+            per_call, loops = measure_async(loop, func, repeat, min_time)
+        else:
+            per_call, loops = measure(func, repeat, min_time)
+        results[name] = {"us_per_op": round(per_call * 1e6, 3), "loops": loops}
+        print(f"{name:40s} {per_call * 1e6:14.3f} us/op", file=sys.stderr)
+
+    loop = asyncio.new_event_loop()
+    email = f"user{SEED_USERS // 2}@proflow.dev"
+    claims = {"sub": email, "role": "student"}
+    token = create_access_token(claims)
+
+    record("create_access_token", lambda: create_access_token(claims))
+    record("jwt.decode", lambda: jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM]))
+
+    for rounds in BCRYPT_ROUNDS:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = context.hash("bench-password")
+        record(f"bcrypt.verify[rounds={rounds}]", lambda c=context, h=hashed: c.verify("bench-password", h))
+
+    default_hash = CryptContext(schemes=["bcrypt"]).hash("bench-password")
+    record("verify_password[pool]", lambda: auth.verify_password("bench-password", default_hash), is_async=True)
+
+    session = db.SessionLocal()
+    user = loop.run_until_complete(auth.get_user(session, email))
+    record("UserResponse.serialize", lambda: serialize_user(UserResponse, user))
+    record_rendering(record, user)
+
+    async def get_user():
+        return await auth.get_user(session, email)
+
+    record("get_user[indexed]", get_user, is_async=True)
+
+    async def current_user():
+        return await auth.get_current_user(token, session)
+
+    token_cache.clear()
+    saved_size = token_cache.max_size
+    token_cache.max_size = 0
+    record("get_current_user[no_cache]", current_user, is_async=True)
+    token_cache.max_size = saved_size
+    record("get_current_user[cached]", current_user, is_async=True)
+
+    async def drop_index():
+        async with db.engine.begin() as conn:
+            await conn.exec_driver_sql("DROP INDEX IF EXISTS ix_users_email")
+
+    if not selected or any("get_user[unindexed]".startswith(p) for p in selected):
+        loop.run_until_complete(session.close())
+        loop.run_until_complete(drop_index())
+        session = db.SessionLocal()
+        record("get_user[unindexed]", get_user, is_async=True)
+
+    loop.run_until_complete(session.close())
+    loop.run_until_complete(db.engine.dispose())
+    loop.close()
+    return results
+
+
+def record_rendering(record, user):
+    """Coste de convertir la respuesta en bytes: ruta de FastAPI por defecto frente a la rápida.
+
+    ``render[*:fastapi]`` reproduce lo que hacía FastAPI antes (validar contra
+    response_model o pasar por jsonable_encoder y codificar con json);
+    ``render[*:fast]`` es el camino actual (serializador precompilado y orjson).
+    """
+    from typing import Dict
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from shared.auth import serialize_user as precompiled_user
+    from shared.pagination import page_response
+    from shared.schemas import UserResponse
+    from shared.serialization import json_response
+    from shared.token_cache import CachedUser
+
+    cached = CachedUser.from_orm(user)
+    me_adapter = TypeAdapter(Dict[str, UserResponse])
+    record("render[user:fastapi]", lambda: me_adapter.dump_json(
+        me_adapter.validate_python({"user": cached}, from_attributes=True)
+    ))
+    record("render[user:fast]", lambda: json_response({"user": precompiled_user(cached)}).body)
+
+    def token_payload(user_dict):
+        return {"access_token": "a" * 180, "token_type": "bearer", "refresh_token": "r" * 60, "user": user_dict}
+
+    manual = {"id": user.id, "email": user.email, "username": user.username, "role": user.role,
+              "is_active": user.is_active}
+    record("render[token:fastapi]", lambda: JSONResponse(jsonable_encoder(token_payload(dict(manual)))).body)
+    record("render[token:fast]", lambda: json_response(token_payload(precompiled_user(user))).body)
+
+    page = course_page(50)
+    record("render[courses_page:fastapi]", lambda: JSONResponse(jsonable_encoder(
+        {"courses": page, "next_cursor": "x" * 24, "has_more": True}
+    )).body)
+    record("render[courses_page:fast]", lambda: page_response("courses", page, "x" * 24).body)
+
+
+def check(results, baseline, threshold):
+    """Lista de regresiones: benchmarks más lentos que baseline * (1 + umbral)"""
+    regressions = []
+    for name, current in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = current["us_per_op"] / before["us_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append({"benchmark": name, "baseline_us": before["us_per_op"],
+                                "current_us": current["us_per_op"], "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend-dir", default=DEFAULT_BACKEND_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Segundos mínimos por muestra")
+    parser.add_argument("--only", action="append", default=[], help="Prefijo de benchmark a ejecutar")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="Compara con la baseline y falla si hay regresiones")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    with tempfile.TemporaryDirectory() as workdir:
+        database_path = os.path.join(workdir, "microbench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+        os.environ.setdefault("TRUST_TOKEN_CLAIMS", "false")
+        sys.path.insert(0, os.path.abspath(args.backend_dir))
+        seed(database_path, SEED_USERS)
+        results = run_benchmarks(args.repeat, args.min_time, args.only)
+
+    report = {"python": sys.version.split()[0], "seed_users": SEED_USERS, "results": results}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    status = 0
+    if args.check:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = check(results, json.load(f), args.threshold)
+        report["regressions"] = regressions
+        status = 1 if regressions else 0
+    print(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Presupuesto de consultas SQL por endpoint (detecta regresiones N+1).
+
+Llama a la app FastAPI en proceso (sin uvicorn) sobre una SQLite temporal y
+cuenta las sentencias de cada petición con ``shared.db.count_queries``. Cada
+caso se mide con agregados de distintos tamaños: el número de consultas debe
+ser el mismo en todos y no superar el presupuesto.
+
+    python query_budget.py            # imprime el informe y sale con 1 si algo se pasa
+    python query_budget.py --verbose  # incluye las sentencias ejecutadas
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import warnings
+
+from common import DEFAULT_BACKEND_DIR
+
+# (módulos, lecciones por módulo) de cada curso sembrado
+SIZES = ((1, 1), (10, 5), (50, 20))
+
+# Consultas máximas por petición, con la caché de tokens ya caliente
+BUDGETS = {
+    # versión + curso + módulos + lecciones (con su material)
+    "GET /api/courses/{id}/manage": 4,
+    # solo la versión
+    "GET /api/courses/{id}/manage [304]": 1,
+}
+
+
+async def seed(db, models, teacher_id, index, modules, lessons):
+    """Curso con ``modules`` módulos de ``lessons`` lecciones, cada lección con su material"""
+    course = models.Course(
+        course_name=f"Course {index}",
+        course_code=f"QB-{index}",
+        teacher_id=teacher_id,
+    )
+    db.add(course)
+    await db.flush()
+    for m in range(modules):
+        module = models.Module(course_id=course.id, title=f"Module {m}", position=m)
+        db.add(module)
+        await db.flush()
+        for n in range(lessons):
+            material = models.Material(
+                sha256=f"{index:08d}{m:04d}{n:04d}".ljust(64, "0"),
+                size=1,
+                content_type="application/pdf",
+                filename=f"lesson-{m}-{n}.pdf",
+            )
+            db.add(material)
+            db.add(models.Lesson(module_id=module.id, title=f"Lesson {n}", position=n, material=material))
+    await db.commit()
+    return course.id
+
+
+async def run(verbose):
+    import httpx
+
+    from main import app
+    from shared import db, models
+    from shared.tokens import create_access_token
+
+    await db.create_all()
+    async with db.SessionLocal() as session:
+        teacher = models.User(email="teacher@proflow.dev", username="teacher", hashed_password="x", role="teacher")
+        session.add(teacher)
+        await session.commit()
+        course_ids = []
+        for index, (modules, lessons) in enumerate(SIZES):
+            course_ids.append(await seed(session, models, teacher.id, index, modules, lessons))
+
+    token = create_access_token({"sub": teacher.email, "role": teacher.role})
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    counts = {name: [] for name in BUDGETS}
+    statements = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+        # Calienta la caché de tokens: el presupuesto mide el endpoint, no la autenticación
+        await client.get("/api/auth/user")
+
+        async def measure(name, path, extra_headers=None, expected=200):
+            with db.count_queries() as executed:
+                response = await client.get(path, headers=extra_headers)
+            if response.status_code != expected:
+                raise SystemExit(f"{name}: HTTP {response.status_code} (expected {expected}): {response.text}")
+            counts[name].append(len(executed))
+            statements.setdefault(name, executed)
+            return response
+
+        for course_id in course_ids:
+            path = f"/api/courses/{course_id}/manage"
+            response = await measure("GET /api/courses/{id}/manage", path)
+            etag = {"If-None-Match": response.headers["etag"]}
+            await measure("GET /api/courses/{id}/manage [304]", path, etag, expected=304)
+
+    await db.dispose_engine()
+
+    report = {"sizes": [f"{m}x{n}" for m, n in SIZES], "endpoints": {}, "failures": []}
+    for name, budget in BUDGETS.items():
+        entry = {"budget": budget, "queries": counts[name]}
+        if verbose:
+            entry["statements"] = statements.get(name, [])
+        report["endpoints"][name] = entry
+        if len(set(counts[name])) > 1:
+            report["failures"].append(f"{name}: query count grows with the aggregate size {counts[name]}")
+        if max(counts[name]) > budget:
+            report["failures"].append(f"{name}: {max(counts[name])} queries, budget is {budget}")
+    return report
+
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend-dir", default=DEFAULT_BACKEND_DIR)
+    parser.add_argument("--verbose", action="store_true", help="Incluye las sentencias SQL en el informe")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'query_budget.db')}"
+        os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+        sys.path.insert(0, os.path.abspath(args.backend_dir))
+        report = asyncio.run(run(args.verbose))
+
+    print(json.dumps(report, indent=2))
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())